@@ -1,2 +1,7 @@
 from .base import *
-
+from .pool import *
+from .proxies import *
+from .retry import *
+from .sessions import *
+from .snapshot import *
+from .watchdog import *
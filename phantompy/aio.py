@@ -0,0 +1,625 @@
+# -*- coding: utf-8 -*-
+
+from base64 import b64decode
+from json import dumps, loads
+from shutil import rmtree
+from time import time
+from urlparse import urljoin
+from uuid import uuid4
+
+try:
+    from tornado import gen
+    from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+except ImportError as e:
+    raise ImportError(
+        'Tornado is required (https://pypi.python.org/pypi/tornado) :: %s'
+        % str(e)
+    )
+
+from .base import (
+    PhantomBase, PhantomError, PhantomService, DesiredCapabilities,
+    DRIVER_BINARY, DEFAULT_DRIVER_PROFILE, DEFAULT_CONFIG,
+    DRIVER_START_TIMEOUT, DRIVER_POLL_DELAY, DRIVER_POLL_MAX_DELAY,
+    SCREEN_RESOLUTION, JS,
+)
+from .utils import weighted_choice
+
+
+__all__ = ['AsyncPhantom', 'AsyncElement']
+
+
+# the max time to wait for a driver's answer (in seconds)
+# * page loads wait for :page_load_timeout + COMMAND_TIMEOUT
+COMMAND_TIMEOUT = 60
+
+
+class AsyncElement(object):
+    """aio::AsyncElement"""
+
+    def __init__(self, phantom, id):
+        self.phantom = phantom
+        self.id = id
+
+    def __repr__(self):
+        return '<AsyncElement %s>' % self.id
+
+    @gen.coroutine
+    def click(self):
+        http_meta = yield self.phantom.click(self)
+        raise gen.Return(http_meta)
+
+    @gen.coroutine
+    def text(self):
+        text = yield self.phantom.execute('GET', '/session/$sessionId/element/%s/text' % self.id)
+        raise gen.Return(text)
+
+    @gen.coroutine
+    def tag_name(self):
+        tag_name = yield self.phantom.execute('GET', '/session/$sessionId/element/%s/name' % self.id)
+        raise gen.Return(tag_name)
+
+    @gen.coroutine
+    def get_attribute(self, name):
+        value = yield self.phantom.execute(
+            'GET', '/session/$sessionId/element/%s/attribute/%s' % (self.id, name)
+        )
+        raise gen.Return(value)
+
+
+class AsyncPhantom(PhantomBase):
+    """aio::AsyncPhantom
+
+    Talks the same WebDriver protocol as Phantom through the non-blocking
+    Tornado HTTP client, so many sessions can be driven from one event loop
+    (Tornado >= 5 runs on the asyncio loop, all the methods are awaitable).
+
+    >>> phantom = AsyncPhantom(proxy='socks5://1.2.3.4:1080')
+    >>> yield phantom.start() # await phantom.start()
+    >>> http_meta = yield phantom.open('http://example.com')
+    >>> links = yield phantom.xpath('//a[@href]')
+    >>> yield phantom.quit()
+
+    * :command_executor: URL of an already running WebDriver server,
+      the PhantomJS process isn't spawned then
+
+    """
+
+    # spawn/port_ready/session_created/total driver start time (in seconds)
+    startup_timings = None
+
+    def __init__(self, binary=DRIVER_BINARY, driver_profile=DEFAULT_DRIVER_PROFILE,
+                 config=DEFAULT_CONFIG, navigator=None, proxy=None,
+                 sessions_dir=None, screenshots_dir=None,
+                 command_executor=None, http_client=None, sessions_backend='disk'):
+
+        if command_executor is None:
+            self._prepare_driver(
+                binary, driver_profile, sessions_dir, screenshots_dir,
+                sessions_backend=sessions_backend,
+            )
+        elif not isinstance(command_executor, basestring):
+            raise TypeError(':command_executor must be string')
+        else:
+            if screenshots_dir and not isinstance(screenshots_dir, basestring):
+                raise TypeError(':screenshots_dir must be string')
+            self._id = str(uuid4())
+            self.session_dir = None
+            self.screenshots_dir = screenshots_dir
+
+        self.command_executor = command_executor
+        self.http_client = http_client or AsyncHTTPClient()
+
+        self.service = None
+        self.session_id = None
+
+        # the session applied by start()
+        self._session = {
+            'config': config,
+            'navigator': navigator,
+            'proxy': proxy,
+        }
+
+        self._proxy = None
+        self._screen = None
+        self._default_headers = None
+        self._page_load_timeout = None
+        self._xpath_timeout = None
+
+        self.timezone_offset = None
+        self._reset_timeline()
+
+
+    @gen.coroutine
+    def start(self):
+        if self.session_id is not None:
+            raise PhantomError('The driver is already started')
+
+        timestamp = time()
+        timings = {}
+
+        try:
+            if self.command_executor is None:
+                self.service = PhantomService(
+                    self.binary,
+                    service_args=self._get_service_args(),
+                    log_path=self.driver_log_path,
+                )
+                self.service.spawn()
+                self._write_driver_pid(self.service.process.pid)
+                self.command_executor = self.service.service_url
+                timings.update(self.service.timings)
+                yield self._wait_for_service(timestamp + DRIVER_START_TIMEOUT)
+                timings['port_ready'] = time() - timestamp - timings['spawn']
+
+            session_timestamp = time()
+            yield self._start_session()
+            timings['session_created'] = time() - session_timestamp
+        except Exception as e:
+            yield self._stop_driver()
+            raise PhantomError('Unable to start the driver :: %s' % str(e))
+
+        timings['total'] = time() - timestamp
+        self.startup_timings = timings
+
+        yield self.new_session(**self._session)
+
+
+    @gen.coroutine
+    def _wait_for_service(self, deadline):
+        delay = DRIVER_POLL_DELAY
+        while True:
+            if self.service.process.poll() is not None:
+                raise PhantomError(
+                    'The driver process has exited with code %s'
+                    % self.service.process.returncode
+                )
+            try:
+                response = yield self.http_client.fetch(
+                    self.command_executor + '/status',
+                    request_timeout=1,
+                    raise_error=False,
+                )
+                if response.code == 200:
+                    return
+            except Exception:
+                pass
+            if time() + delay > deadline:
+                raise PhantomError('The driver is not ready after %s seconds' % DRIVER_START_TIMEOUT)
+            yield gen.sleep(delay)
+            delay = min(delay * 2, DRIVER_POLL_MAX_DELAY)
+
+
+    @gen.coroutine
+    def _start_session(self):
+        data = yield self._request(
+            'POST',
+            '/session',
+            {'desiredCapabilities': dict(DesiredCapabilities.PHANTOMJS)},
+        )
+        if not data.get('sessionId'):
+            raise PhantomError('Unable to create a session: %s' % data.get('value'))
+        self.session_id = data['sessionId']
+
+
+    @gen.coroutine
+    def _stop_driver(self):
+        if self.session_id is not None:
+            try:
+                yield self.execute('DELETE', '/session/$sessionId')
+            except PhantomError:
+                pass
+            self.session_id = None
+        if self.service is not None:
+            self.service.stop()
+            self.service = None
+        if self.session_dir:
+            try:
+                rmtree(self.session_dir, ignore_errors=True)
+            except OSError:
+                pass
+
+
+    @gen.coroutine
+    def quit(self):
+        try:
+            yield self._stop_driver()
+        except Exception as e:
+            raise PhantomError('Unable to stop the driver :: %s' % str(e))
+
+    # ************************************************************************
+    # :: sessions ::
+    # ************************************************************************
+
+    @gen.coroutine
+    def new_session(self, config=None, navigator=None, proxy=None):
+        if self._session_config is not None:
+            try:
+                yield self.execute_phantomjs_script('page.clearMemoryCache(); page.close()')
+                yield self.execute('DELETE', '/session/$sessionId')
+                yield self._start_session()
+            except Exception as e:
+                raise PhantomError('Unable to close the session :: %s' % str(e))
+            if self.session_dir:
+                rmtree(self.driver_profile['local_storage_path'], ignore_errors=True)
+
+        self.config = self.get_config(config)
+
+        self._navigator = self.get_navigator(navigator)
+
+        if proxy:
+            proxy = self.get_proxy(proxy)
+            timezone_offset = self._pop_proxy_timezone_offset(proxy)
+        else:
+            timezone_offset = None
+
+        screen = self.get_screen(
+            self.config['screen_size'] or weighted_choice(SCREEN_RESOLUTION)
+        )
+
+        session_config = self._get_session_config(
+            self.config, self._navigator, screen, timezone_offset
+        )
+
+        headers = self._get_default_headers()
+
+        scripts = [
+            'page.customHeaders = %s' % dumps(headers),
+            'page.viewportSize = %s' % dumps(self._get_viewport_size(screen)),
+            self._get_session_script(session_config),
+            'page._setProxy(%s)' % dumps(proxy) if proxy else 'page._resetProxy()',
+            'phantom.cookiesEnabled = %s' % dumps(bool(self.config['cookies_enabled'])),
+        ]
+
+        results = yield self.execute_phantomjs_batch(scripts)
+        errors = [r for r in results if isinstance(r, PhantomError)]
+        if errors:
+            raise PhantomError('Unable to start a new session :: %s' % str(errors[0]))
+
+        self._default_headers = headers
+        self._screen = screen
+        self._proxy = proxy
+        self.timezone_offset = timezone_offset
+        self._session_config = session_config
+
+        yield self._set_timeout('page load', self.config['page_load_timeout'])
+        self._page_load_timeout = self.config['page_load_timeout']
+
+        yield self._set_timeout('implicit', self.config['xpath_timeout'])
+        self._xpath_timeout = self.config['xpath_timeout']
+
+        self._reset_timeline()
+
+
+    @gen.coroutine
+    def _set_timeout(self, type, value):
+        yield self.execute(
+            'POST',
+            '/session/$sessionId/timeouts',
+            {'type': type, 'ms': float(value) * 1000},
+        )
+
+
+    @property
+    def navigator(self):
+        return self._navigator
+
+    @property
+    def user_agent(self):
+        return self._navigator['userAgent'] if self._navigator else None
+
+    @property
+    def proxy(self):
+        return self._proxy
+
+    @property
+    def screen(self):
+        return self._screen['width'], self._screen['height']
+
+    # ************************************************************************
+    # :: navigation ::
+    # ************************************************************************
+
+    @gen.coroutine
+    def open(self, url, timeout=None, attempts=None):
+        if not isinstance(url, basestring):
+            raise TypeError(':url must be string')
+
+        timeout = timeout or self._page_load_timeout
+        attempts = attempts or self.config['page_load_attempts']
+
+        try:
+            if timeout != self._page_load_timeout:
+                yield self._set_timeout('page load', timeout)
+            while attempts:
+                attempts -= 1
+                try:
+                    yield self.execute(
+                        'POST',
+                        '/session/$sessionId/url',
+                        {'url': url},
+                        timeout=timeout + COMMAND_TIMEOUT,
+                    )
+                    break
+                except PhantomError:
+                    if attempts > 0:
+                        continue
+                    raise
+        except Exception as e:
+            raise PhantomError('Unable to load URL: %s :: %s' % (url, str(e)))
+        finally:
+            if timeout != self._page_load_timeout:
+                yield self._set_timeout('page load', self._page_load_timeout)
+
+        http_meta = self._get_http_meta(
+            (yield self.execute_phantomjs_script('return page.getHttpMeta()')),
+            url
+        )
+
+        self._add_navigation(http_meta)
+
+        raise gen.Return(http_meta)
+
+
+    @gen.coroutine
+    def current_url(self):
+        url = yield self.execute('GET', '/session/$sessionId/url')
+        raise gen.Return(url)
+
+    # ************************************************************************
+    # :: selectors ::
+    # ************************************************************************
+
+    @gen.coroutine
+    def xpath(self, xpath, timeout=None):
+        if not isinstance(xpath, basestring):
+            raise TypeError(':xpath must be string')
+
+        custom_timeout = timeout is not None and timeout != self._xpath_timeout
+
+        try:
+            if custom_timeout:
+                yield self._set_timeout('implicit', timeout)
+            elements = yield self.execute(
+                'POST',
+                '/session/$sessionId/elements',
+                {'using': 'xpath', 'value': xpath},
+                timeout=(timeout or self._xpath_timeout) + COMMAND_TIMEOUT,
+            )
+        except Exception as e:
+            raise PhantomError(
+                'Unable to find elements by xpath "%s" :: %s'
+                % (xpath, str(e))
+            )
+        finally:
+            if custom_timeout:
+                yield self._set_timeout('implicit', self._xpath_timeout)
+
+        raise gen.Return([
+            AsyncElement(self, elem['ELEMENT']) for elem in elements or []
+        ])
+
+    # ************************************************************************
+    # :: mouse ::
+    # ************************************************************************
+
+    # see Phantom.click
+    # * returns the http_meta of the link's or the submitted form's page,
+    #   None for the other elements and the page
+    @gen.coroutine
+    def click(self, elem=None, timeout=None, if_visible=True, if_enabled=True):
+        if elem is not None and not isinstance(elem, AsyncElement):
+            raise TypeError(':elem must be an instance of AsyncElement')
+
+        url = None
+        state = None
+
+        if elem is not None:
+            state = yield self.get_element_state(elem)
+
+            if state['tag'] == 'a':
+                if state['href']:
+                    url = urljoin((yield self.current_url()), state['href'])
+
+            elif state['type'] == 'submit':
+                if state['form_action']:
+                    url = urljoin((yield self.current_url()), state['form_action'])
+
+        timeout = timeout or self._page_load_timeout
+
+        try:
+            if elem is not None:
+                if if_visible and not self._element_state_visible(state):
+                    raise PhantomError('element is not visible to user')
+                elif if_enabled and not state['enabled']:
+                    raise PhantomError('element is not enabled')
+
+            if timeout != self._page_load_timeout:
+                yield self._set_timeout('page load', timeout)
+            try:
+                if elem is not None:
+                    yield self.execute(
+                        'POST',
+                        '/session/$sessionId/moveto',
+                        {'element': elem.id},
+                    )
+                # * GhostDriver waits for the page load started by the click
+                yield self.execute(
+                    'POST',
+                    '/session/$sessionId/click',
+                    {'button': 0},
+                    timeout=timeout + COMMAND_TIMEOUT,
+                )
+            finally:
+                if timeout != self._page_load_timeout:
+                    yield self._set_timeout('page load', self._page_load_timeout)
+        except Exception as e:
+            raise PhantomError(
+                'Unable to click on %s :: %s'
+                % (
+                    '<%s> element' % state['tag'] if state is not None else 'the page',
+                    str(e)
+                )
+            )
+
+        if url is None:
+            raise gen.Return(None)
+
+        http_meta = self._get_http_meta(
+            (yield self.execute_phantomjs_script('return page.getHttpMeta()')),
+            url
+        )
+
+        self._add_navigation(http_meta)
+
+        raise gen.Return(http_meta)
+
+    # ************************************************************************
+    # :: elements ::
+    # ************************************************************************
+
+    # see Phantom.get_element_state
+    # * elems: AsyncElement or list of them
+    @gen.coroutine
+    def get_element_state(self, elems):
+        if isinstance(elems, (list, tuple)):
+            if not all(isinstance(elem, AsyncElement) for elem in elems):
+                raise TypeError(':elems must be AsyncElement or list of them')
+            args = [{'ELEMENT': elem.id} for elem in elems]
+        elif isinstance(elems, AsyncElement):
+            args = {'ELEMENT': elems.id}
+        else:
+            raise TypeError(':elems must be AsyncElement or list of them')
+
+        try:
+            state = yield self.execute(
+                'POST',
+                '/session/$sessionId/execute',
+                {'script': JS['element_state'], 'args': [args, False]},
+            )
+        except Exception as e:
+            raise PhantomError("Unable to get the element's state :: %s" % str(e))
+
+        raise gen.Return(state)
+
+    # ************************************************************************
+    # :: screenshots ::
+    # ************************************************************************
+
+    @gen.coroutine
+    def save_screenshot(self, filename=None, dir=None):
+        filepath = self._get_screenshot_path(filename, dir)
+        try:
+            png = yield self.execute('GET', '/session/$sessionId/screenshot')
+            with open(filepath, 'wb') as f:
+                f.write(b64decode(png.encode('ascii')))
+        except Exception as e:
+            raise PhantomError(
+                'Unable to save a screenshot "%s" :: %s'
+                % (filepath, str(e))
+            )
+        raise gen.Return(filepath)
+
+    # ************************************************************************
+    # :: PhantomJS scripts executor ::
+    # ************************************************************************
+
+    @gen.coroutine
+    def execute_phantomjs_script(self, script):
+        if not isinstance(script, basestring):
+            raise TypeError(':script must be string')
+        elif not script.strip():
+            raise ValueError(':script must be non-empty string')
+
+        script = script.strip()
+        if not script[-1] == ';':
+            script += ';'
+
+        try:
+            result = yield self.execute(
+                'POST',
+                '/session/$sessionId/phantom/execute',
+                {'script': 'var page = this; %s' % script, 'args': []},
+            )
+        except Exception as e:
+            raise PhantomError(
+                'Unable to execute the phantomjs script :: %s' % str(e)
+            )
+
+        if isinstance(result, dict) and 'stack' in result:
+            raise PhantomError('PhantomJS traceback :: ' + str(result['stack']))
+
+        raise gen.Return(result)
+
+
+    # executes all the scripts by a single call
+    # returns a value or PhantomError per script
+    @gen.coroutine
+    def execute_phantomjs_batch(self, scripts):
+        scripts = [_.strip() for _ in scripts]
+        results = yield self.execute_phantomjs_script(self._get_batch_script(scripts))
+        raise gen.Return(self._get_batch_results(scripts, results))
+
+    # ************************************************************************
+    # :: WebDriver protocol ::
+    # ************************************************************************
+
+    @gen.coroutine
+    def execute(self, method, path, params=None, timeout=COMMAND_TIMEOUT):
+        data = yield self._request(method, path, params, timeout=timeout)
+
+        value = data.get('value')
+        if data.get('status') or (isinstance(value, dict) and 'error' in value):
+            if isinstance(value, dict):
+                message = value.get('message') or value.get('error')
+                try:
+                    # GhostDriver wraps the error into JSON string
+                    message = loads(message)['errorMessage']
+                except Exception:
+                    pass
+            else:
+                message = value
+            raise PhantomError(
+                '%s %s :: %s' % (method, path, message)
+            )
+
+        raise gen.Return(value)
+
+
+    @gen.coroutine
+    def _request(self, method, path, params=None, timeout=COMMAND_TIMEOUT):
+        if '$sessionId' in path:
+            if self.session_id is None:
+                raise PhantomError('The driver is not started')
+            path = path.replace('$sessionId', self.session_id)
+
+        request = HTTPRequest(
+            self.command_executor.rstrip('/') + path,
+            method=method,
+            headers={
+                'Accept': 'application/json',
+                'Content-Type': 'application/json;charset=UTF-8',
+            },
+            body=dumps(params or {}) if method in ('POST', 'PUT') else None,
+            request_timeout=timeout,
+        )
+
+        try:
+            response = yield self.http_client.fetch(request, raise_error=False)
+        except Exception as e:
+            raise PhantomError('%s %s :: %s' % (method, path, str(e)))
+
+        if response.code == 599:
+            raise PhantomError('%s %s :: %s' % (method, path, str(response.error)))
+
+        body = (response.body or b'').decode('utf-8').replace('\x00', '').strip()
+        try:
+            data = loads(body) if body else {}
+            if not isinstance(data, dict):
+                raise ValueError
+        except ValueError:
+            data = {
+                'status': 0 if 199 < response.code < 300 else 13,
+                'value': body,
+            }
+
+        raise gen.Return(data)
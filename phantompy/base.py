@@ -2,6 +2,9 @@
 
 import os
 import re
+import platform
+import socket
+import subprocess
 from tempfile import gettempdir
 from contextlib import contextmanager
 from functools import wraps
@@ -10,12 +13,20 @@ from random import choice, randint
 from time import time, sleep
 from uuid import uuid4
 from shutil import rmtree
+from copy import deepcopy
+from collections import deque
+from datetime import datetime
 from distutils.spawn import find_executable
-from urlparse import urljoin
+from urlparse import urljoin, urlparse
+from urllib import quote
+from httplib import HTTPConnection, HTTPException
 
 try:
     from selenium.webdriver import PhantomJS
     from selenium.webdriver import DesiredCapabilities
+    from selenium.webdriver.phantomjs.service import Service
+    from selenium.webdriver.remote.webdriver import WebDriver as RemoteWebDriver
+    from selenium.webdriver.remote.command import Command
     # from selenium.webdriver.support.ui import WebDriverWait
     # from selenium.webdriver.common.by import By
     # from selenium.webdriver.common.keys import Keys
@@ -33,14 +44,26 @@ except ImportError as e:
         % str(e)
     )
 
-from .utils import weighted_choice, custom_value
+# Phantom.fetch()
+try:
+    import requests
+    from requests.cookies import RequestsCookieJar, create_cookie
+except ImportError:
+    requests = None
+
+from .connection import PooledConnection, CONNECTION_POOL_SIZE
+from .retry import RetryPolicy
+from .sessions import SessionStore, SessionsJanitor
+from .snapshot import DOMSnapshot, VISIBLE_ATTR
+from .watchdog import Watchdog
+from .utils import weighted_choice, custom_value, parse_selector
 from .utils.user_agent import generate_navigator
 from .utils.url import URL, URLError
 from .utils.geoip import GeoIP
 from .utils import regex
 
 
-__all__ = ['Phantom', 'PhantomError']
+__all__ = ['Phantom', 'PhantomBase', 'PhantomError', 'PhantomBatch', 'PhantomService']
 
 
 PACKAGE_DIR = os.path.abspath(os.path.dirname(__file__))
@@ -48,15 +71,51 @@ JS_DIR = os.path.join(PACKAGE_DIR, 'js')
 BIN_DIR = os.path.join(PACKAGE_DIR, 'bin')
 SESSIONS_DIR = os.path.join(gettempdir(), 'phantompy')
 
+# in-memory session dirs (if tmpfs is available)
+TMPFS_SESSIONS_DIR = os.path.join('/dev/shm', 'phantompy')
+if not os.path.isdir(os.path.dirname(TMPFS_SESSIONS_DIR)):
+    TMPFS_SESSIONS_DIR = SESSIONS_DIR
+
+# root dirs of the session dirs by the sessions backend
+SESSIONS_BACKENDS = {
+    'disk': SESSIONS_DIR,
+    'tmpfs': TMPFS_SESSIONS_DIR,
+}
+
 DRIVER_BINARY = os.path.join(BIN_DIR, 'phantomjs')
 if not os.path.isfile(DRIVER_BINARY):
     DRIVER_BINARY = find_executable('phantomjs')
 
+# max time to wait for the driver to answer after the start (in seconds)
+DRIVER_START_TIMEOUT = 30
+
+# readiness polling backoff: first and max delay (in seconds)
+DRIVER_POLL_DELAY = 0.01
+DRIVER_POLL_MAX_DELAY = 0.25
+
+# extra socket timeout of a long-poll request (in seconds)
+LONG_POLL_MARGIN = 5
+
+# re-check interval of Phantom.select waiting for a match (in ms)
+SELECT_POLL_INTERVAL = 100
+
+# see Phantom.wait_for
+WAIT_FOR_STATES = ('present', 'visible', 'gone')
+
+# the max time of a harvest_scroll batch on top of its :max_idle_ms (in ms)
+HARVEST_BATCH_TIMEOUT = 10000
+
 
 # JavaScripts
 JS = {
     'base': 'base.js',
     'date': 'date.js',
+    'extract': 'extract.js',
+    'element_state': 'element_state.js',
+    'select': 'select.js',
+    'wait_for': 'wait_for.js',
+    'snapshot': 'snapshot.js',
+    'harvest': 'harvest.js',
 }
 
 for script, filename in JS.items():
@@ -115,6 +174,9 @@ DEFAULT_CONFIG = {
     'page_load_timeout': 60,
     'page_load_attempts': 1,
 
+    # the number of the last navigations kept (see Phantom.timeline)
+    'history_size': 100,
+
     # XPATH selector timeout (implicitly_wait)
     'xpath_timeout': 0,
 
@@ -122,15 +184,28 @@ DEFAULT_CONFIG = {
     # any resource requested will stop trying and proceed with other parts of the page
     'resource_timeout': 60, # in seconds
 
+    # the page's budget: further requests (except the page itself) are aborted
+    # once it's hit, see http_meta['budget']
+    'max_page_bytes': None,
+    'max_requests_per_page': None,
+
     # features
     'cookies_enabled': True,
     'javascript_enabled': True,
     'load_images': True,
     'load_stylesheets': True,
+
+    # requests blocked by the rules (see Phantom.block_resources):
+    # {'hosts': [...], 'urls': [...], 'types': [...]}
+    'block_resources': None,
     'spoof_java_plugin': False,
     'spoof_flash_plugin': False,
     'spoof_html5_media':False,
 
+    # the number of the last page's resources recorded (see Phantom.resources)
+    # 0: the recorder is off
+    'record_resources': 0,
+
     # UTC/GMT timezone offset (in minutes)
     # auto: the offset will be set according to the proxy's location or not set at all
     # 'timezone_offset': 'auto',
@@ -181,6 +256,19 @@ FLASH_PLUGIN = {
 BLANK_URL = 'about:blank'
 
 
+# file extensions of the resource types (see Phantom.block_resources)
+RESOURCE_TYPES = {
+    'stylesheet': ('css',),
+    'script': ('js',),
+    'image': ('png', 'jpg', 'jpeg', 'gif', 'webp', 'svg', 'ico', 'bmp'),
+    'font': ('woff', 'woff2', 'ttf', 'otf', 'eot'),
+    'media': (
+        'mp4', 'webm', 'ogg', 'ogv', 'mp3', 'wav', 'm4a', 'aac', 'flac',
+        'avi', 'mov', 'flv', 'm3u8', 'swf',
+    ),
+}
+
+
 RE = {
     'meta_refresh': re.compile(r'(?P<timeout>\d+);?\s*(url=(?P<url>.+))?'),
 }
@@ -195,15 +283,113 @@ class PhantomError(Exception):
     """phantompy::PhantomError"""
 
 
-# TODO: wrap all parent's methods to throw PhantomError
-# TODO: start with existing session, save/load cookies file
-class Phantom(PhantomJS):
-    """phantompy::Phantom"""
+class PhantomBatch(object):
+    """phantompy::PhantomBatch
 
-    def __init__(self, binary=DRIVER_BINARY, driver_profile=DEFAULT_DRIVER_PROFILE,
-                 config=DEFAULT_CONFIG, navigator=None, proxy=None,
-                 sessions_dir=SESSIONS_DIR, screenshots_dir=None):
+    PhantomJS scripts collected by Phantom.phantom_batch().
+    * results: a value or PhantomError per script (after the flush)
+
+    """
+
+    def __init__(self):
+        self.scripts = []
+        self.results = None
+
+    def __len__(self):
+        return len(self.scripts)
+
+    @property
+    def errors(self):
+        return [r for r in self.results or [] if isinstance(r, PhantomError)]
+
+
+class PhantomService(Service):
+    """phantompy::PhantomService
+
+    Unlike the selenium's one (that checks the port once a second),
+    polls the GhostDriver's status endpoint with a short backoff.
+
+    """
+
+    timings = None
 
+    def start(self, timeout=DRIVER_START_TIMEOUT):
+        timestamp = time()
+
+        self.spawn()
+
+        deadline = timestamp + timeout
+        delay = DRIVER_POLL_DELAY
+        while not self.is_ready():
+            if self.process.poll() is not None:
+                raise PhantomError(
+                    'The driver process has exited with code %s'
+                    % self.process.returncode
+                )
+            elif time() + delay > deadline:
+                self.stop()
+                raise PhantomError(
+                    'The driver is not ready after %s seconds' % timeout
+                )
+            sleep(delay)
+            delay = min(delay * 2, DRIVER_POLL_MAX_DELAY)
+
+        self.timings['port_ready'] = time() - timestamp - self.timings['spawn']
+
+
+    # starts the process without waiting for it
+    def spawn(self):
+        self.timings = {}
+        timestamp = time()
+
+        try:
+            cmd = [self.path]
+            cmd.extend(self.command_line_args())
+            self.process = subprocess.Popen(
+                cmd,
+                env=self.env,
+                close_fds=platform.system() != 'Windows',
+                stdout=self.log_file,
+                stderr=self.log_file,
+            )
+        except Exception as e:
+            raise PhantomError(
+                'Unable to spawn the driver process "%s" :: %s'
+                % (self.path, str(e))
+            )
+
+        self.timings['spawn'] = time() - timestamp
+
+
+    # * a direct connection, urllib2 would route it through the proxy
+    #   from the environment (http_proxy) and never see the local port
+    def is_ready(self):
+        url = urlparse(self.service_url)
+        conn = HTTPConnection(url.hostname, url.port, timeout=1)
+        try:
+            conn.request('GET', url.path.rstrip('/') + '/status')
+            return conn.getresponse().status == 200
+        except (IOError, HTTPException, socket.error):
+            return False
+        finally:
+            conn.close()
+
+
+class PhantomBase(object):
+    """phantompy::PhantomBase
+
+    The driver-independent part of Phantom and AsyncPhantom.
+
+    """
+
+    config = None
+
+    _navigator = None
+
+    # * sessions_dir: the root of the session dirs (overrides :sessions_backend)
+    # * the orphaned session dirs of the root are removed by SessionsJanitor
+    def _prepare_driver(self, binary, driver_profile, sessions_dir, screenshots_dir,
+                        sessions_backend='disk'):
         if not binary:
             raise ValueError('PhantomJS :binary path must be set')
         elif not isinstance(binary, basestring):
@@ -212,28 +398,30 @@ class Phantom(PhantomJS):
             raise TypeError(':driver_profile must be dict')
         elif sessions_dir and not isinstance(sessions_dir, basestring):
             raise TypeError(':sessions_dir must be string')
+        elif sessions_backend not in SESSIONS_BACKENDS:
+            raise ValueError('Unsupported :sessions_backend: %s' % sessions_backend)
         elif screenshots_dir and not isinstance(screenshots_dir, basestring):
             raise TypeError(':screenshots_dir must be string')
 
         # session uid (differs from .session_id)
         self._id = str(uuid4())
 
-        self._started = False
-
         self.binary = os.path.realpath(binary)
         if not os.path.isfile(self.binary):
             raise PhantomError(
                 'PhantomJS :binary cannot be found by path: %s' % self.binary
             )
 
-        self.session_dir = os.path.join(sessions_dir or SESSIONS_DIR, self._id)
+        sessions_dir = sessions_dir or SESSIONS_BACKENDS[sessions_backend]
+
+        self.session_dir = os.path.join(sessions_dir, self._id)
         # wtf?
         if os.path.isdir(self.session_dir):
             raise PhantomError(
                 "The unique session's dir is already exists: %s" % self.session_dir
             )
         else:
-            os.makedirs(self.session_dir)
+            self._make_session_dir()
 
         self.screenshots_dir = screenshots_dir
 
@@ -243,16 +431,591 @@ class Phantom(PhantomJS):
                 if k in self.driver_profile:
                     self.driver_profile[k] = v
 
+        # * created by the driver on the first use
         self.driver_profile['local_storage_path'] = os.path.join(
             self.session_dir, 'local_storage'
         )
-        os.makedirs(self.driver_profile['local_storage_path'])
 
         # TODO: it'll be always empty, see: https://github.com/SeleniumHQ/selenium/issues/1911
         self.driver_profile['cookies_file'] = os.path.join(self.session_dir, 'cookies.txt')
 
         self.driver_log_path = os.path.join(self.session_dir, 'driver.log')
 
+        SessionsJanitor.ensure(sessions_dir)
+
+
+    # * marked as owned by this process (see SessionsJanitor)
+    def _make_session_dir(self):
+        os.makedirs(self.session_dir)
+        SessionsJanitor.mark(self.session_dir)
+
+
+    # the session dir is removed by the janitor once the process is dead
+    def _write_driver_pid(self, pid):
+        path = os.path.join(self.session_dir, 'driver.pid')
+        if pid is None:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        else:
+            with open(path, 'w') as f:
+                f.write(str(pid))
+
+
+    def _get_service_args(self):
+        service_args = []
+        for k, v in self.driver_profile.items():
+            if v is None:
+                continue
+            service_args.append(self.get_service_arg(k, v))
+        return service_args
+
+
+    @staticmethod
+    def _get_free_port():
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.bind(('127.0.0.1', 0))
+            return sock.getsockname()[1]
+        finally:
+            sock.close()
+
+
+    @staticmethod
+    def get_service_arg(key, value):
+        if not isinstance(key, basestring):
+            raise TypeError('Service arg name must be string')
+        if not isinstance(value, basestring):
+            try:
+                value = dumps(value)
+            except Exception as e:
+                raise PhantomError(
+                    'Unsupported service arg "%s" value: %s'
+                    % (key, str(value))
+                )
+        return '--%s=%s' % (key.replace('_', '-'), value.strip())
+
+    # ************************************************************************
+    # :: sessions ::
+    # ************************************************************************
+
+    def get_config(self, config=None):
+        _config = dict(DEFAULT_CONFIG)
+        if config:
+            if not isinstance(config, dict):
+                raise TypeError(':config must be dict')
+            for k, v in config.items():
+                if k in _config:
+                    _config[k] = v
+        return _config
+
+
+    # the page's configuration (page.__config__) injected with the base.js
+    _session_config = None
+
+    # * local_storage: {origin: {key: value}} restored on the first visit
+    #   of the origin (see Phantom.load_session)
+    # * poll_port: the port of the long-poll server (see Phantom._long_poll)
+    def _get_session_config(self, config, navigator, screen, timezone_offset,
+                            local_storage=None, poll_port=None):
+        if config['spoof_flash_plugin']:
+            if navigator['__platform__'] not in FLASH_PLUGIN:
+                raise ValueError('Unsupported :navigator for Flash plugin')
+            flash_plugin = FLASH_PLUGIN[navigator['__platform__']]
+        else:
+            flash_plugin = None
+
+        return {
+            'javascript_enabled': config['javascript_enabled'],
+            'load_images': config['load_images'],
+            'resource_timeout': config['resource_timeout'] * 1000,
+            'navigator': dict(
+                filter(
+                    lambda _: not _[0].startswith('_'),
+                    navigator.items()
+                )
+            ),
+            'screen': screen,
+            'spoof_flash_plugin': config['spoof_flash_plugin'],
+            'flash_plugin': flash_plugin,
+            'spoof_java_plugin': config['spoof_java_plugin'],
+            'spoof_html5_media': config['spoof_html5_media'],
+            'timezone_offset': timezone_offset,
+            'max_page_bytes': config['max_page_bytes'],
+            'max_requests_per_page': config['max_requests_per_page'],
+            'record_resources': config['record_resources'],
+            'block_resources': self._get_block_rules(
+                config['block_resources'], config['load_stylesheets']
+            ),
+            'local_storage': local_storage,
+            'poll_port': poll_port,
+        }
+
+
+    def _get_session_script(self, session_config):
+        return JS['base'] % {
+            '__config__': dumps(session_config),
+            '__getMockDate__': JS['date'],
+            '__select__': dumps(JS['select']),
+        }
+
+
+    # ************************************************************************
+    # :: blocking ::
+    # ************************************************************************
+
+    # compiles the rules into a hash set of the hosts and the combined
+    # regexes of the URL globs and of the resource types (see base.js)
+    # * stylesheets are blocked if not :load_stylesheets
+    def _get_block_rules(self, rules, load_stylesheets=True):
+        if rules is None:
+            rules = {}
+        elif not isinstance(rules, dict):
+            raise TypeError(':block_resources rules must be dict')
+
+        for key, value in rules.items():
+            if key not in ('hosts', 'urls', 'types'):
+                raise ValueError('Unsupported :block_resources rule: %s' % key)
+            elif value is not None and not (
+                isinstance(value, (list, tuple, set)) and
+                all([isinstance(_, basestring) and _ for _ in value])
+            ):
+                raise TypeError(
+                    ':block_resources %s must be list of non-empty strings' % key
+                )
+
+        hosts = sorted(set([_.strip().lstrip('.').lower() for _ in rules.get('hosts') or []]))
+
+        urls = [
+            re.escape(_).replace('\\*', '.*')
+            for _ in sorted(set(rules.get('urls') or []))
+        ]
+
+        types = set(rules.get('types') or [])
+        for resource_type in types:
+            if resource_type not in RESOURCE_TYPES:
+                raise ValueError('Unsupported resource type: %s' % resource_type)
+        if not load_stylesheets:
+            types.add('stylesheet')
+        extensions = sorted(set([_ for t in types for _ in RESOURCE_TYPES[t]]))
+
+        if not (hosts or urls or extensions):
+            return None
+
+        return {
+            'hosts': hosts,
+            'urls': '^(?:%s)$' % '|'.join(urls) if urls else None,
+            'types': (
+                '\\.(?:%s)(?:$|[?#])' % '|'.join(extensions) if extensions else None
+            ),
+        }
+
+    # ************************************************************************
+    # :: HTTP headers ::
+    # ************************************************************************
+
+    def _get_default_headers(self, headers=None, config=None, navigator=None):
+        config = config or self.config
+        navigator = navigator or self._navigator
+        upd = dict(DEFAULT_HEADERS)
+        upd.update(config.get('default_headers') or {})
+        upd['User-Agent'] = navigator['userAgent'] if navigator else None
+        upd.update(headers or {})
+        return dict(
+            filter(
+                lambda _: _[1] not in (False, None),
+                upd.items()
+            )
+        )
+
+    # ************************************************************************
+    # :: navigator ::
+    # ************************************************************************
+
+    def get_navigator(self, config=None):
+        if config is None:
+            config = self.generate_navigator()
+
+        elif isinstance(config, dict):
+            for key in ('platform', 'userAgent', '__name__', '__platform__'):
+                if not config.get(key):
+                    raise ValueError(
+                        "No '%s' value in the :navigator's config" % key
+                    )
+
+        else:
+            raise TypeError(":navigator's config must be dict")
+
+        return dict(config)
+
+
+    def generate_navigator(self, platform=None, navigator=None):
+        return generate_navigator(platform=platform, navigator=navigator)
+
+    # ************************************************************************
+    # :: proxy ::
+    # ************************************************************************
+
+    @staticmethod
+    def get_proxy(config=None):
+        if config is None:
+            return
+
+        elif isinstance(config, basestring):
+            proxy_url = regex.RE.PROXY_URL.match(config)
+            if not proxy_url:
+                raise ValueError('Unsupported proxy URL: %s' % config)
+            proxy = proxy_url.groupdict()
+            proxy['type'] = proxy['type'] or 'http'
+
+        elif isinstance(config, dict):
+            proxy = {}
+
+            proxy['type'] = config.get('type') or config.get('proxy_type')
+
+            if not proxy['type']:
+                proxy['type'] = 'http'
+            elif not isinstance(proxy['type'], basestring):
+                raise TypeError('Proxy :type must be string')
+            elif not regex.RE.PROXY_TYPE.match(proxy['type']):
+                raise ValueError('Unsupported proxy type: %s' % proxy['type'])
+
+            proxy['host'] = config.get('host') or config.get('ip') or config.get('server')
+
+            if not isinstance(proxy['host'], basestring):
+                raise TypeError('Proxy :host must be string')
+            elif not (proxy['host'] == 'localhost' or regex.RE.IPv4.match(proxy['host'])):
+                raise ValueError('Unsupported proxy host: %s' % proxy['host'])
+
+            proxy['port'] = config.get('port')
+
+            if isinstance(proxy['port'], int):
+                proxy['port'] = str(proxy['port'])
+            elif not isinstance(proxy['port'], basestring):
+                raise TypeError('Proxy :port must be string or int')
+            if not regex.RE.PORT.match(proxy['port']):
+                raise ValueError('Unsupported proxy port: %s' % proxy['port'])
+
+            proxy_user = config.get('user') or config.get('login')
+            proxy_passwd = config.get('passwd') or config.get('password')
+
+            if proxy_user is not None and proxy_passwd is not None:
+                if not (isinstance(proxy_user, basestring) and proxy_user):
+                    raise TypeError('Proxy :user must be non-empty string')
+                elif not (isinstance(proxy_passwd, basestring) and proxy_passwd):
+                    raise TypeError('Proxy :password must be non-empty string')
+                proxy['user'] = proxy_user
+                proxy['passwd'] = proxy_passwd
+
+            # the known timezone offset of the proxy (see ProxyPool)
+            if 'timezone_offset' in config:
+                proxy['timezone_offset'] = config['timezone_offset']
+
+        else:
+            raise TypeError('Proxy must be set by URL or dict config')
+
+        proxy_type = proxy['type'].lower()
+        if proxy_type.startswith('http'):
+            proxy_type = 'http'
+        elif proxy_type == 'socks':
+            proxy_type = 'socks5'
+        proxy['type'] = proxy_type
+
+        return proxy
+
+
+    # pops the known timezone offset from the proxy (see get_proxy)
+    # or looks it up by GeoIP (only works for IPv4 hosts)
+    @staticmethod
+    def _pop_proxy_timezone_offset(proxy):
+        if 'timezone_offset' in proxy:
+            return proxy.pop('timezone_offset')
+        elif proxy['host'] == 'localhost':
+            return
+        return GeoIP.get_timezone_offset_by_ip(proxy['host'], silent=True)
+
+    # ************************************************************************
+    # :: screen ::
+    # ************************************************************************
+
+    @staticmethod
+    def _get_viewport_size(screen):
+        return {
+            'width': screen['window']['innerWidth'],
+            'height': screen['window']['innerHeight'],
+        }
+
+
+    # the element is displayed within the viewport
+    # (see Phantom.get_element_state)
+    # TODO: fully/half visible
+    def _element_state_visible(self, state):
+        if not state['displayed']:
+            return False
+        rect = state['rect']
+        viewport = self._get_viewport_size(self._screen)
+        return (
+            (rect['x'] + rect['width']) > state['offset']['x'] and
+            (rect['y'] + rect['height']) > state['offset']['y'] and
+            rect['x'] < (state['offset']['x'] + viewport['width']) and
+            rect['y'] < (state['offset']['y'] + viewport['height'])
+        )
+
+
+    def get_screen(self, size=None):
+        if size is None:
+            size = weighted_choice(SCREEN_RESOLUTION)
+        elif isinstance(size, dict):
+            # already generated screen
+            if not all([k in size for k in ('width', 'height', 'window', 'window.screen')]):
+                raise ValueError('Unsupported screen config')
+            return deepcopy(size)
+        elif not (
+            isinstance(size, (list, tuple)) and len(size) == 2 and
+            isinstance(size[0], int) and isinstance(size[1], int)
+        ):
+            raise TypeError(
+                'Screen size must be tuple (int:width, int:height) or screen config'
+            )
+
+        width = max(300, size[0]) # ?
+        height = max(300, size[1]) # ?
+
+        screen = {}
+        screen['width'] = width
+        screen['height'] = height
+        screen['color_depth'] = SCREEN_COLOR_DEPTH
+        screen['os_taskbar_height'] = choice(OS_TASKBAR_HEIGHT)
+        screen['browser_taskbar_height'] = choice(BROWSER_TASKBAR_HEIGHT)
+        screen['window.screen'] = {}
+        screen['window.screen']['width'] = screen['width']
+        screen['window.screen']['height'] = screen['height']
+        screen['window.screen']['availWidth'] = screen['window.screen']['width']
+        screen['window.screen']['availHeight'] = (
+            screen['window.screen']['height'] - screen['os_taskbar_height']
+        )
+        screen['window.screen']['availLeft'] = 0
+        screen['window.screen']['availTop'] = screen['os_taskbar_height']
+        screen['window.screen']['colorDepth'] = screen['color_depth']
+        screen['window.screen']['pixelDepth'] = screen['color_depth']
+        screen['window'] = {}
+        screen['window']['outerWidth'] = screen['window.screen']['availWidth']
+        screen['window']['outerHeight'] = screen['window.screen']['availHeight']
+        screen['window']['innerWidth'] = (
+            screen['window']['outerWidth'] - choice(BROWSER_SCROOLBAR_WIDTH)
+        )
+        screen['window']['innerHeight'] = (
+            screen['window']['outerHeight'] - screen['browser_taskbar_height']
+        )
+        screen['window']['screenX'] = 0
+        screen['window']['screenY'] = screen['window.screen']['availTop']
+        return screen
+
+
+    # ************************************************************************
+    # :: navigation ::
+    # ************************************************************************
+
+    def _get_http_meta(self, http_meta, request_url):
+        # TODO: 304?
+        if not (http_meta and http_meta.get('response')):
+            if http_meta and http_meta.get('error'):
+                raise PhantomError('Unable to load URL: %s :: %s' % (
+                    request_url, http_meta['error']['message']
+                ))
+            raise PhantomError('Unable to load URL: %s' % request_url)
+
+        http_meta['request']['url'] = request_url
+
+        for r in ('request', 'response'):
+            # TODO: ordered dict
+            http_meta[r]['headers'] = dict(
+                [(h['name'], h['value']) for h in http_meta[r]['headers']]
+            )
+
+        # i don't give a shit about the trailing slash
+        if http_meta['response']['url'].rstrip('/') != request_url.rstrip('/'):
+            http_meta['response']['redirect'] = True
+        else:
+            http_meta['response']['redirect'] = False
+
+        return http_meta
+
+
+    # the last navigations (the oldest ones are dropped, see history_size)
+    timeline = None
+
+    # the final URLs of the last navigations
+    @property
+    def history(self):
+        return [navigation['url'] for navigation in self.timeline or ()]
+
+
+    def _reset_timeline(self):
+        self.timeline = deque(
+            maxlen=(self.config or DEFAULT_CONFIG)['history_size']
+        )
+
+
+    # * timing: Navigation Timing breakdown (in ms, see page.getNavigationTiming)
+    # * bytes: received by the page (see http_meta['budget'])
+    def _add_navigation(self, http_meta):
+        self.timeline.append({
+            'request_url': http_meta['request']['url'],
+            'url': http_meta['response']['url'],
+            'redirect': http_meta['response']['redirect'],
+            'status_code': http_meta['response']['status_code'],
+            'timing': http_meta.get('timing'),
+            'bytes': (http_meta.get('budget') or {}).get('bytes'),
+            'timestamp': time(),
+        })
+
+
+    # ************************************************************************
+    # :: screenshots ::
+    # ************************************************************************
+
+    def _get_screenshot_path(self, filename=None, dir=None):
+        if not filename:
+            filename = str(int(time())) + '-' + self._id
+        elif not isinstance(filename, basestring):
+            raise TypeError(':filename must be string')
+
+        if not dir:
+            dir = self.screenshots_dir or '.'
+        elif not isinstance(dir, basestring):
+            raise TypeError(':dir must be string')
+
+        filepath = os.path.realpath(os.path.join(dir, filename))
+        if not filepath.endswith('.png'):
+            filepath += '.png'
+
+        dirpath = os.path.dirname(filepath)
+
+        if not os.path.isdir(dirpath):
+            os.makedirs(dirpath)
+
+        return filepath
+
+
+    # ************************************************************************
+    # :: resources ::
+    # ************************************************************************
+
+    @staticmethod
+    def get_har(resources):
+        entries = []
+
+        for r in resources:
+            received = r['received'] or r['end']
+            timings = {
+                'send': 0,
+                'wait': received - r['start'],
+                'receive': r['end'] - received,
+            }
+            size = r['size'] if r['size'] is not None else -1
+
+            entries.append({
+                'startedDateTime': (
+                    datetime.utcfromtimestamp(r['start'] / 1000.0).isoformat() + 'Z'
+                ),
+                'time': sum(timings.values()),
+                'request': {
+                    'method': r['method'],
+                    'url': r['url'],
+                    'httpVersion': 'HTTP/1.1',
+                    'cookies': [],
+                    'headers': [],
+                    'queryString': [],
+                    'headersSize': -1,
+                    'bodySize': -1,
+                },
+                'response': {
+                    'status': r['status'] or 0,
+                    'statusText': r['error'] or '',
+                    'httpVersion': 'HTTP/1.1',
+                    'cookies': [],
+                    'headers': [],
+                    'content': {
+                        'size': size,
+                        'mimeType': r['content_type'] or '',
+                    },
+                    'redirectURL': '',
+                    'headersSize': -1,
+                    'bodySize': size,
+                },
+                'cache': {},
+                'timings': timings,
+            })
+
+        return {
+            'log': {
+                'version': '1.2',
+                'creator': {'name': 'phantompy', 'version': ''},
+                'pages': [],
+                'entries': entries,
+            }
+        }
+
+    # ************************************************************************
+    # :: PhantomJS scripts ::
+    # ************************************************************************
+
+    # a single script executing every script in its own try/catch
+    @staticmethod
+    def _get_batch_script(scripts):
+        script = ['var __batch__ = [];']
+        for _ in scripts:
+            script.append(
+                'try { __batch__.push({value: (function() { %s }).call(page)}); } '
+                'catch (e) { __batch__.push({error: String(e.stack || e)}); }'
+                % _
+            )
+        script.append('return __batch__;')
+        return '\n'.join(script)
+
+
+    @staticmethod
+    def _get_batch_results(scripts, results):
+        if not isinstance(results, list) or len(results) != len(scripts):
+            raise PhantomError('Unexpected PhantomJS batch result: %s' % results)
+
+        return [
+            (
+                PhantomError('PhantomJS traceback :: ' + r['error'])
+                if r.get('error') is not None else r.get('value')
+            )
+            for r in results
+        ]
+
+
+# TODO: wrap all parent's methods to throw PhantomError
+class Phantom(PhantomBase, PhantomJS):
+    """phantompy::Phantom"""
+
+    # spawn/port_ready/session_created/total driver start time (in seconds)
+    startup_timings = None
+
+    def __init__(self, binary=DRIVER_BINARY, driver_profile=DEFAULT_DRIVER_PROFILE,
+                 config=DEFAULT_CONFIG, navigator=None, proxy=None,
+                 sessions_dir=None, screenshots_dir=None,
+                 connection_pool_size=CONNECTION_POOL_SIZE, session=None,
+                 session_store=None, sessions_backend='disk', retry_policy=None):
+
+        self._prepare_driver(
+            binary, driver_profile, sessions_dir, screenshots_dir,
+            sessions_backend=sessions_backend,
+        )
+
+        # keep-alive connections to the driver
+        self.connection_pool_size = connection_pool_size
+
+        # page load retries (see RetryPolicy)
+        self.retry_policy = retry_policy
+
+        self._started = False
+
         try:
             self._start_driver()
         except Exception as e:
@@ -262,169 +1025,505 @@ class Phantom(PhantomJS):
                 pass
             raise PhantomError('Unable to start the driver :: %s' % str(e))
 
-        self.new_session(config, navigator=navigator, proxy=proxy)
+        # a saved session replaces :config, :navigator and :proxy
+        if session is not None:
+            self.load_session(session, store=session_store)
+        else:
+            self.new_session(config, navigator=navigator, proxy=proxy)
+
+        self._started = True
+
+
+    def _start_driver(self):
+        if self._started:
+            raise PhantomError('The driver is already started')
+
+        service_args = self._get_service_args()
+
+        desired_capabilities = dict(DesiredCapabilities.PHANTOMJS)
+
+        timestamp = time()
+
+        # unrolled PhantomJS.__init__
+        self.service = PhantomService(
+            self.binary,
+            service_args=service_args,
+            log_path=self.driver_log_path,
+        )
+        self.service.start()
+
+        try:
+            session_timestamp = time()
+            RemoteWebDriver.__init__(
+                self,
+                command_executor=PooledConnection(
+                    self.service.service_url,
+                    pool_size=self.connection_pool_size,
+                ),
+                desired_capabilities=desired_capabilities,
+            )
+            self._is_remote = False
+
+            self.command_executor._commands['executePhantomScript'] = (
+                'POST',
+                '/session/$sessionId/phantom/execute'
+            )
+
+            self._wait_for_driver(timestamp + DRIVER_START_TIMEOUT)
+        except Exception:
+            self._quit()
+            raise
+
+        self.startup_timings = dict(self.service.timings)
+        self.startup_timings['session_created'] = time() - session_timestamp
+        self.startup_timings['total'] = time() - timestamp
+
+        self.pid = self.service.process.pid
+        self._write_driver_pid(self.pid)
+
+
+    # polls the session until it answers the PhantomJS scripts
+    def _wait_for_driver(self, deadline):
+        delay = DRIVER_POLL_DELAY
+        while True:
+            try:
+                self.execute(
+                    'executePhantomScript',
+                    {'script': 'return true;', 'args': []}
+                )
+                return
+            except Exception:
+                if time() + delay > deadline:
+                    raise
+            sleep(delay)
+            delay = min(delay * 2, DRIVER_POLL_MAX_DELAY)
+
+
+    # navigations since the driver's start
+    navigations = 0
+
+    # driver restarts
+    restarts = 0
+
+    # the reason to restart the driver before the next navigation
+    restart_pending = None
+
+    watchdog = None
+
+    # restarts the driver process re-applying the current session
+    # (navigator, proxy, headers, screen and timezone)
+    # * called before the next driver command if restart_pending is set
+    #   (see execute)
+    def restart(self):
+        state = self.get_session_state()
+        timeline = self.timeline
+        self._restarting = True
+        try:
+            self._restart(state)
+        finally:
+            self._restarting = False
+        self.timeline = timeline
+
+        self._started = True
+        self.navigations = 0
+        self.restarts += 1
+        self.restart_pending = None
+
+
+    # the commands of restart() skip the restart_pending check
+    _restarting = False
+
+    def _restart(self, state):
+        # keeps the session dir from the janitor
+        self._write_driver_pid(None)
+
+        try:
+            self._quit()
+            self.command_executor.close()
+        except Exception:
+            pass
+
+        self._started = False
+
+        # the dir may be removed along with the dead driver (see SessionsJanitor)
+        if not os.path.isdir(self.session_dir):
+            self._make_session_dir()
+
+        # the new driver has the default settings
+        self._page_load_timeout = None
+        self._xpath_timeout = None
+        self._script_timeout = None
+        self._cookies_enabled = None
+        self._poll_port = None
+
+        try:
+            self._start_driver()
+        except Exception as e:
+            raise PhantomError('Unable to restart the driver :: %s' % str(e))
+
+        self.restore_session(state)
+
+
+    # the pending restart (see Watchdog) is done by the caller's thread
+    # before the next command (other than quit)
+    def execute(self, driver_command, params=None):
+        if (
+            self.restart_pending and
+            not self._restarting and
+            driver_command != Command.QUIT
+        ):
+            self.restart()
+        return PhantomJS.execute(self, driver_command, params)
+
+
+    # starts the watchdog of the driver's process (see Watchdog)
+    def watch(self, **kwargs):
+        if self.watchdog is not None:
+            self.watchdog.stop()
+        self.watchdog = Watchdog(self, **kwargs)
+        self.watchdog.start()
+        return self.watchdog
+
+
+    _quit = PhantomJS.quit
+
+    def quit(self):
+        if self.watchdog is not None:
+            self.watchdog.stop()
+            self.watchdog = None
+        try:
+            self._quit()
+            self.command_executor.close()
+            # self.clear_session()
+            self._started = False
+        except Exception as e:
+            raise PhantomError('Unable to stop the driver :: %s' % str(e))
+        finally:
+            self._close_fetch_sessions()
+            try:
+                rmtree(self.session_dir, ignore_errors=True)
+            except OSError:
+                pass
+
+
+    # ************************************************************************
+    # :: sessions ::
+    # ************************************************************************
+
+    config = None
+
+    def new_session(self, config=None, navigator=None, proxy=None):
+        self._new_session(config, navigator=navigator, proxy=proxy)
+
+
+    # :state - exact screen/timezone_offset/default_headers to restore
+    # :scripts - extra PhantomJS scripts executed within the session's batch
+    def _new_session(self, config=None, navigator=None, proxy=None, state=None,
+                     scripts=None):
+        if self._started:
+            self._cleanup_session()
+            self.start_session(self.desired_capabilities)
+
+        state = state or {}
+
+        self.config = self.get_config(config)
+
+        self._navigator = self.get_navigator(navigator)
+
+        if proxy:
+            proxy = self.get_proxy(proxy)
+
+        if 'timezone_offset' in state:
+            self.timezone_offset = state['timezone_offset']
+            if proxy:
+                proxy.pop('timezone_offset', None)
+        elif proxy:
+            self.timezone_offset = self._pop_proxy_timezone_offset(proxy)
+        else:
+            self.timezone_offset = None
+
+        self._screen = self.get_screen(
+            state.get('screen') or
+            self.config['screen_size'] or
+            weighted_choice(SCREEN_RESOLUTION)
+        )
+
+        # the driver's long-poll server (started by base.js)
+        if self._poll_port is None:
+            self._poll_port = self._get_free_port()
+
+        session_config = self._get_session_config(
+            self.config, self._navigator, self._screen, self.timezone_offset,
+            local_storage=state.get('local_storage'),
+            poll_port=self._poll_port,
+        )
+
+        # applied by the session script (see block_resources)
+        self._load_stylesheets = bool(self.config['load_stylesheets'])
+
+        with self.phantom_batch():
+            if state.get('default_headers') is not None:
+                headers = dict(
+                    map(
+                        lambda _: (_, None),
+                        self._default_headers.keys()
+                    )
+                )
+                headers.update(state['default_headers'])
+                self.update_default_headers(headers)
+            else:
+                self.default_headers = None
+
+            self.execute_phantomjs_script(
+                'page.viewportSize = %s' % dumps(self._get_viewport_size(self._screen))
+            )
+
+            self.execute_phantomjs_script(self._get_session_script(session_config))
+
+            self._session_config = session_config
+
+            if proxy:
+                self._set_proxy(proxy, set_timezone=False)
+            elif self._started:
+                self._reset_proxy(reset_timezone=False)
+
+            self.cookies_enabled = self.config['cookies_enabled']
+
+            for script in scripts or []:
+                self.execute_phantomjs_script(script)
+
+        self.page_load_timeout = self.config['page_load_timeout']
+        self.page_load_attempts = self.config['page_load_attempts']
+        self.xpath_timeout = self.config['xpath_timeout']
+
+        self._reset_timeline()
 
-        self._started = True
 
+    # everything needed to re-create the current session
+    def get_session_state(self):
+        return {
+            'config': dict(self.config),
+            'navigator': dict(self._navigator),
+            'proxy': dict(self._proxy) if self._proxy else None,
+            'screen': deepcopy(self._screen),
+            'timezone_offset': self.timezone_offset,
+            'default_headers': self.default_headers,
+        }
 
-    def _start_driver(self):
-        if self._started:
-            raise PhantomError('The driver is already started')
 
-        service_args = []
-        for k, v in self.driver_profile.items():
-            if v is None:
-                continue
-            service_args.append(self.get_service_arg(k, v))
+    def restore_session(self, state):
+        if not isinstance(state, dict):
+            raise TypeError(':state must be dict')
+        self._new_session(
+            state.get('config'),
+            navigator=state.get('navigator'),
+            proxy=state.get('proxy'),
+            state=state,
+        )
 
-        desired_capabilities = dict(DesiredCapabilities.PHANTOMJS)
 
-        super(Phantom, self).__init__(
-            executable_path=self.binary,
-            # port=0,
-            desired_capabilities=desired_capabilities,
-            service_args=service_args,
-            service_log_path=self.driver_log_path,
-        )
+    # the session state + cookies (of all domains) and localStorage
+    # (of the current page's origin and the ones not visited since the load)
+    def get_session_snapshot(self):
+        if self._batch is not None:
+            raise PhantomError('Unable to take a session snapshot within a batch')
 
-        sleep(1) # wait a sec, damn
+        try:
+            with self.phantom_batch() as batch:
+                self.execute_phantomjs_script('return phantom.cookies')
+                self.execute_phantomjs_script(
+                    'return page.evaluate(function() {'
+                    '  if (!/^https?:$/.test(location.protocol)) { return null; };'
+                    '  var items = {};'
+                    '  for (var i = 0; i < localStorage.length; i++) {'
+                    '    items[localStorage.key(i)] = localStorage.getItem(localStorage.key(i));'
+                    '  };'
+                    '  return [location.protocol + "//" + location.host, items];'
+                    '})'
+                )
+        except Exception as e:
+            raise PhantomError('Unable to take a session snapshot :: %s' % str(e))
 
-        self.command_executor._commands['executePhantomScript'] = (
-            'POST',
-            '/session/$sessionId/phantom/execute'
-        )
+        cookies, origin_storage = batch.results
 
-        self.pid = self.service.process.pid
-        with open(os.path.join(self.session_dir, 'driver.pid'), 'w') as f:
-            f.write(str(self.pid))
+        local_storage = dict(self._session_config.get('local_storage') or {})
+        if origin_storage:
+            origin, items = origin_storage
+            if items:
+                local_storage[origin] = items
+            else:
+                local_storage.pop(origin, None)
 
+        snapshot = self.get_session_state()
+        snapshot['cookies'] = cookies or []
+        snapshot['local_storage'] = local_storage
+        return snapshot
 
-    _quit = PhantomJS.quit
 
-    def quit(self):
+    # saves the session snapshot into the store (see SessionStore)
+    def save_session(self, name, store=None):
+        snapshot = self.get_session_snapshot()
         try:
-            self._quit()
-            # self.clear_session()
-            self._started = False
+            (store or SessionStore()).save(name, snapshot)
         except Exception as e:
-            raise PhantomError('Unable to stop the driver :: %s' % str(e))
-        finally:
-            try:
-                rmtree(self.session_dir, ignore_errors=True)
-            except OSError:
-                pass
+            raise PhantomError('Unable to save the session "%s" :: %s' % (name, str(e)))
+        return snapshot
 
 
-    @staticmethod
-    def get_service_arg(key, value):
-        if not isinstance(key, basestring):
-            raise TypeError('Service arg name must be string')
-        if not isinstance(value, basestring):
+    # :session - the name of a snapshot in the store or the snapshot itself
+    # * the session is restored by a single PhantomJS batch
+    def load_session(self, session, store=None):
+        if isinstance(session, basestring):
             try:
-                value = dumps(value)
+                session = (store or SessionStore()).load(session)
             except Exception as e:
                 raise PhantomError(
-                    'Unsupported service arg "%s" value: %s'
-                    % (key, str(value))
+                    'Unable to load the session "%s" :: %s' % (session, str(e))
                 )
-        return '--%s=%s' % (key.replace('_', '-'), value.strip())
+        elif not isinstance(session, dict):
+            raise TypeError(':session must be string (name) or dict (snapshot)')
 
-    # ************************************************************************
-    # :: sessions ::
-    # ************************************************************************
+        scripts = [
+            self._get_cookies_import_script(session.get('cookies') or [], clear=True)
+        ]
 
-    # TODO: save/load session
+        try:
+            self._new_session(
+                session.get('config'),
+                navigator=session.get('navigator'),
+                proxy=session.get('proxy'),
+                state=session,
+                scripts=scripts,
+            )
+        except Exception as e:
+            raise PhantomError('Unable to restore the session :: %s' % str(e))
+
+
+    # soft: keeps the web page, clears cookies, the storage of every origin
+    #       navigated by the page (see page.clearStorage) and the memory
+    #       cache, then pushes only the changed settings
+    #       * omitted :config/:navigator/:proxy are kept, :proxy=False resets it
+    # hard: the same as new_session()
+    def reset_session(self, config=None, navigator=None, proxy=None, mode='soft'):
+        if mode == 'hard':
+            return self.new_session(config, navigator=navigator, proxy=proxy)
+        elif mode != 'soft':
+            raise ValueError('Unsupported reset :mode: %s' % mode)
+
+        config = self.get_config(config) if config else dict(self.config)
+        navigator = self.get_navigator(navigator) if navigator else self._navigator
+
+        if proxy is None:
+            proxy = self._proxy
+            timezone_offset = self.timezone_offset
+        elif proxy:
+            proxy = self.get_proxy(proxy)
+            if 'timezone_offset' not in proxy and proxy == self._proxy:
+                timezone_offset = self.timezone_offset
+            else:
+                timezone_offset = self._pop_proxy_timezone_offset(proxy)
+        else:
+            proxy = None
+            timezone_offset = None
 
-    config = None
+        if config['screen_size'] and tuple(config['screen_size']) != self.screen:
+            screen = self.get_screen(config['screen_size'])
+        else:
+            screen = self._screen
 
-    def new_session(self, config=None, navigator=None, proxy=None):
-        if self._started:
-            self._cleanup_session()
-            self.start_session(self.desired_capabilities)
+        session_config = self._get_session_config(
+            config, navigator, screen, timezone_offset, poll_port=self._poll_port
+        )
 
-        self.config = dict(DEFAULT_CONFIG)
-        if config:
-            if not isinstance(config, dict):
-                raise TypeError(':config must be dict')
-            for k, v in config.items():
-                if k in self.config:
-                    self.config[k] = v
+        script = [
+            'phantom.clearCookies()',
+            'page.clearStorage()',
+            'page.clearMemoryCache()',
+        ]
 
-        self._navigator = self.get_navigator(navigator)
+        for k, v in session_config.items():
+            if v != self._session_config.get(k):
+                script.append('page.__config__[%s] = %s' % (dumps(k), dumps(v)))
 
-        self.default_headers = None
+        diff = lambda k: session_config[k] != self._session_config.get(k)
 
-        if proxy:
-            proxy = self.get_proxy(proxy)
-            self.timezone_offset = GeoIP.get_timezone_offset_by_ip(
-                proxy['host'], silent=True
+        if diff('javascript_enabled'):
+            script.append(
+                'page.settings.javascriptEnabled = %s'
+                % dumps(session_config['javascript_enabled'])
+            )
+        if diff('load_images'):
+            script.append(
+                'page.settings.loadImages = %s' % dumps(session_config['load_images'])
+            )
+        if diff('resource_timeout'):
+            script.append(
+                'page.settings.resourceTimeout = %s'
+                % dumps(session_config['resource_timeout'])
+            )
+        if diff('record_resources'):
+            script.append(
+                'page.startRecorder(%s)' % dumps(session_config['record_resources'])
+                if session_config['record_resources'] else 'page.stopRecorder()'
+            )
+        if screen is not self._screen:
+            script.append(
+                'page.viewportSize = %s' % dumps(self._get_viewport_size(screen))
             )
-        else:
-            self.timezone_offset = None
 
-        self._screen = self.get_screen(
-            self.config['screen_size'] or weighted_choice(SCREEN_RESOLUTION)
-        )
-        self.execute_phantomjs_script(
-            'page.viewportSize = %s' %
-            dumps({
-                'width': self._screen['window']['innerWidth'],
-                'height': self._screen['window']['innerHeight'],
-            })
-        )
+        if proxy != self._proxy:
+            if proxy:
+                script.append('page._setProxy(%s)' % dumps(proxy))
+            else:
+                script.append('page._resetProxy()')
 
-        if self.config['spoof_flash_plugin']:
-            if self._navigator['__platform__'] not in FLASH_PLUGIN:
-                raise ValueError('Unsupported :navigator for Flash plugin')
-            flash_plugin = FLASH_PLUGIN[self._navigator['__platform__']]
-        else:
-            flash_plugin = None
+        headers = self._get_default_headers(config=config, navigator=navigator)
+        if headers != self._default_headers:
+            script.append('page.customHeaders = %s' % dumps(headers))
 
-        session_config = {
-            '__config__': dumps({
-                'javascript_enabled': self.config['javascript_enabled'],
-                'load_images': self.config['load_images'],
-                'resource_timeout': self.config['resource_timeout'] * 1000,
-                'navigator': dict(
-                    filter(
-                        lambda _: not _[0].startswith('_'),
-                        self._navigator.items()
-                    )
-                ),
-                'screen': self._screen,
-                'spoof_flash_plugin': self.config['spoof_flash_plugin'],
-                'flash_plugin': flash_plugin,
-                'spoof_java_plugin': self.config['spoof_java_plugin'],
-                'spoof_html5_media': self.config['spoof_html5_media'],
-                'timezone_offset': self.timezone_offset,
-            }),
-            '__getMockDate__': JS['date'],
-        }
+        if bool(config['cookies_enabled']) != self._cookies_enabled:
+            script.append(
+                'phantom.cookiesEnabled = %s' % dumps(bool(config['cookies_enabled']))
+            )
 
-        self.execute_phantomjs_script(JS['base'] % session_config)
+        if diff('block_resources'):
+            script.append('page.setBlockRules(page.__config__.block_resources)')
 
-        if proxy:
-            self._set_proxy(proxy, set_timezone=False)
-        elif self._started:
-            self._reset_proxy(reset_timezone=False)
+        # the page is re-initialized with the new config
+        script.append(
+            'page.setContent("<html><head></head><body></body></html>", %s)'
+            % dumps(BLANK_URL)
+        )
 
-        self.cookies_enabled = self.config['cookies_enabled']
-        self.load_stylesheets = self.config['load_stylesheets']
+        try:
+            self.execute_phantomjs_script(';\n'.join(script))
+        except Exception as e:
+            raise PhantomError('Unable to reset the session :: %s' % str(e))
+
+        self.config = config
+        self._navigator = navigator
+        self._screen = screen
+        self._proxy = proxy
+        self.timezone_offset = timezone_offset
+        self._default_headers = headers
+        self._cookies_enabled = bool(config['cookies_enabled'])
+        self._load_stylesheets = bool(config['load_stylesheets'])
+        self._session_config = session_config
 
         self.page_load_timeout = self.config['page_load_timeout']
         self.page_load_attempts = self.config['page_load_attempts']
         self.xpath_timeout = self.config['xpath_timeout']
 
-        self.history = []
+        self._reset_timeline()
 
 
     def _cleanup_session(self):
-        self.clear_http_cache()
-        #self.clear_local_storage()
-
         # TODO: what?
         try:
-            self.execute_phantomjs_script('page.close()')
+            with self.phantom_batch():
+                self.clear_http_cache()
+                #self.clear_local_storage()
+                self.execute_phantomjs_script('page.stopPollServer(); page.close()')
         except Exception as e:
             raise PhantomError('Unable to close the web page :: %s' % str(e))
 
@@ -432,13 +1531,6 @@ class Phantom(PhantomJS):
         open(self.driver_log_path, 'w')
 
         rmtree(self.driver_profile['local_storage_path'], ignore_errors=True)
-        os.makedirs(self.driver_profile['local_storage_path'])
-
-    # def save_session(self, path):
-    #     pass
-
-    # def load_session(self, path):
-    #     pass
 
     def clear_http_cache(self):
         try:
@@ -479,10 +1571,7 @@ class Phantom(PhantomJS):
                 self._default_headers.items()
             )
         )
-        upd.update(DEFAULT_HEADERS)
-        upd.update(self.config.get('default_headers') or {})
-        upd['User-Agent'] = self.user_agent
-        upd.update(headers)
+        upd.update(self._get_default_headers(headers))
         self.update_default_headers(upd)
 
 
@@ -530,47 +1619,26 @@ class Phantom(PhantomJS):
     @navigator.setter
     def navigator(self, config):
         navigator = self.get_navigator(config)
+        session_navigator = dict(
+            filter(
+                lambda _: not _[0].startswith('_'),
+                navigator.items()
+            )
+        )
 
         try:
             self.execute_phantomjs_script(
-                'page.setNavigator(%s)' %
-                dumps(
-                    dict(
-                        filter(
-                            lambda _: not _[0].startswith('_'),
-                            navigator.items()
-                        )
-                    )
-                )
+                'page.__config__.navigator = %s; page.setNavigator(page.__config__.navigator)'
+                % dumps(session_navigator)
             )
         except Exception as e:
             raise PhantomError('Unable to set the navigator :: %s' % str(e))
 
+        self._session_config['navigator'] = session_navigator
         self._navigator = navigator
         self.set_default_header('User-Agent', self._navigator['userAgent'])
 
 
-    def get_navigator(self, config=None):
-        if config is None:
-            config = self.generate_navigator()
-
-        elif isinstance(config, dict):
-            for key in ('platform', 'userAgent', '__name__', '__platform__'):
-                if not config.get(key):
-                    raise ValueError(
-                        "No '%s' value in the :navigator's config" % key
-                    )
-
-        else:
-            raise TypeError(":navigator's config must be dict")
-
-        return dict(config)
-
-
-    def generate_navigator(self, platform=None, navigator=None):
-        return generate_navigator(platform=platform, navigator=navigator)
-
-
     # TODO: setter
     @property
     def user_agent(self):
@@ -600,21 +1668,27 @@ class Phantom(PhantomJS):
     def _set_proxy(self, config, set_timezone=True):
         proxy = self.get_proxy(config)
 
+        if set_timezone:
+            timezone_offset = self._pop_proxy_timezone_offset(proxy)
+        else:
+            proxy.pop('timezone_offset', None)
+            timezone_offset = None
+
         try:
-            self.execute_phantomjs_script('page._setProxy(%s)' % dumps(proxy))
-            self._proxy = proxy
+            with self.phantom_batch():
+                self.execute_phantomjs_script('page._setProxy(%s)' % dumps(proxy))
+                if timezone_offset is not None:
+                    self.execute_phantomjs_script(
+                        'page.__config__.timezone_offset = %s; page.setTimezone(%s)'
+                        % (timezone_offset, timezone_offset)
+                    )
         except Exception as e:
             raise PhantomError('Unable to set the proxy :: %s' % str(e))
 
-        # only works for IPv4 hosts
-        if set_timezone and proxy['host'] != 'localhost':
-            timezone_offset = GeoIP.get_timezone_offset_by_ip(proxy['host'], silent=True)
-            if timezone_offset is not None:
-                try:
-                    self.execute_phantomjs_script('page.setTimezone(%s)' % timezone_offset)
-                    self.timezone_offset = timezone_offset
-                except Exception as e:
-                    raise PhantomError('Unable to set the timezone :: %s' % str(e))
+        self._proxy = proxy
+        if timezone_offset is not None:
+            self.timezone_offset = timezone_offset
+            self._session_config['timezone_offset'] = timezone_offset
 
 
     def _reset_proxy(self, reset_timezone=True):
@@ -625,74 +1699,15 @@ class Phantom(PhantomJS):
             raise PhantomError('Unable to reset the proxy :: %s' % str(e))
         if reset_timezone:
             try:
-                self.execute_phantomjs_script('page.resetTimezone()')
+                self.execute_phantomjs_script(
+                    'page.__config__.timezone_offset = null; page.resetTimezone()'
+                )
                 self.timezone_offset = None
+                self._session_config['timezone_offset'] = None
             except Exception as e:
                 raise PhantomError('Unable to reset the timezone :: %s' % str(e))
 
 
-    def get_proxy(self, config=None):
-        if config is None:
-            return
-
-        elif isinstance(config, basestring):
-            proxy_url = regex.RE.PROXY_URL.match(config)
-            if not proxy_url:
-                raise ValueError('Unsupported proxy URL: %s' % config)
-            proxy = proxy_url.groupdict()
-            proxy['type'] = proxy['type'] or 'http'
-
-        elif isinstance(config, dict):
-            proxy = {}
-
-            proxy['type'] = config.get('type') or config.get('proxy_type')
-
-            if not proxy['type']:
-                proxy['type'] = 'http'
-            elif not isinstance(proxy['type'], basestring):
-                raise TypeError('Proxy :type must be string')
-            elif not regex.RE.PROXY_TYPE.match(proxy['type']):
-                raise ValueError('Unsupported proxy type: %s' % proxy['type'])
-
-            proxy['host'] = config.get('host') or config.get('ip') or config.get('server')
-
-            if not isinstance(proxy['host'], basestring):
-                raise TypeError('Proxy :host must be string')
-            elif not (proxy['host'] == 'localhost' or regex.RE.IPv4.match(proxy['host'])):
-                raise ValueError('Unsupported proxy host: %s' % proxy['host'])
-
-            proxy['port'] = config.get('port')
-
-            if isinstance(proxy['port'], int):
-                proxy['port'] = str(proxy['port'])
-            elif not isinstance(proxy['port'], basestring):
-                raise TypeError('Proxy :port must be string or int')
-            if not regex.RE.PORT.match(proxy['port']):
-                raise ValueError('Unsupported proxy port: %s' % proxy['port'])
-
-            proxy_user = config.get('user') or config.get('login')
-            proxy_passwd = config.get('passwd') or config.get('password')
-
-            if proxy_user is not None and proxy_passwd is not None:
-                if not (isinstance(proxy_user, basestring) and proxy_user):
-                    raise TypeError('Proxy :user must be non-empty string')
-                elif not (isinstance(proxy_passwd, basestring) and proxy_passwd):
-                    raise TypeError('Proxy :password must be non-empty string')
-                proxy['user'] = proxy_user
-                proxy['passwd'] = proxy_passwd
-
-        else:
-            raise TypeError('Proxy must be set by URL or dict config')
-
-        proxy_type = proxy['type'].lower()
-        if proxy_type.startswith('http'):
-            proxy_type = 'http'
-        elif proxy_type == 'socks':
-            proxy_type = 'socks5'
-        proxy['type'] = proxy_type
-
-        return proxy
-
     # ************************************************************************
     # :: cookies ::
     # ************************************************************************
@@ -717,9 +1732,86 @@ class Phantom(PhantomJS):
                 raise PhantomError('Unable to change cookies settings :: %s' % str(e))
 
 
+    # the whole cookie jar (all domains)
     @property
     def cookies(self):
-        return self.get_cookies()
+        return self.export_cookies()
+
+
+    # JS filter of cookies by :domain (incl. subdomains) and :name
+    @staticmethod
+    def _get_cookies_filter(domain=None, name=None):
+        filters = {}
+        for key, value in (('domain', domain), ('name', name)):
+            if value is None:
+                continue
+            elif isinstance(value, basestring):
+                value = [value]
+            elif not (
+                isinstance(value, (list, tuple, set)) and
+                all([isinstance(_, basestring) for _ in value])
+            ):
+                raise TypeError(':%s must be string, list of strings or None' % key)
+            filters[key] = [_.lstrip('.').lower() if key == 'domain' else _ for _ in value]
+
+        return (
+            'function(cookie) {'
+            '  var filters = %s;'
+            '  var domain = (cookie.domain || "").replace(/^\\./, "").toLowerCase();'
+            '  return ('
+            '    (!filters.domain || filters.domain.some(function(d) {'
+            '      return domain === d || domain.slice(-d.length - 1) === "." + d;'
+            '    })) &&'
+            '    (!filters.name || filters.name.indexOf(cookie.name) > -1)'
+            '  );'
+            '}'
+        ) % dumps(filters)
+
+
+    # all the cookies (or filtered ones) by a single PhantomJS call
+    def export_cookies(self, domain=None, name=None):
+        script = 'return phantom.cookies'
+        if domain is not None or name is not None:
+            script += '.filter(%s)' % self._get_cookies_filter(domain, name)
+        try:
+            return self.execute_phantomjs_script(script)
+        except Exception as e:
+            raise PhantomError('Unable to export cookies :: %s' % str(e))
+
+
+    # adds cookies (e.g. exported ones) by a single PhantomJS call
+    # * clear: delete all the cookies before
+    # * returns the number of the added cookies
+    def import_cookies(self, cookies, domain=None, name=None, clear=False):
+        script = self._get_cookies_import_script(cookies, domain, name, clear)
+        try:
+            return self.execute_phantomjs_script(script)
+        except Exception as e:
+            raise PhantomError('Unable to import cookies :: %s' % str(e))
+
+
+    def _get_cookies_import_script(self, cookies, domain=None, name=None, clear=False):
+        if not (
+            isinstance(cookies, (list, tuple)) and
+            all([isinstance(_, dict) for _ in cookies])
+        ):
+            raise TypeError(':cookies must be list of dicts')
+
+        script = []
+        if clear:
+            script.append('phantom.clearCookies();')
+        script.append('var cookies = %s;' % dumps(list(cookies)))
+        if domain is not None or name is not None:
+            script.append(
+                'cookies = cookies.filter(%s);'
+                % self._get_cookies_filter(domain, name)
+            )
+        script.append(
+            'return cookies.filter(function(cookie) {'
+            '  return phantom.addCookie(cookie);'
+            '}).length;'
+        )
+        return '\n'.join(script)
 
 
     # _add_cookie = PhantomJS.add_cookie
@@ -799,11 +1891,56 @@ class Phantom(PhantomJS):
     #     self.open_blank_page()
     #     self.delete_all_cookies()
 
-    # def save_cookies(self):
-    #     pass
+    # ************************************************************************
+    # :: resources ::
+    # ************************************************************************
+
+    # (re)starts recording the last :size resources of the page
+    # or stops the recorder if :size is 0
+    def record_resources(self, size):
+        if not isinstance(size, int):
+            raise TypeError(':size must be int')
+        elif size < 0:
+            raise ValueError(':size must be >= 0')
+
+        try:
+            self.execute_phantomjs_script(
+                'page.__config__.record_resources = %s; %s'
+                % (
+                    size,
+                    'page.startRecorder(%s)' % size if size else 'page.stopRecorder()',
+                )
+            )
+        except Exception as e:
+            raise PhantomError('Unable to set the resources recorder :: %s' % str(e))
+
+        self.config['record_resources'] = size
+        self._session_config['record_resources'] = size
+
+
+    # the recorded resources (from the oldest one):
+    # url, method, status, content_type, size, error, start/received/end (in ms)
+    # * size: Content-Length or the first chunk's size
+    # * clear: empty the recorder's buffer
+    def resources(self, clear=False):
+        try:
+            resources = self.execute_phantomjs_script(
+                'return page.getResources(%s)' % dumps(bool(clear))
+            )
+        except Exception as e:
+            raise PhantomError('Unable to get the recorded resources :: %s' % str(e))
+
+        if resources is None:
+            raise PhantomError('The resources recorder is off')
 
-    # def load_cookies(self):
-    #     pass
+        return resources
+
+
+    # HAR 1.2 log of the recorded resources
+    def export_har(self, resources=None):
+        if resources is None:
+            resources = self.resources()
+        return self.get_har(resources)
 
     # ************************************************************************
     # :: CSS stylesheets ::
@@ -820,14 +1957,55 @@ class Phantom(PhantomJS):
         value = bool(value)
         if value != self._load_stylesheets:
             try:
-                self.execute_phantomjs_script(
-                    'page.%sCallback(page.onResourceRequestedCallbacks, page.skipCSS)' %
-                    ('remove' if value else 'add')
-                )
+                self._set_block_rules(self.config['block_resources'], value)
                 self._load_stylesheets = value
             except Exception as e:
                 raise PhantomError('Unable to change CSS settings :: %s' % str(e))
 
+    # ************************************************************************
+    # :: blocking ::
+    # ************************************************************************
+
+    # blocks the requests matching any of the rules (or unblocks all of them):
+    # * hosts: the hosts (incl. subdomains), e.g. 'doubleclick.net'
+    # * urls: URL globs, e.g. '*/ads/*'
+    # * types: resource types (by file extension): stylesheet, script, image,
+    #   font, media
+    # * the page itself is never blocked
+    # * see blocked_resources() or http_meta['blocked'] for the counts
+    def block_resources(self, hosts=None, urls=None, types=None):
+        rules = dict(
+            filter(
+                lambda _: _[1],
+                (('hosts', hosts), ('urls', urls), ('types', types))
+            )
+        ) or None
+        try:
+            self._set_block_rules(rules, self.load_stylesheets)
+        except (TypeError, ValueError):
+            raise
+        except Exception as e:
+            raise PhantomError('Unable to set the blocking rules :: %s' % str(e))
+        self.config['block_resources'] = rules
+
+
+    def _set_block_rules(self, rules, load_stylesheets):
+        block_rules = self._get_block_rules(rules, load_stylesheets)
+        self.execute_phantomjs_script(
+            'page.__config__.block_resources = %s; '
+            'page.setBlockRules(page.__config__.block_resources)'
+            % dumps(block_rules)
+        )
+        self._session_config['block_resources'] = block_rules
+
+
+    # the number of the page's blocked requests: total and by the rule
+    def blocked_resources(self):
+        try:
+            return self.execute_phantomjs_script('return page.blocked')
+        except Exception as e:
+            raise PhantomError('Unable to get the blocked requests :: %s' % str(e))
+
     # ************************************************************************
     # :: screen ::
     # ************************************************************************
@@ -846,66 +2024,22 @@ class Phantom(PhantomJS):
 
         try:
             self.execute_phantomjs_script(
-                'page.viewportSize = %s' %
-                dumps({
-                    'width': self._screen['window']['innerWidth'],
-                    'height': self._screen['window']['innerHeight'],
-                })
+                'page.viewportSize = %s' % dumps(self._get_viewport_size(self._screen))
             )
 
             # self.set_window_size(
-            #     self._screen['window']['innerWidth'],
-            #     self._screen['window']['innerHeight'],
-            # )
-
-            self.execute_phantomjs_script(
-                'page.setScreen(%s)' % dumps(self._screen)
-            )
-        except Exception as e:
-            raise PhantomError('Unable to set the viewport size :: %s' % str(e))
-
-
-    def get_screen(self, size=None):
-        if size is None:
-            size = weighted_choice(SCREEN_RESOLUTION)
-        elif not (
-            isinstance(size, (list, tuple)) and len(size) == 2 and
-            isinstance(size[0], int) and isinstance(size[1], int)
-        ):
-            raise TypeError('Screen size must be tuple (int:width, int:height)')
+            #     self._screen['window']['innerWidth'],
+            #     self._screen['window']['innerHeight'],
+            # )
 
-        width = max(300, size[0]) # ?
-        height = max(300, size[1]) # ?
+            self.execute_phantomjs_script(
+                'page.__config__.screen = %s; page.setScreen(page.__config__.screen)'
+                % dumps(self._screen)
+            )
+            self._session_config['screen'] = self._screen
+        except Exception as e:
+            raise PhantomError('Unable to set the viewport size :: %s' % str(e))
 
-        screen = {}
-        screen['width'] = width
-        screen['height'] = height
-        screen['color_depth'] = SCREEN_COLOR_DEPTH
-        screen['os_taskbar_height'] = choice(OS_TASKBAR_HEIGHT)
-        screen['browser_taskbar_height'] = choice(BROWSER_TASKBAR_HEIGHT)
-        screen['window.screen'] = {}
-        screen['window.screen']['width'] = screen['width']
-        screen['window.screen']['height'] = screen['height']
-        screen['window.screen']['availWidth'] = screen['window.screen']['width']
-        screen['window.screen']['availHeight'] = (
-            screen['window.screen']['height'] - screen['os_taskbar_height']
-        )
-        screen['window.screen']['availLeft'] = 0
-        screen['window.screen']['availTop'] = screen['os_taskbar_height']
-        screen['window.screen']['colorDepth'] = screen['color_depth']
-        screen['window.screen']['pixelDepth'] = screen['color_depth']
-        screen['window'] = {}
-        screen['window']['outerWidth'] = screen['window.screen']['availWidth']
-        screen['window']['outerHeight'] = screen['window.screen']['availHeight']
-        screen['window']['innerWidth'] = (
-            screen['window']['outerWidth'] - choice(BROWSER_SCROOLBAR_WIDTH)
-        )
-        screen['window']['innerHeight'] = (
-            screen['window']['outerHeight'] - screen['browser_taskbar_height']
-        )
-        screen['window']['screenX'] = 0
-        screen['window']['screenY'] = screen['window.screen']['availTop']
-        return screen
 
     # ************************************************************************
     # :: selectors ::
@@ -928,6 +2062,163 @@ class Phantom(PhantomJS):
         if not isinstance(elem, WebElement):
             raise TypeError(':elem must be an instance of WebElement')
 
+
+    # the elements matched by the XPath or CSS selector (see parse_selector)
+    # evaluated in the page (the compiled XPath expressions are cached)
+    # * timeout: waits for the first match by the long-poll
+    #   (the driver's implicit wait isn't touched), default: xpath_timeout
+    def select(self, selector, timeout=None):
+        _selector = parse_selector(selector)
+
+        if timeout is None:
+            timeout = self.xpath_timeout
+        elif not isinstance(timeout, (int, float)):
+            raise TypeError(':timeout must be int, float or None')
+        elif timeout < 0:
+            raise ValueError(':timeout must be >= 0')
+
+        try:
+            elems = self.execute_script(JS['select'], _selector)
+            if not elems and timeout > 0:
+                result = self._long_poll(
+                    'select', timeout, selector=_selector, interval=SELECT_POLL_INTERVAL
+                )
+                if result['ok']:
+                    elems = self.execute_script(JS['select'], _selector)
+            return elems
+        except Exception as e:
+            raise PhantomError(
+                'Unable to select elements by "%s" :: %s' % (selector, str(e))
+            )
+
+
+    # * field: a selector (the text of the first match, see parse_selector) or dict:
+    #   select (default: the row itself), attr ('text', 'html' or the name,
+    #   default: 'text'), prop (the DOM property, e.g. the absolute 'href'),
+    #   all (the list of all the matches), fields (the nested fields)
+    def _get_extract_fields(self, fields):
+        if not (isinstance(fields, dict) and fields):
+            raise TypeError(':fields must be non-empty dict')
+
+        _fields = {}
+        for name, field in fields.items():
+            if isinstance(field, basestring):
+                field = {'select': field}
+            elif not isinstance(field, dict):
+                raise TypeError('Field "%s" must be selector or dict' % name)
+
+            _field = {
+                'select': parse_selector(field['select']) if field.get('select') else None,
+                'all': bool(field.get('all')),
+                'attr': field.get('attr') or 'text',
+                'prop': field.get('prop'),
+                'fields': None,
+            }
+            if not isinstance(_field['attr'], basestring):
+                raise TypeError('Field "%s" :attr must be string' % name)
+            elif _field['prop'] is not None and not isinstance(_field['prop'], basestring):
+                raise TypeError('Field "%s" :prop must be string' % name)
+            if field.get('fields'):
+                _field['fields'] = self._get_extract_fields(field['fields'])
+            _fields[name] = _field
+
+        return _fields
+
+
+    # extracts the fields of the page by one script
+    # (instead of a WebDriver call per element and value)
+    # * spec: {'rows': selector, 'fields': {name: field}}
+    #   without :rows the fields are extracted from the document
+    # * returns the list of the rows' dicts (or the dict)
+    #
+    # >>> phantom.extract({
+    # ...     'rows': 'css:div.item',
+    # ...     'fields': {
+    # ...         'title': 'css:h2',
+    # ...         'url': {'select': './/a', 'prop': 'href'},
+    # ...         'tags': {'select': 'css:.tag', 'all': True},
+    # ...     },
+    # ... })
+    def extract(self, spec):
+        if not isinstance(spec, dict):
+            raise TypeError(':spec must be dict')
+
+        _spec = {
+            'rows': parse_selector(spec['rows']) if spec.get('rows') else None,
+            'fields': self._get_extract_fields(spec.get('fields')),
+        }
+
+        try:
+            return self.execute_script(JS['extract'], _spec)
+        except Exception as e:
+            raise PhantomError('Unable to extract the fields :: %s' % str(e))
+
+
+    # yields the items of an infinite scroll page: the page is scrolled down
+    # in-page until no new items matching :item_selector appear
+    # for :max_idle_ms, the new items are collected by MutationObserver
+    # from the added nodes only (see js/harvest.js for XPath)
+    # * fields: the item's fields (see extract), None: the item's outerHTML
+    # * the items are fetched by :batch_size per an async script
+    #   (or less if the script runs for HARVEST_BATCH_TIMEOUT + :max_idle_ms)
+    #
+    # >>> for item in phantom.harvest_scroll('css:article', 100, 2000,
+    # ...                                     fields={'title': 'css:h2'}):
+    # ...     save(item)
+    def harvest_scroll(self, item_selector, max_items=None, max_idle_ms=2000,
+                       fields=None, batch_size=100):
+        selector = parse_selector(item_selector)
+
+        if max_items is not None and not isinstance(max_items, int):
+            raise TypeError(':max_items must be int or None')
+        elif not isinstance(max_idle_ms, int):
+            raise TypeError(':max_idle_ms must be int')
+        elif max_idle_ms <= 0:
+            raise ValueError(':max_idle_ms must be > 0')
+        elif not isinstance(batch_size, int):
+            raise TypeError(':batch_size must be int')
+        elif batch_size < 1:
+            raise ValueError(':batch_size must be > 0')
+
+        _fields = self._get_extract_fields(fields) if fields is not None else None
+
+        # the idle timeout must fit into the batch's deadline
+        deadline_ms = max_idle_ms + HARVEST_BATCH_TIMEOUT
+        self._ensure_script_timeout(deadline_ms / 1000.0 + LONG_POLL_MARGIN)
+
+        try:
+            self.execute_script(
+                JS['harvest'], 'start', selector, _fields, JS['extract'], JS['select']
+            )
+        except Exception as e:
+            raise PhantomError('Unable to start harvesting :: %s' % str(e))
+
+        harvested = 0
+        try:
+            while max_items is None or harvested < max_items:
+                size = batch_size
+                if max_items is not None:
+                    size = min(size, max_items - harvested)
+
+                try:
+                    batch = self.execute_async_script(
+                        JS['harvest'], 'next', max_idle_ms, size, deadline_ms
+                    )
+                except Exception as e:
+                    raise PhantomError('Unable to harvest the items :: %s' % str(e))
+
+                for item in batch['items']:
+                    harvested += 1
+                    yield item
+
+                if batch['done']:
+                    break
+        finally:
+            try:
+                self.execute_script(JS['harvest'], 'stop')
+            except Exception:
+                pass
+
     # ************************************************************************
     # :: windows/popus/alers ::
     # ************************************************************************
@@ -1002,6 +2293,18 @@ class Phantom(PhantomJS):
                 raise PhantomError('Unable to set :page_load_timeout :: %s' % str(e))
 
 
+    # async scripts timeout (only raised when needed, see wait_for)
+    _script_timeout = None
+
+    def _ensure_script_timeout(self, value):
+        if self._script_timeout is None or self._script_timeout < value:
+            try:
+                self.set_script_timeout(value)
+                self._script_timeout = value
+            except Exception as e:
+                raise PhantomError('Unable to set the script timeout :: %s' % str(e))
+
+
     # XPATH selector timeout (implicitly_wait)
     _xpath_timeout = None
 
@@ -1026,22 +2329,6 @@ class Phantom(PhantomJS):
     # :: navigation ::
     # ************************************************************************
 
-    _history = None
-
-    @property
-    def history(self):
-        return self._history
-
-    @history.setter # ?
-    def history(self, value):
-        if not value:
-            self._history = []
-        elif not isinstance(value, list):
-            raise TypeError(':history must be list')
-        else:
-            self._history = value
-
-
     @property
     def url(self):
         return URL(self.current_url) if not self.blank_state() else None
@@ -1063,62 +2350,96 @@ class Phantom(PhantomJS):
         self._page_load_attempts = value
 
 
+    # None - RetryPolicy() with :page_load_attempts
+    _retry_policy = None
+    _default_retry_policy = None
+
+    @property
+    def retry_policy(self):
+        return self._retry_policy
+
+    @retry_policy.setter
+    def retry_policy(self, value):
+        if value is not None and not isinstance(value, RetryPolicy):
+            raise TypeError(':retry_policy must be RetryPolicy or None')
+        self._retry_policy = value
+
+
+    # retries :action (returning the request URL or None if nothing
+    # is loaded) by the retry policy, the errors are classified by the
+    # page's http_meta (see RetryPolicy.classify)
+    # * :attempts overrides the policy's attempts
+    # * returns the request URL and the raw http_meta of the last attempt
+    def _navigate(self, action, attempts=None):
+        policy = self.retry_policy
+        if policy is None:
+            if self._default_retry_policy is None:
+                self._default_retry_policy = RetryPolicy()
+            policy = self._default_retry_policy
+
+        if attempts is None:
+            attempts = policy.attempts or self.page_load_attempts
+
+        def attempt():
+            try:
+                request_url = action()
+            except Exception as e:
+                return None, self._get_raw_http_meta(), e
+            if not request_url:
+                return None, None, None
+            return request_url, self._get_raw_http_meta(), None
+
+        return policy.execute(self, attempt, attempts)
+
+
+    def _get_raw_http_meta(self):
+        try:
+            return self.execute_phantomjs_script('return page.getHttpMeta()')
+        except Exception:
+            return None
+
+
+    # blocks until the next page load (started within the context) is finished
+    # * base.js counts the finished page loads (page.navigation.seq)
     # TODO: SPA clicks
     @contextmanager
-    def _wait_for_page_load(self, timeout, poll_timeout=0.1):
-        old_page_html = self.xpath('html', timeout=0)
-        if not old_page_html:
-            raise PhantomError('<html> element cannot be found on the page')
+    def _wait_for_page_load(self, timeout):
+        seq = self.execute_phantomjs_script('return page.navigation.seq')
 
-        timestamp = time() + timeout
-        # | ?
         yield
 
-        while time() < timestamp:
-            sleep(poll_timeout)
-
-            page_html = self.xpath('html', timeout=0)
-            if (
-                page_html and
-                page_html[0].id != old_page_html[0].id and
-                self.ready_state() # rly?
-                ):
-                return
-
-        raise PhantomError('Page load timeout after %s seconds' % timeout)
+        if not self._long_poll('load', timeout, seq=seq)['ok']:
+            raise PhantomError('Page load timeout after %s seconds' % timeout)
 
 
+    # the wrapped methods return the http_meta: request, response,
+    # blocked (see block_resources), budget: bytes, requests (incl. the
+    # cut ones), cut and exceeded ('bytes' or 'requests', see DEFAULT_CONFIG)
+    # and timing (see timeline)
     def _network_request(func):
 
         @wraps(func)
         def wrapper(self, *args, **kwargs):
+            self.navigations += 1
+
+            # the request URL or (request URL, raw http_meta) (see _navigate)
             request_url = func(self, *args, **kwargs)
+            if isinstance(request_url, tuple):
+                request_url, http_meta = request_url
+            else:
+                http_meta = None
+
             if not request_url:
                 return
             elif request_url == BLANK_URL:
                 # self.history.append(BLANK_URL)
                 return
 
-            http_meta = self.execute_phantomjs_script('return page.httpMeta')
-            # TODO: 304?
-            if not (http_meta and http_meta.get('response')):
-                raise PhantomError('Unable to load URL: %s' % request_url)
-
-            http_meta['request']['url'] = request_url
-
-            self.history.append(http_meta['response']['url'])
-
-            for r in http_meta:
-                # TODO: ordered dict
-                http_meta[r]['headers'] = dict(
-                    [(h['name'], h['value']) for h in http_meta[r]['headers']]
-                )
+            if http_meta is None:
+                http_meta = self.execute_phantomjs_script('return page.getHttpMeta()')
+            http_meta = self._get_http_meta(http_meta, request_url)
 
-            # i don't give a shit about the trailing slash
-            if http_meta['response']['url'].rstrip('/') != request_url.rstrip('/'):
-                http_meta['response']['redirect'] = True
-            else:
-                http_meta['response']['redirect'] = False
+            self._add_navigation(http_meta)
 
             return http_meta
 
@@ -1158,31 +2479,271 @@ class Phantom(PhantomJS):
             )
 
 
+    # the rendered DOM serialized by one script for the local querying
+    # (see DOMSnapshot)
+    # * visibility: the elements' visibility is marked (see DOMSnapshot.visible)
+    def snapshot(self, visibility=False):
+        try:
+            html = self.execute_script(
+                JS['snapshot'], VISIBLE_ATTR if visibility else None
+            )
+        except Exception as e:
+            raise PhantomError('Unable to take a snapshot of the page :: %s' % str(e))
+
+        return DOMSnapshot(
+            html,
+            url=self.current_url if not self.blank_state() else None,
+            visibility=visibility
+        )
+
+
+    # blocks until the first of the :selectors (see parse_selector) gets to
+    # the :state: 'present', 'visible' or 'gone' (no matches)
+    # * the page's DOM changes are observed by MutationObserver within
+    #   one async script
+    # * returns {'selector': the selector, 'elements': its matches}
+    def wait_for(self, selectors, state='present', timeout=None):
+        if isinstance(selectors, basestring):
+            selectors = [selectors]
+        elif not (isinstance(selectors, (list, tuple)) and selectors):
+            raise TypeError(':selectors must be string or non-empty list')
+        _selectors = [parse_selector(selector) for selector in selectors]
+
+        if state not in WAIT_FOR_STATES:
+            raise ValueError('Unsupported :state: %s' % state)
+
+        if timeout is None:
+            timeout = self.page_load_timeout
+        elif not isinstance(timeout, (int, float)):
+            raise TypeError(':timeout must be int, float or None')
+        elif timeout <= 0:
+            raise ValueError(':timeout must be > 0')
+
+        self._ensure_script_timeout(timeout + LONG_POLL_MARGIN)
+
+        try:
+            result = self.execute_async_script(
+                JS['wait_for'], _selectors, state, int(timeout * 1000), JS['select']
+            )
+        except Exception as e:
+            raise PhantomError(
+                'Unable to wait for %s :: %s' % (', '.join(selectors), str(e))
+            )
+
+        if result is None:
+            raise PhantomError(
+                'Timeout after %s seconds waiting for %s to be %s'
+                % (timeout, ', '.join(selectors), state)
+            )
+
+        return {
+            'selector': selectors[result['index']],
+            'elements': result['elements'],
+        }
+
+
+    # blocks until there are no more than :max_inflight requests in flight
+    # for :quiet_ms milliseconds (failed and timed out requests are finished)
+    # * returns the page's stats: time (waited, in seconds), inflight and
+    #   requests (since the page load started)
+    def wait_for_network_idle(self, quiet_ms=500, max_inflight=0, timeout=None):
+        if not isinstance(quiet_ms, int):
+            raise TypeError(':quiet_ms must be int')
+        elif quiet_ms < 0:
+            raise ValueError(':quiet_ms must be >= 0')
+        elif not isinstance(max_inflight, int):
+            raise TypeError(':max_inflight must be int')
+        elif max_inflight < 0:
+            raise ValueError(':max_inflight must be >= 0')
+
+        if timeout is None:
+            timeout = self.page_load_timeout
+        elif not isinstance(timeout, (int, float)):
+            raise TypeError(':timeout must be int, float or None')
+        elif timeout <= 0:
+            raise ValueError(':timeout must be > 0')
+
+        result = self._long_poll(
+            'network_idle', timeout, quiet_ms=quiet_ms, max_inflight=max_inflight
+        )
+        if not result['ok']:
+            raise PhantomError(
+                'Network idle timeout after %s seconds (%s requests in flight)'
+                % (timeout, result['stats']['inflight'])
+            )
+
+        return result['stats']
+
+
     @_network_request
     def open(self, url, timeout=None, attempts=None, headers=None):
         if not isinstance(url, basestring):
             raise TypeError(':url must be string')
 
+        def action():
+            self.get(url)
+            return url
+
         with custom_value(self, 'default_headers', headers):
             with custom_value(self, 'page_load_timeout', timeout):
                 with custom_value(self, 'page_load_attempts', attempts):
-                    attempts = self.page_load_attempts
                     try:
-                        while attempts:
-                            attempts -= 1
-                            try:
-                                self.get(url)
-                                return url
-                            except Exception:
-                                if attempts > 0:
-                                    continue
-                                raise
+                        return self._navigate(action, attempts)
                     except Exception as e:
                         raise PhantomError(
                             'Unable to load URL: %s :: %s' % (url, str(e))
                         )
 
 
+    # ************************************************************************
+    # :: lite HTTP ::
+    # ************************************************************************
+
+    # requests.Session (i.e. pooled connections) by the proxy URL
+    _fetch_sessions = None
+
+    # a plain HTTP request from Python (without rendering) within the session:
+    # default headers (incl. User-Agent), proxy and cookies are shared
+    # with the driver, Set-Cookie results are written back into its jar
+    # * returns the same http_meta as open() + response's content and text
+    # * the web page isn't changed (neither is the history)
+    def fetch(self, url, method='GET', data=None, headers=None, timeout=None,
+              allow_redirects=True):
+        if requests is None:
+            raise PhantomError(
+                'Requests is required (https://pypi.python.org/pypi/requests)'
+            )
+        elif not isinstance(url, basestring):
+            raise TypeError(':url must be string')
+        elif headers is not None and not isinstance(headers, dict):
+            raise TypeError(':headers must be dict')
+
+        if timeout is None:
+            timeout = self.page_load_timeout
+
+        request_headers = self.default_headers
+        request_headers.update(headers or {})
+
+        try:
+            cookies = RequestsCookieJar()
+            for cookie in self.export_cookies(domain=self._get_parent_domains(url)):
+                cookies.set_cookie(
+                    create_cookie(
+                        cookie['name'],
+                        cookie['value'],
+                        domain=cookie.get('domain', ''),
+                        path=cookie.get('path', '/'),
+                        secure=bool(cookie.get('secure')),
+                        expires=cookie.get('expiry'),
+                        rest={'HttpOnly': None} if cookie.get('httponly') else {},
+                    )
+                )
+
+            session = self._get_fetch_session()
+            try:
+                response = session.request(
+                    method,
+                    url,
+                    data=data,
+                    headers=request_headers,
+                    cookies=cookies,
+                    timeout=timeout,
+                    allow_redirects=allow_redirects,
+                    verify=not self.driver_profile.get('ignore_ssl_errors'),
+                )
+            finally:
+                # the driver's cookie jar is the only one
+                session.cookies.clear()
+
+            set_cookies = [
+                {
+                    'name': cookie.name,
+                    'value': cookie.value,
+                    'domain': cookie.domain,
+                    'path': cookie.path,
+                    'secure': cookie.secure,
+                    'httponly': cookie.has_nonstandard_attr('HttpOnly'),
+                    'expiry': cookie.expires,
+                }
+                for r in response.history + [response]
+                for cookie in r.cookies
+            ]
+            if set_cookies:
+                self.import_cookies(set_cookies)
+
+        except PhantomError:
+            raise
+        except Exception as e:
+            raise PhantomError('Unable to fetch URL: %s :: %s' % (url, str(e)))
+
+        request = (response.history[0] if response.history else response).request
+        http_meta = self._get_http_meta(
+            {
+                'request': {
+                    'method': request.method,
+                    'headers': [
+                        {'name': k, 'value': v} for k, v in request.headers.items()
+                    ],
+                },
+                'response': {
+                    'url': response.url,
+                    'status_code': response.status_code,
+                    'headers': [
+                        {'name': k, 'value': v} for k, v in response.headers.items()
+                    ],
+                },
+            },
+            url
+        )
+        http_meta['response']['content'] = response.content
+        http_meta['response']['text'] = response.text
+
+        return http_meta
+
+
+    def _get_fetch_session(self):
+        if self._proxy:
+            proxy_url = '%s://%s%s:%s' % (
+                self._proxy['type'],
+                (
+                    '%s:%s@' % (quote(self._proxy['user']), quote(self._proxy['passwd']))
+                    if self._proxy.get('user') else ''
+                ),
+                self._proxy['host'],
+                self._proxy['port'],
+            )
+        else:
+            proxy_url = None
+
+        if self._fetch_sessions is None:
+            self._fetch_sessions = {}
+
+        session = self._fetch_sessions.get(proxy_url)
+        if session is None:
+            session = self._fetch_sessions[proxy_url] = requests.Session()
+            session.trust_env = False
+            if proxy_url:
+                session.proxies = {'http': proxy_url, 'https': proxy_url}
+        return session
+
+
+    # * a failure to close a session doesn't stop the others (see quit)
+    def _close_fetch_sessions(self):
+        for session in (self._fetch_sessions or {}).values():
+            try:
+                session.close()
+            except Exception:
+                pass
+        self._fetch_sessions = None
+
+
+    # the domain of the URL and its parent domains
+    @staticmethod
+    def _get_parent_domains(url):
+        host = (urlparse(url).hostname or '').split('.')
+        return ['.'.join(host[i:]) for i in range(len(host) - 1)] or None
+
+
     def open_blank_page(self, timeout=1.0):
         try:
             with custom_value(self, 'page_load_timeout', timeout):
@@ -1200,21 +2761,16 @@ class Phantom(PhantomJS):
 
     @_network_request
     def forward(self, timeout=None, attempts=None):
+        def action():
+            url_before = self.current_url
+            self._forward()
+            if self.current_url != url_before:
+                return self.current_url # ?
+
         with custom_value(self, 'page_load_timeout', timeout):
             with custom_value(self, 'page_load_attempts', attempts):
-                attempts = self.page_load_attempts
                 try:
-                    while attempts:
-                        attempts -= 1
-                        try:
-                            url_before = self.current_url
-                            self._forward()
-                            if self.current_url != url_before:
-                                return self.current_url # ?
-                        except Exception:
-                            if attempts > 0:
-                                continue
-                            raise
+                    return self._navigate(action, attempts)
                 except Exception as e:
                     raise PhantomError('Unable to go forward :: %s' % str(e))
 
@@ -1222,21 +2778,16 @@ class Phantom(PhantomJS):
 
     @_network_request
     def back(self, timeout=None, attempts=None):
+        def action():
+            url_before = self.current_url
+            self._back()
+            if self.current_url != url_before:
+                return self.current_url # ?
+
         with custom_value(self, 'page_load_timeout', timeout):
             with custom_value(self, 'page_load_attempts', attempts):
-                attempts = self.page_load_attempts
                 try:
-                    while attempts:
-                        attempts -= 1
-                        try:
-                            url_before = self.current_url
-                            self._back()
-                            if self.current_url != url_before:
-                                return self.current_url # ?
-                        except Exception:
-                            if attempts > 0:
-                                continue
-                            raise
+                    return self._navigate(action, attempts)
                 except Exception as e:
                     raise PhantomError('Unable to go backward :: %s' % str(e))
 
@@ -1244,20 +2795,15 @@ class Phantom(PhantomJS):
 
     @_network_request
     def refresh(self, timeout=None, attempts=None):
+        def action():
+            url_before = self.current_url
+            self._refresh()
+            return url_before # ?
+
         with custom_value(self, 'page_load_timeout', timeout):
             with custom_value(self, 'page_load_attempts', attempts):
-                attempts = self.page_load_attempts
                 try:
-                    while attempts:
-                        attempts -= 1
-                        try:
-                            url_before = self.current_url
-                            self._refresh()
-                            return url_before # ?
-                        except Exception:
-                            if attempts > 0:
-                                continue
-                            raise
+                    return self._navigate(action, attempts)
                 except Exception as e:
                     raise PhantomError('Unable to refresh the current page :: %s' % str(e))
 
@@ -1266,37 +2812,33 @@ class Phantom(PhantomJS):
     @_network_request
     def click(self, elem=None, timeout=None, wait=True, if_visible=True, if_enabled=True):
         url = None
+        state = None
 
         if elem:
-            self.validate_elem(elem)
+            state = self.get_element_state(elem)
 
-            if elem.tag_name == 'a':
-                href = elem.get_attribute('href')
-                if href:
-                    url = urljoin(self.current_url, href)
+            if state['tag'] == 'a':
+                if state['href']:
+                    url = urljoin(self.current_url, state['href'])
 
-            elif elem.get_attribute('type') == 'submit':
-                with custom_value(self, 'xpath_timeout', 0):
-                    form = elem.find_elements_by_xpath('.//ancestor::form[@action]')
-                    if form:
-                        action = form.get_attribute('action')
-                        if action:
-                            url = urljoin(self.current_url, action)
+            elif state['type'] == 'submit':
+                if state['form_action']:
+                    url = urljoin(self.current_url, state['form_action'])
 
         with custom_value(self, 'page_load_timeout', timeout):
             try:
                 if elem:
-                    if if_visible and not self.element_visible(elem):
+                    if if_visible and not self._element_state_visible(state):
                         raise PhantomError('element is not visible to user')
-                    elif if_enabled and not elem.is_enabled():
+                    elif if_enabled and not state['enabled']:
                         raise PhantomError('element is not enabled')
-                    self.move_mouse_to_element(elem)
 
+                # moves the mouse to the element first
                 ac = ActionChains(self).click(elem)
                 if elem is None or not wait:
                     ac.perform()
                 else:
-                    with self._wait_for_page_load(timeout):
+                    with self._wait_for_page_load(self.page_load_timeout):
                         ac.perform()
 
                 return url
@@ -1306,8 +2848,8 @@ class Phantom(PhantomJS):
                     'Unable to click on %s :: %s' %
                     (
                         (
-                            '<%s> element' % elem.tag_name
-                            if elem is not None else 'the page'
+                            '<%s> element' % state['tag']
+                            if state is not None else 'the page'
                         ),
                         str(e)
                     )
@@ -1463,18 +3005,13 @@ class Phantom(PhantomJS):
                 % (str((x, y)), str(e))
             )
 
+    # * returns the element's state after scrolling (see get_element_state)
     def scroll_to_element(self, elem):
         self.validate_elem(elem)
         try:
-            location = elem.location
-            self.execute_script(
-                'window.scrollTo(%s, %s)' % (location['x'], location['y'])
-            )
+            return self.execute_script(JS['element_state'], elem, True)
         except Exception as e:
-            raise PhantomError(
-                'Unable to scroll to <%s> element :: %s'
-                % (elem.tag_name, str(e))
-            )
+            raise PhantomError('Unable to scroll to the element :: %s' % str(e))
 
     # ************************************************************************
     # :: internal states ::
@@ -1493,27 +3030,25 @@ class Phantom(PhantomJS):
         return self.execute_script('return document.readyState') == 'complete'
 
 
-    # TODO: fully/half visible
-    def element_visible(self, elem):
-        self.validate_elem(elem)
+    # tag, href, type, form_action, displayed, enabled, rect (in the page
+    # coordinates) and offset (of the page) of the element(s) by one script
+    # * elems: WebElement or list of them (a list of the states is returned)
+    def get_element_state(self, elems):
+        if isinstance(elems, (list, tuple)):
+            for elem in elems:
+                self.validate_elem(elem)
+            elems = list(elems)
+        else:
+            self.validate_elem(elems)
+
         try:
-            if not elem.is_displayed():
-                return False
-            location = elem.location
-            size = elem.size
-            view_width, view_height = self.view_size
-            x_offset, y_offset = self.page_offset
-            return (
-                (location['x'] + size['width']) > x_offset and
-                (location['y'] + size['height']) > y_offset and
-                location['x'] < (x_offset + view_width) and
-                location['y'] < (y_offset + view_height)
-            )
+            return self.execute_script(JS['element_state'], elems, False)
         except Exception as e:
-            raise PhantomError(
-                "Unable to detect <%s> element's visibility :: %s"
-                % (elem.tag_name, str(e))
-            )
+            raise PhantomError("Unable to get the element's state :: %s" % str(e))
+
+
+    def element_visible(self, elem):
+        return self._element_state_visible(self.get_element_state(elem))
 
     def position_in_viewport(self, x, y):
         if not (isinstance(x, int) and isinstance(y, int)):
@@ -1546,18 +3081,18 @@ class Phantom(PhantomJS):
     @property
     def page_offset(self):
         try:
-            page_x_offset = self.execute_script('return window.pageXOffset')
-            page_y_offset = self.execute_script('return window.pageYOffset')
-            return page_x_offset, page_y_offset
+            return tuple(
+                self.execute_script('return [window.pageXOffset, window.pageYOffset]')
+            )
         except Exception as e:
             raise PhantomError('Unable to get the page offset :: %s' % str(e))
 
     @property
     def scroll_size(self):
         try:
-            scroll_width = self.execute_script('return document.body.scrollWidth')
-            scroll_height = self.execute_script('return document.body.scrollHeight')
-            return scroll_width, scroll_height
+            return tuple(self.execute_script(
+                'return [document.body.scrollWidth, document.body.scrollHeight]'
+            ))
         except Exception as e:
             raise PhantomError('Unable to get the scroll size :: %s' % str(e))
 
@@ -1566,24 +3101,7 @@ class Phantom(PhantomJS):
     # ************************************************************************
 
     def save_screenshot(self, filename=None, dir=None):
-        if not filename:
-            filename = str(int(time())) + '-' + self._id
-        elif not isinstance(filename, basestring):
-            raise TypeError(':filename must be string')
-
-        if not dir:
-            dir = self.screenshots_dir or '.'
-        elif not isinstance(dir, basestring):
-            raise TypeError(':dir must be string')
-
-        filepath = os.path.realpath(os.path.join(dir, filename))
-        if not filepath.endswith('.png'):
-            filepath += '.png'
-
-        dirpath = os.path.dirname(filepath)
-
-        if not os.path.isdir(dirpath):
-            os.makedirs(dirpath)
+        filepath = self._get_screenshot_path(filename, dir)
 
         try:
             self.get_screenshot_as_file(filepath)
@@ -1597,6 +3115,9 @@ class Phantom(PhantomJS):
     # :: PhantomJS scripts executor ::
     # ************************************************************************
 
+    # the batch being collected by phantom_batch()
+    _batch = None
+
     def execute_phantomjs_script(self, script):
         if not isinstance(script, basestring):
             raise TypeError(':script must be string')
@@ -1607,6 +3128,11 @@ class Phantom(PhantomJS):
         if not script[-1] == ';':
             script += ';'
 
+        # * the result will be available in the batch after the flush
+        if self._batch is not None:
+            self._batch.scripts.append(script)
+            return
+
         try:
             result = self.execute(
                 'executePhantomScript',
@@ -1625,6 +3151,89 @@ class Phantom(PhantomJS):
 
         return result
 
+
+    # queues all PhantomJS scripts and executes them by a single call on exit
+    # * nested batches are merged into the outer one
+    # * strict: raise PhantomError if any of the scripts failed
+    # * the state set within the batch (headers, navigator, proxy etc.)
+    #   is restored if it raises
+    #
+    # >>> with phantom.phantom_batch() as batch:
+    # ...     phantom.navigator = navigator
+    # ...     phantom.screen = (1920, 1080)
+    # >>> batch.results
+    @contextmanager
+    def phantom_batch(self, strict=True):
+        if self._batch is not None:
+            yield self._batch
+            return
+
+        # the setters update the state before their scripts are executed
+        state = self._get_batch_state()
+
+        self._batch = batch = PhantomBatch()
+        try:
+            try:
+                yield batch
+            finally:
+                self._batch = None
+
+            if batch.scripts:
+                batch.results = self._execute_phantomjs_batch(batch.scripts)
+                if strict and batch.errors:
+                    raise batch.errors[0]
+        except Exception:
+            self._set_batch_state(state)
+            raise
+
+
+    # the state changed by the setters along with their scripts
+    _BATCH_STATE = (
+        'config', '_session_config', '_default_headers', '_navigator',
+        '_proxy', 'timezone_offset', '_cookies_enabled', '_load_stylesheets',
+        '_screen',
+    )
+
+    def _get_batch_state(self):
+        return deepcopy(
+            dict((name, getattr(self, name)) for name in self._BATCH_STATE)
+        )
+
+    def _set_batch_state(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+
+    def _execute_phantomjs_batch(self, scripts):
+        return self._get_batch_results(
+            scripts,
+            self.execute_phantomjs_script(self._get_batch_script(scripts))
+        )
+
+
+    # the port of the driver's long-poll server
+    _poll_port = None
+
+    # a single request to the driver's long-poll server (see base.js)
+    # answered once the :handler's condition is met or :timeout (in seconds) passed
+    def _long_poll(self, handler, timeout, **params):
+        params['timeout'] = int(timeout * 1000)
+        conn = HTTPConnection('127.0.0.1', self._poll_port, timeout=timeout + LONG_POLL_MARGIN)
+        try:
+            conn.request('GET', '/%s?%s' % (handler, quote(dumps(params))))
+            result = loads(conn.getresponse().read())
+        except (HTTPException, socket.error, ValueError) as e:
+            raise PhantomError(
+                'Unable to long-poll the driver (%s) :: %s' % (handler, str(e))
+            )
+        finally:
+            conn.close()
+
+        if result.get('error') is not None:
+            raise PhantomError('PhantomJS traceback :: ' + result['error'])
+
+        return result
+
     # ************************************************************************
 
     # def wait_element_clickable_by_xpath(self, xpath):
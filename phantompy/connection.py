@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+import socket
+from httplib import HTTPConnection, HTTPException
+from json import loads
+from Queue import LifoQueue, Empty
+from threading import Lock
+from time import time
+from urlparse import urlparse
+
+try:
+    from selenium.webdriver.remote.remote_connection import RemoteConnection
+    from selenium.webdriver.remote.errorhandler import ErrorCode
+except ImportError as e:
+    raise ImportError(
+        'Selenium WebDriver is required '
+        '(https://pypi.python.org/pypi/selenium) :: %s'
+        % str(e)
+    )
+
+
+__all__ = ['PooledConnection']
+
+
+# keep-alive connections per driver
+CONNECTION_POOL_SIZE = 2
+
+# socket timeout (in seconds)
+CONNECTION_TIMEOUT = 300
+
+
+class PooledConnection(RemoteConnection):
+    """connection::PooledConnection
+
+    WebDriver command executor reusing persistent keep-alive connections
+    instead of opening a new one per command.
+
+    """
+
+    def __init__(self, remote_server_addr, pool_size=CONNECTION_POOL_SIZE,
+                 timeout=CONNECTION_TIMEOUT):
+        if not isinstance(pool_size, int):
+            raise TypeError(':pool_size must be int')
+        elif pool_size < 1:
+            raise ValueError(':pool_size must be > 0')
+
+        RemoteConnection.__init__(self, remote_server_addr, keep_alive=False)
+
+        self.pool_size = pool_size
+        self.timeout = timeout
+
+        self._pool = LifoQueue(maxsize=pool_size)
+        self._lock = Lock()
+        self._connections = 0
+
+        self._stats = {
+            'requests': 0,
+            'connections': 0,
+            'reused': 0,
+            'reconnects': 0,
+            'time': 0.0,
+        }
+
+
+    @property
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['avg_time'] = (
+            stats['time'] / stats['requests'] if stats['requests'] else None
+        )
+        return stats
+
+
+    def _get_connection(self, host, port):
+        try:
+            return self._pool.get_nowait(), True
+        except Empty:
+            pass
+
+        with self._lock:
+            spawn = self._connections < self.pool_size
+            if spawn:
+                self._connections += 1
+                self._stats['connections'] += 1
+
+        if spawn:
+            return HTTPConnection(host, port, timeout=self.timeout), False
+        else:
+            return self._pool.get(), True
+
+
+    def _put_connection(self, conn):
+        self._pool.put_nowait(conn)
+
+
+    # closes the idle connections (new ones are opened on demand)
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except Empty:
+                break
+            with self._lock:
+                self._connections -= 1
+
+
+    def _request(self, method, url, body=None):
+        parsed_url = urlparse(url)
+
+        if body and method not in ('POST', 'PUT'):
+            body = None
+
+        headers = {
+            'Connection': 'keep-alive',
+            'User-Agent': 'Python http auth',
+            'Content-type': 'application/json;charset="UTF-8"',
+            'Accept': 'application/json',
+        }
+
+        timestamp = time()
+
+        conn, reused = self._get_connection(parsed_url.hostname, parsed_url.port)
+        try:
+            try:
+                conn.request(method, parsed_url.path, body, headers)
+                resp = conn.getresponse()
+            except (HTTPException, socket.error):
+                conn.close()
+                # the idle connection could be closed by the server
+                if not reused:
+                    raise
+                with self._lock:
+                    self._stats['reconnects'] += 1
+                conn.request(method, parsed_url.path, body, headers)
+                resp = conn.getresponse()
+            data = resp.read()
+        except (HTTPException, socket.error):
+            conn.close()
+            self._put_connection(conn)
+            raise
+
+        if resp.getheader('Connection', '').lower() == 'close':
+            conn.close()
+        self._put_connection(conn)
+
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['reused'] += int(reused)
+            self._stats['time'] += time() - timestamp
+
+        return self._get_response(method, resp, data)
+
+
+    # the same as RemoteConnection does
+    def _get_response(self, method, resp, data):
+        statuscode = resp.status
+
+        if 300 <= statuscode < 304:
+            return self._request('GET', resp.getheader('location'))
+
+        body = data.decode('utf-8').replace('\x00', '').strip()
+
+        if 399 < statuscode < 500:
+            return {'status': statuscode, 'value': body}
+
+        content_type = (resp.getheader('Content-Type') or '').split(';')
+        if any([x.strip().startswith('image/png') for x in content_type]):
+            return {'status': ErrorCode.SUCCESS, 'value': body}
+
+        try:
+            data = loads(body)
+        except ValueError:
+            if 199 < statuscode < 300:
+                status = ErrorCode.SUCCESS
+            else:
+                status = ErrorCode.UNKNOWN_ERROR
+            return {'status': status, 'value': body}
+
+        if not isinstance(data, dict):
+            return {'status': ErrorCode.UNKNOWN_ERROR, 'value': data}
+        elif 'value' not in data:
+            data['value'] = None
+
+        return data
@@ -58,6 +58,11 @@ page.onInitialized = function() {
 
 	};
 
+	// localStorage of a loaded session (once per origin)
+	if (page.__config__['local_storage']) {
+		page.restoreLocalStorage(page.__config__['local_storage']);
+	};
+
 	// PhantomJS fingerprints
 	page.removeFingerprints();
 
@@ -68,6 +73,8 @@ page.onInitialized = function() {
 page.httpMeta = {};
 page.httpMeta.request = {};
 page.httpMeta.response = {};
+// the network error of the page itself (see retry::RetryPolicy.classify)
+page.httpMeta.error = null;
 
 
 // REQUEST ::
@@ -77,10 +84,18 @@ page.onResourceRequestedCallbacks = [];
 
 // page requests a resource
 page.onResourceRequested = function(requestData, request) {
-	for (i = 0; i < page.onResourceRequestedCallbacks.length; i++) {
+	page.network.inflight[requestData.id] = true;
+	page.network.requests += 1;
+	page.network.lastActivity = Date.now();
+
+	for (var i = 0; i < page.onResourceRequestedCallbacks.length; i++) {
 		page.onResourceRequestedCallbacks[i](requestData, request);
 	};
 
+	if (!requestData.blocked && requestData.url !== page.httpMeta.request.url) {
+		page.checkBudget(request);
+	};
+
 	if (requestData.url === page.httpMeta.request.url) {
 		page.httpMeta.request.method = requestData.method;
 		page.httpMeta.request.headers = requestData.headers;
@@ -94,25 +109,119 @@ page.onNavigationRequested = function(url, type, willNavigate, main) {
 	if (url !== 'about:blank') {
 		page.httpMeta.request = {};
 		page.httpMeta.response = {};
+		page.httpMeta.error = null;
 		page.httpMeta.request.url = url;
 	};
+	if (willNavigate) {
+		page.addOrigin(url);
+	};
+	if (main && willNavigate) {
+		page.blocked = {total: 0, hosts: 0, urls: 0, types: 0};
+		page.budget = {bytes: 0, requests: 0, cut: 0, exceeded: null};
+	};
+};
+
+// HTTP meta of the last navigation (see Phantom._network_request)
+page.getHttpMeta = function() {
+	return {
+		request: page.httpMeta.request,
+		response: page.httpMeta.response,
+		error: page.httpMeta.error,
+		blocked: page.blocked,
+		budget: page.budget,
+		timing: page.getNavigationTiming()
+	};
 };
 
+// Navigation Timing breakdown of the current page (in ms)
+page.getNavigationTiming = function() {
+	return page.evaluate(function() {
+		var timing = window.performance && window.performance.timing;
+		if (!timing || !timing.navigationStart) {
+			return null;
+		};
+		var span = function(start, end) {
+			return timing[start] && timing[end] ? timing[end] - timing[start] : null;
+		};
+		return {
+			dns: span('domainLookupStart', 'domainLookupEnd'),
+			connect: span('connectStart', 'connectEnd'),
+			ttfb: span('requestStart', 'responseStart'),
+			dom_ready: span('navigationStart', 'domContentLoadedEventEnd'),
+			load: span('navigationStart', 'loadEventEnd')
+		};
+	});
+};
+
+// navigation state
+// * seq: the number of the finished page loads
+page.navigation = {seq: 0, loading: false, status: null};
+
 // page starts the loading
-// page.onLoadStarted = function() {
-// };
+page.onLoadStarted = function() {
+	page.navigation.loading = true;
+	page.network.requests = 0;
+};
+
+
+// NETWORK ::
+
+// requests in flight (by id)
+// * requests: the number of the requests since the page load started
+page.network = {inflight: {}, requests: 0, lastActivity: Date.now()};
+
+// a request is finished (received, failed or timed out)
+page.finishRequest = function(id) {
+	if (page.network.inflight[id]) {
+		delete page.network.inflight[id];
+		page.network.lastActivity = Date.now();
+		page.notifyWaiters();
+	};
+};
+
+// error:callbacks
+page.onResourceErrorCallbacks = [];
+
+page.onResourceError = function(resourceError) {
+	if (resourceError.url === page.httpMeta.request.url) {
+		page.httpMeta.error = {
+			code: resourceError.errorCode,
+			message: resourceError.errorString
+		};
+	};
+	for (var i = 0; i < page.onResourceErrorCallbacks.length; i++) {
+		page.onResourceErrorCallbacks[i](resourceError);
+	};
+	page.finishRequest(resourceError.id);
+};
+
+// timeout:callbacks
+page.onResourceTimeoutCallbacks = [];
+
+page.onResourceTimeout = function(request) {
+	if (request.url === page.httpMeta.request.url) {
+		page.httpMeta.error = {
+			code: request.errorCode,
+			message: request.errorString
+		};
+	};
+	for (var i = 0; i < page.onResourceTimeoutCallbacks.length; i++) {
+		page.onResourceTimeoutCallbacks[i](request);
+	};
+	page.finishRequest(request.id);
+};
 
 
 // RESPONSE ::
 
 // response:callbacks
-// var page.onResourceReceivedCallbacks = [];
+page.onResourceReceivedCallbacks = [];
 
 // a resource requested by the page is received
 page.onResourceReceived = function(response) {
-	// for (i = 0; i < page.onResourceReceivedCallbacks.length; i++) {
-	// 	page.onResourceReceivedCallbacks[i](response);
-	// };
+	for (var i = 0; i < page.onResourceReceivedCallbacks.length; i++) {
+		page.onResourceReceivedCallbacks[i](response);
+	};
 
 	// TODO: start or end?
 	if (response.url === page.httpMeta.request.url && response.stage === 'start') {
@@ -121,6 +230,12 @@ page.onResourceReceived = function(response) {
 		page.httpMeta.response.headers = response.headers;
 	};
 
+	if (response.stage === 'start') {
+		page.budget.bytes += page.getResponseSize(response);
+	} else if (response.stage === 'end') {
+		page.finishRequest(response.id);
+	};
+
 };
 
 // page finishes the loading
@@ -128,6 +243,253 @@ page.onLoadFinished = function(status) {
 	if (status === 'fail') {
 		page.httpMeta.response = null;
 	};
+
+	page.navigation.seq += 1;
+	page.navigation.loading = false;
+	page.navigation.status = status;
+	page.notifyWaiters();
+};
+
+
+
+// RESOURCES RECORDER ::
+
+// the last :size resources of the page (a ring buffer)
+// * the callbacks are installed only while the recorder is on
+page.recorder = null;
+
+page.startRecorder = function(size) {
+	page.stopRecorder();
+	page.recorder = {size: size, entries: [], count: 0, pending: {}};
+	page.addCallback(page.onResourceRequestedCallbacks, page.recordRequest);
+	page.addCallback(page.onResourceReceivedCallbacks, page.recordResponse);
+	page.addCallback(page.onResourceErrorCallbacks, page.recordError);
+	page.addCallback(page.onResourceTimeoutCallbacks, page.recordTimeout);
+};
+
+page.stopRecorder = function() {
+	page.removeCallback(page.onResourceRequestedCallbacks, page.recordRequest);
+	page.removeCallback(page.onResourceReceivedCallbacks, page.recordResponse);
+	page.removeCallback(page.onResourceErrorCallbacks, page.recordError);
+	page.removeCallback(page.onResourceTimeoutCallbacks, page.recordTimeout);
+	page.recorder = null;
+};
+
+page.recordRequest = function(requestData) {
+	page.recorder.pending[requestData.id] = {
+		url: requestData.url,
+		method: requestData.method,
+		status: null,
+		content_type: null,
+		size: null,
+		error: null,
+		start: Date.now(),
+		received: null,
+		end: null
+	};
+};
+
+page.recordResponse = function(response) {
+	var entry = page.recorder.pending[response.id];
+	if (entry === undefined) {
+		return;
+	};
+	if (response.stage === 'start') {
+		entry.status = response.status;
+		entry.content_type = response.contentType;
+		entry.received = Date.now();
+		entry.size = page.getResponseSize(response);
+	} else if (response.stage === 'end') {
+		page.recordEntry(response.id);
+	};
+};
+
+page.recordError = function(resourceError) {
+	var entry = page.recorder.pending[resourceError.id];
+	if (entry !== undefined) {
+		entry.status = entry.status || resourceError.status || null;
+		entry.error = resourceError.errorString;
+		page.recordEntry(resourceError.id);
+	};
+};
+
+page.recordTimeout = function(request) {
+	var entry = page.recorder.pending[request.id];
+	if (entry !== undefined) {
+		entry.error = 'timeout';
+		page.recordEntry(request.id);
+	};
+};
+
+page.recordEntry = function(id) {
+	var recorder = page.recorder;
+	var entry = recorder.pending[id];
+	delete recorder.pending[id];
+	entry.end = Date.now();
+	recorder.entries[recorder.count %% recorder.size] = entry;
+	recorder.count += 1;
+};
+
+// the recorded resources (from the oldest one)
+page.getResources = function(clear) {
+	var recorder = page.recorder;
+	if (!recorder) {
+		return null;
+	};
+	var index = recorder.count %% recorder.size;
+	var entries = (recorder.count > recorder.size) ?
+		recorder.entries.slice(index).concat(recorder.entries.slice(0, index)) :
+		recorder.entries.slice(0);
+	if (clear) {
+		recorder.entries = [];
+		recorder.count = 0;
+	};
+	return entries;
+};
+
+
+
+// LONG POLLING ::
+
+// Python blocks on a single HTTP request to the poll server
+// which is answered once a waiter's condition is met (or on the timeout):
+// GET /<handler>?<JSON params>
+
+// waiters: {check: function, done: function}
+page.waiters = [];
+
+// calls done(true) once check() returns true or done(false) after timeout (ms)
+page.addWaiter = function(check, timeout, done) {
+	if (check()) {
+		return done(true);
+	};
+	var waiter = {check: check, done: done};
+	waiter.timer = setTimeout(function() {
+		page.removeCallback(page.waiters, waiter);
+		done(false);
+	}, timeout);
+	page.waiters.push(waiter);
+};
+
+// re-checks the waiters (called on page events)
+page.notifyWaiters = function() {
+	page.waiters.slice().forEach(function(waiter) {
+		if (waiter.check()) {
+			clearTimeout(waiter.timer);
+			page.removeCallback(page.waiters, waiter);
+			waiter.done(true);
+		};
+	});
+};
+
+// handler(params, respond)
+page.pollHandlers = {};
+
+// the next page load finished after the load :seq
+page.pollHandlers.load = function(params, respond) {
+	page.addWaiter(
+		function() {
+			return page.navigation.seq > params.seq;
+		},
+		params.timeout,
+		function(ok) {
+			respond({ok: ok, navigation: page.navigation});
+		}
+	);
+};
+
+// no more than :max_inflight requests in flight for :quiet_ms
+page.pollHandlers.network_idle = function(params, respond) {
+	var started = Date.now();
+	var timer = null;
+	page.addWaiter(
+		function() {
+			if (Object.keys(page.network.inflight).length > params.max_inflight) {
+				return false;
+			};
+			var quiet = Date.now() - page.network.lastActivity;
+			if (quiet >= params.quiet_ms) {
+				return true;
+			};
+			// nothing else may happen, so re-check once it's quiet enough
+			clearTimeout(timer);
+			timer = setTimeout(page.notifyWaiters, params.quiet_ms - quiet);
+			return false;
+		},
+		params.timeout,
+		function(ok) {
+			clearTimeout(timer);
+			respond({
+				ok: ok,
+				stats: {
+					time: (Date.now() - started) / 1000,
+					inflight: Object.keys(page.network.inflight).length,
+					requests: page.network.requests
+				}
+			});
+		}
+	);
+};
+
+// at least one element matches the :selector (see Phantom.select)
+// * the DOM changes don't notify the waiters, so it's re-checked
+//   every :interval ms
+page.SELECT_SCRIPT = %(__select__)s;
+
+page.pollHandlers.select = function(params, respond) {
+	var select = new Function(page.SELECT_SCRIPT);
+	var timer = null;
+	page.addWaiter(
+		function() {
+			if (page.evaluate(select, params.selector, 'count') > 0) {
+				return true;
+			};
+			clearTimeout(timer);
+			timer = setTimeout(page.notifyWaiters, params.interval);
+			return false;
+		},
+		params.timeout,
+		function(ok) {
+			clearTimeout(timer);
+			respond({ok: ok});
+		}
+	);
+};
+
+page.startPollServer = function(port) {
+	page.pollServer = require('webserver').create();
+	var listening = page.pollServer.listen('127.0.0.1:' + port, function(request, response) {
+		var respond = function(result) {
+			response.statusCode = 200;
+			response.setHeader('Content-Type', 'application/json');
+			response.write(JSON.stringify(result));
+			response.close();
+		};
+		try {
+			var url = request.url.split('?');
+			var handler = page.pollHandlers[url[0].slice(1)];
+			if (handler === undefined) {
+				throw new Error('Unknown poll handler: ' + url[0]);
+			};
+			handler(JSON.parse(decodeURIComponent(url[1] || '{}')), respond);
+		} catch (e) {
+			respond({error: String(e.stack || e)});
+		};
+	});
+	if (!listening) {
+		throw new Error('Unable to start the poll server on port ' + port);
+	};
+};
+
+page.stopPollServer = function() {
+	if (page.pollServer) {
+		page.pollServer.close();
+		page.pollServer = null;
+	};
+	page.waiters.slice().forEach(function(waiter) {
+		clearTimeout(waiter.timer);
+	});
+	page.waiters = [];
 };
 
 
@@ -227,14 +589,159 @@ page.resetTimezone = function() {
 };
 
 
-// CSS files
-page.skipCSS = function(requestData, request) {
-	if (
-		(/https?:\/\/.+?\.css/gi).test(requestData.url) ||
-		requestData.headers['Content-Type'] == 'text/css'
-	) {
+// localStorage
+
+// the origins navigated by the page and its frames (see page.clearStorage)
+page.origins = {};
+
+page.addOrigin = function(url) {
+	var match = /^(https?:\/\/[^\/?#]+)/i.exec(url);
+	if (match) {
+		page.origins[match[1].toLowerCase()] = true;
+	};
+};
+
+// clears localStorage and sessionStorage of every navigated origin
+// (not only of the current one) by loading a blank document into it
+page.clearStorage = function() {
+	var origins = Object.keys(page.origins);
+	for (var i = 0; i < origins.length; i++) {
+		page.setContent('<html><head></head><body></body></html>', origins[i] + '/');
+		page.evaluate(function() {
+			try {
+				localStorage.clear();
+				sessionStorage.clear();
+			} catch (e) {};
+		});
+	};
+	page.origins = {};
+};
+
+page.restoreLocalStorage = function(local_storage) {
+	var origin = page.evaluate(function(local_storage) {
+		var origin = location.protocol + '//' + location.host;
+		var items = local_storage[origin];
+		if (items) {
+			try {
+				for (var key in items) {
+					localStorage.setItem(key, items[key]);
+				};
+			} catch (e) {};
+		};
+		return origin;
+	}, local_storage);
+	delete local_storage[origin];
+};
+
+
+// BUDGET ::
+
+// the page's traffic: bytes received, requests made and the ones cut
+// * exceeded: 'bytes' or 'requests' once the budget is hit
+page.budget = {bytes: 0, requests: 0, cut: 0, exceeded: null};
+
+// aborts the request if the page's budget is hit (see Phantom.config)
+page.checkBudget = function(request) {
+	var budget = page.budget;
+	budget.requests += 1;
+	if (budget.exceeded === null) {
+		if (
+			page.__config__['max_page_bytes'] != null &&
+			budget.bytes >= page.__config__['max_page_bytes']
+		) {
+			budget.exceeded = 'bytes';
+		} else if (
+			page.__config__['max_requests_per_page'] != null &&
+			budget.requests > page.__config__['max_requests_per_page']
+		) {
+			budget.exceeded = 'requests';
+		};
+	};
+	if (budget.exceeded !== null) {
+		request.abort();
+		budget.cut += 1;
+	};
+};
+
+// Content-Length or the first chunk's size
+page.getResponseSize = function(response) {
+	for (var i = 0; i < response.headers.length; i++) {
+		if (response.headers[i].name.toLowerCase() === 'content-length') {
+			return parseInt(response.headers[i].value, 10) || 0;
+		};
+	};
+	return response.bodySize || 0;
+};
+
+
+// BLOCKING ::
+
+// the number of the page's blocked requests (by the rule)
+page.blocked = {total: 0, hosts: 0, urls: 0, types: 0};
+
+// compiled rules (see Phantom.block_resources)
+// * hosts: hash set of the hosts (incl. subdomains)
+// * urls: combined regex of the URL globs
+// * types: combined regex of the resource types' file extensions
+page.blockRules = null;
+
+page.URL_HOST_REGEX = /^[a-z][a-z0-9+.-]*:\/\/(?:[^@\/]*@)?([^:\/?#]+)/i;
+
+page.setBlockRules = function(rules) {
+	page.removeCallback(page.onResourceRequestedCallbacks, page.blockRequest);
+	page.blockRules = null;
+	if (!rules) {
+		return;
+	};
+	var hosts = {};
+	for (var i = 0; i < rules.hosts.length; i++) {
+		hosts[rules.hosts[i]] = true;
+	};
+	page.blockRules = {
+		hosts: hosts,
+		urls: rules.urls ? new RegExp(rules.urls, 'i') : null,
+		types: rules.types ? new RegExp(rules.types, 'i') : null
+	};
+	page.addCallback(page.onResourceRequestedCallbacks, page.blockRequest);
+};
+
+page.blockRequest = function(requestData, request) {
+	var rules = page.blockRules;
+	var url = requestData.url;
+	var rule = null;
+
+	// the page itself
+	if (url === page.httpMeta.request.url) {
+		return;
+	};
+
+	var host = page.URL_HOST_REGEX.exec(url);
+	if (host) {
+		host = host[1].toLowerCase();
+		while (true) {
+			if (rules.hosts[host] === true) {
+				rule = 'hosts';
+				break;
+			};
+			var dot = host.indexOf('.');
+			if (dot === -1) {
+				break;
+			};
+			host = host.slice(dot + 1);
+		};
+	};
+
+	if (rule === null && rules.urls !== null && rules.urls.test(url)) {
+		rule = 'urls';
+	} else if (rule === null && rules.types !== null && rules.types.test(url)) {
+		rule = 'types';
+	};
+
+	if (rule !== null) {
+		requestData.blocked = true;
 		request.abort();
-		// request.cancel();
+		page.blocked.total += 1;
+		page.blocked[rule] += 1;
 	};
 };
 
@@ -421,3 +928,14 @@ function __patchObject__(object, patch, name) {
 
 
 
+// START ::
+
+if (page.__config__['poll_port']) {
+	page.startPollServer(page.__config__['poll_port']);
+};
+
+if (page.__config__['record_resources']) {
+	page.startRecorder(page.__config__['record_resources']);
+};
+
+page.setBlockRules(page.__config__['block_resources']);
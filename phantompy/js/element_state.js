@@ -0,0 +1,51 @@
+// The states of the elements (see Phantom.get_element_state)
+// * arguments[0]: the element or the list of the elements
+// * arguments[1]: scroll to the (first) element before
+
+var getState = function(el) {
+	var style = window.getComputedStyle(el);
+	var rect = el.getBoundingClientRect();
+	var form = el.form || null;
+
+	return {
+		tag: el.tagName.toLowerCase(),
+		href: el.href || el.getAttribute('href') || null,
+		type: el.type || el.getAttribute('type'),
+		form_action: form && form.getAttribute('action') ? form.action : null,
+		displayed: (
+			style.visibility !== 'hidden' &&
+			style.opacity !== '0' &&
+			el.getClientRects().length > 0
+		),
+		enabled: !el.disabled,
+		// the page coordinates
+		rect: {
+			x: Math.round(rect.left + window.pageXOffset),
+			y: Math.round(rect.top + window.pageYOffset),
+			width: Math.round(rect.width),
+			height: Math.round(rect.height)
+		},
+		offset: {x: window.pageXOffset, y: window.pageYOffset}
+	};
+};
+
+var elems = arguments[0];
+var single = !(elems instanceof Array);
+if (single) {
+	elems = [elems];
+};
+
+if (arguments[1] && elems.length) {
+	var rect = elems[0].getBoundingClientRect();
+	window.scrollTo(
+		Math.round(rect.left + window.pageXOffset),
+		Math.round(rect.top + window.pageYOffset)
+	);
+};
+
+var states = [];
+for (var i = 0; i < elems.length; i++) {
+	states.push(getState(elems[i]));
+};
+
+return single ? states[0] : states;
@@ -0,0 +1,76 @@
+// Extracts the fields of the rows by the spec (see Phantom.extract)
+// * arguments[0]: the normalized spec
+// * arguments[1]: the rows (elements) instead of spec.rows (see harvest.js)
+
+var select = function(selector, context, all) {
+	if (selector.type === 'css') {
+		if (all) {
+			return Array.prototype.slice.call(context.querySelectorAll(selector.value));
+		};
+		return context.querySelector(selector.value);
+	};
+
+	var doc = context.ownerDocument || context;
+	if (all) {
+		var snapshot = doc.evaluate(
+			selector.value, context, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+		);
+		var nodes = [];
+		for (var i = 0; i < snapshot.snapshotLength; i++) {
+			nodes.push(snapshot.snapshotItem(i));
+		};
+		return nodes;
+	};
+	return doc.evaluate(
+		selector.value, context, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+	).singleNodeValue;
+};
+
+var getValue = function(node, field) {
+	if (field.fields) {
+		return extractFields(node, field.fields);
+	};
+	if (field.prop) {
+		var value = node[field.prop];
+		return value === undefined ? null : value;
+	};
+	// attributes and text nodes selected by XPath
+	if (node.nodeType !== 1 || field.attr === 'text') {
+		return (node.textContent || '').replace(/\s+/g, ' ').trim();
+	};
+	if (field.attr === 'html') {
+		return node.innerHTML;
+	};
+	return node.getAttribute(field.attr);
+};
+
+var extractFields = function(context, fields) {
+	var result = {};
+	for (var name in fields) {
+		var field = fields[name];
+		if (field.all) {
+			var nodes = field.select ? select(field.select, context, true) : [context];
+			result[name] = [];
+			for (var i = 0; i < nodes.length; i++) {
+				result[name].push(getValue(nodes[i], field));
+			};
+		} else {
+			var node = field.select ? select(field.select, context, false) : context;
+			result[name] = node ? getValue(node, field) : null;
+		};
+	};
+	return result;
+};
+
+var spec = arguments[0];
+var rows = arguments[1] || (spec.rows ? select(spec.rows, document, true) : null);
+
+if (!rows) {
+	return extractFields(document, spec.fields);
+};
+
+var result = [];
+for (var i = 0; i < rows.length; i++) {
+	result.push(extractFields(rows[i], spec.fields));
+};
+return result;
@@ -0,0 +1,250 @@
+// Infinite scroll harvester (see Phantom.harvest_scroll)
+// * arguments[0]: the command: 'start', 'next' or 'stop'
+//
+// start: the items already in the page are queued, the new ones
+//        are collected by MutationObserver from the added nodes
+//        * XPath '//a[...]/b[...]' is tested against the added nodes
+//          (see scoped), the other expressions re-evaluate the page
+// * arguments[1]: the item selector ({type: 'css' or 'xpath', value: selector})
+// * arguments[2]: the extraction fields (see extract.js) or null (outerHTML)
+// * arguments[3]: extract.js
+// * arguments[4]: select.js
+//
+// next (async): scrolls down until :batch_size items are queued or no new
+//               items appear for :max_idle ms or the :deadline is hit
+// * arguments[1]: max_idle (in ms)
+// * arguments[2]: batch_size
+// * arguments[3]: deadline (in ms, must be > max_idle), the queued items
+//   are returned before the async script timeout
+// * callback: {items: [...], done: true if no new items appeared}
+
+var command = arguments[0];
+var harvester = window.__harvester__;
+
+if (command === 'start') {
+	if (harvester) {
+		harvester.stop();
+	};
+
+	var selector = arguments[1];
+	var fields = arguments[2];
+	var extract = new Function(arguments[3]);
+	var select = new Function(arguments[4]);
+
+	harvester = {queue: [], notify: null};
+
+	var collect = function(node) {
+		// harvested nodes are skipped
+		if (!node.__harvested__) {
+			node.__harvested__ = true;
+			harvester.queue.push(node);
+		};
+	};
+
+	var matches = function(el) {
+		var match = el.matches || el.webkitMatchesSelector;
+		return match.call(el, selector.value);
+	};
+
+	// the XPath test of a node for '//a[...]/b[...]' paths:
+	// 'self::b[...][parent::a[...]]' is evaluated for the added nodes
+	// and their descendants only
+	// * null for the other paths (axes, descendant steps, unions,
+	//   positional predicates), the page is re-evaluated for them
+	var scoped = null;
+	var steps = function(path) {
+		var match = /^\s*\.?\/\/(.+)$/.exec(path);
+		if (!match || /\[\s*\d|position\(|last\(/.test(path)) {
+			return null;
+		};
+		var result = [];
+		var step = '';
+		var depth = 0;
+		var quote = null;
+		for (var i = 0; i < match[1].length; i++) {
+			var c = match[1].charAt(i);
+			if (quote) {
+				quote = c === quote ? null : quote;
+			} else if (c === '"' || c === "'") {
+				quote = c;
+			} else if (c === '[' || c === '(') {
+				depth++;
+			} else if (c === ']' || c === ')') {
+				depth--;
+			} else if (!depth && c === '|') {
+				return null;
+			} else if (!depth && c === '/') {
+				result.push(step.trim());
+				step = '';
+				continue;
+			};
+			step += c;
+		};
+		result.push(step.trim());
+		for (var j = 0; j < result.length; j++) {
+			// a name test and predicates only
+			if (!/^(?:[\w-]+(?::[\w-]+)?|\*)(?:\[.*\])?$/.test(result[j])) {
+				return null;
+			};
+		};
+		return result;
+	};
+	if (selector.type === 'xpath') {
+		var path = steps(selector.value);
+		if (path) {
+			var test = 'self::' + path[path.length - 1];
+			var tail = '';
+			for (var k = path.length - 2; k >= 0; k--) {
+				test += '[parent::' + path[k];
+				tail += ']';
+			};
+			scoped = document.createExpression('boolean(' + test + tail + ')', null);
+		};
+	};
+
+	var collectScoped = function(node) {
+		var nodes = [node].concat(
+			Array.prototype.slice.call(node.getElementsByTagName('*'))
+		);
+		for (var i = 0; i < nodes.length; i++) {
+			if (scoped.evaluate(nodes[i], XPathResult.BOOLEAN_TYPE, null).booleanValue) {
+				collect(nodes[i]);
+			};
+		};
+	};
+
+	var notify = function(queued) {
+		if (harvester.queue.length > queued && harvester.notify) {
+			harvester.notify();
+		};
+	};
+
+	// the whole page is re-evaluated
+	var rescan = function() {
+		var queued = harvester.queue.length;
+		select(selector).forEach(collect);
+		notify(queued);
+	};
+
+	var onMutations = function(mutations) {
+		if (selector.type === 'xpath' && !scoped) {
+			return rescan();
+		};
+		var queued = harvester.queue.length;
+		for (var i = 0; i < mutations.length; i++) {
+			var nodes = mutations[i].addedNodes;
+			for (var j = 0; j < nodes.length; j++) {
+				if (nodes[j].nodeType !== 1) {
+					continue;
+				};
+				if (scoped) {
+					collectScoped(nodes[j]);
+					continue;
+				};
+				if (matches(nodes[j])) {
+					collect(nodes[j]);
+				};
+				Array.prototype.forEach.call(
+					nodes[j].querySelectorAll(selector.value), collect
+				);
+			};
+		};
+		notify(queued);
+	};
+
+	harvester.take = function(size) {
+		var nodes = harvester.queue.splice(0, size);
+		if (!fields) {
+			return nodes.map(function(node) {
+				return node.outerHTML;
+			});
+		};
+		return nodes.length ? extract({rows: null, fields: fields}, nodes) : [];
+	};
+
+	var Observer = window.MutationObserver || window.WebKitMutationObserver;
+	var observer = null;
+	var interval = null;
+	if (Observer) {
+		observer = new Observer(onMutations);
+		observer.observe(document, {childList: true, subtree: true});
+	} else {
+		interval = setInterval(rescan, 100);
+	};
+
+	harvester.stop = function() {
+		if (observer) {
+			observer.disconnect();
+		};
+		clearInterval(interval);
+	};
+
+	select(selector).forEach(collect);
+
+	Object.defineProperty(window, '__harvester__', {
+		value: harvester, enumerable: false, configurable: true, writable: true
+	});
+	return null;
+};
+
+if (command === 'stop') {
+	if (harvester) {
+		harvester.stop();
+		window.__harvester__ = null;
+	};
+	return null;
+};
+
+// next
+var maxIdle = arguments[1];
+var batchSize = arguments[2];
+var deadline = arguments[3];
+var callback = arguments[arguments.length - 1];
+
+if (!harvester) {
+	throw new Error('The harvester is not started');
+};
+
+if (harvester.queue.length >= batchSize) {
+	return callback({items: harvester.take(batchSize), done: false});
+};
+
+var timer = null;
+var deadlineTimer = null;
+
+var scroll = function() {
+	var root = document.scrollingElement || document.documentElement || document.body;
+	window.scrollTo(window.pageXOffset, root.scrollHeight);
+};
+
+var finish = function(done) {
+	clearTimeout(timer);
+	clearTimeout(deadlineTimer);
+	harvester.notify = null;
+	callback({items: harvester.take(batchSize), done: done});
+};
+
+var waitIdle = function() {
+	clearTimeout(timer);
+	timer = setTimeout(function() {
+		finish(!harvester.queue.length);
+	}, maxIdle);
+};
+
+// new items may load more on the next scroll
+harvester.notify = function() {
+	if (harvester.queue.length >= batchSize) {
+		finish(false);
+	} else {
+		scroll();
+		waitIdle();
+	};
+};
+
+// the feed keeps adding less than :batch_size items
+deadlineTimer = setTimeout(function() {
+	finish(false);
+}, deadline);
+
+scroll();
+waitIdle();
@@ -0,0 +1,35 @@
+// Selects the elements by the selector (see Phantom.select)
+// * arguments[0]: {type: 'css' or 'xpath', value: selector}
+// * arguments[1]: 'count' - returns the number of the matches only
+// * XPath matches other than elements (attributes, texts) are skipped
+
+var selector = arguments[0];
+var count = arguments[1] === 'count';
+
+if (selector.type === 'css') {
+	var matches = document.querySelectorAll(selector.value);
+	return count ? matches.length : Array.prototype.slice.call(matches);
+};
+
+// the compiled XPath expressions of the page
+if (!window.hasOwnProperty('__xpathCache__')) {
+	Object.defineProperty(window, '__xpathCache__', {value: {}, enumerable: false});
+};
+var expression = window.__xpathCache__[selector.value];
+if (!expression) {
+	expression = window.__xpathCache__[selector.value] = document.createExpression(
+		selector.value, null
+	);
+};
+
+var snapshot = expression.evaluate(
+	document, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+);
+var elems = [];
+for (var i = 0; i < snapshot.snapshotLength; i++) {
+	if (snapshot.snapshotItem(i).nodeType === 1) {
+		elems.push(snapshot.snapshotItem(i));
+	};
+};
+
+return count ? elems.length : elems;
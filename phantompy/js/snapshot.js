@@ -0,0 +1,35 @@
+// The rendered DOM serialized (see Phantom.snapshot)
+// * arguments[0]: the attribute marking the elements' visibility ('1' or '0')
+//   or null (it's set on the copy, the page isn't changed)
+
+var root = document.documentElement;
+if (!root) {
+	return '';
+};
+
+var copy = root.cloneNode(true);
+
+var attr = arguments[0];
+
+if (attr) {
+	var elems = root.getElementsByTagName('*');
+	var copies = copy.getElementsByTagName('*');
+	var setVisible = function(el, el_copy) {
+		var style = window.getComputedStyle(el);
+		el_copy.setAttribute(attr, (
+			style.visibility !== 'hidden' &&
+			style.opacity !== '0' &&
+			el.getClientRects().length > 0
+		) ? '1' : '0');
+	};
+	setVisible(root, copy);
+	for (var i = 0; i < elems.length; i++) {
+		setVisible(elems[i], copies[i]);
+	};
+};
+
+var doctype = document.doctype;
+return (
+	(doctype ? '<!DOCTYPE ' + doctype.name + '>' : '') +
+	copy.outerHTML
+);
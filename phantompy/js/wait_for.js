@@ -0,0 +1,77 @@
+// Waits for the first of the selectors to get to the state
+// (see Phantom.wait_for), the DOM changes are observed by MutationObserver
+// * arguments[0]: the selectors ({type: 'css' or 'xpath', value: selector})
+// * arguments[1]: the state: 'present', 'visible' or 'gone'
+// * arguments[2]: timeout (in ms)
+// * arguments[3]: select.js
+// * callback: {index: the selector's index, elements: [...]} or null on timeout
+
+var selectors = arguments[0];
+var state = arguments[1];
+var timeout = arguments[2];
+var select = new Function(arguments[3]);
+var callback = arguments[arguments.length - 1];
+
+var visible = function(el) {
+	var style = window.getComputedStyle(el);
+	return (
+		style.visibility !== 'hidden' &&
+		style.opacity !== '0' &&
+		el.getClientRects().length > 0
+	);
+};
+
+var check = function() {
+	for (var i = 0; i < selectors.length; i++) {
+		var elems = select(selectors[i]);
+		if (state === 'visible') {
+			elems = elems.filter(visible);
+		};
+		if (state === 'gone' ? !elems.length : elems.length) {
+			return {index: i, elements: state === 'gone' ? [] : elems};
+		};
+	};
+	return null;
+};
+
+var Observer = window.MutationObserver || window.WebKitMutationObserver;
+var observer = null;
+var timer = null;
+var interval = null;
+var done = false;
+
+var finish = function(result) {
+	if (done) {
+		return;
+	};
+	done = true;
+	if (observer) {
+		observer.disconnect();
+	};
+	clearTimeout(timer);
+	clearInterval(interval);
+	callback(result);
+};
+
+var onChange = function() {
+	var result = check();
+	if (result) {
+		finish(result);
+	};
+};
+
+onChange();
+
+if (!done) {
+	if (Observer) {
+		observer = new Observer(onChange);
+		observer.observe(document, {childList: true, subtree: true, attributes: true});
+	};
+	// the visibility may change without a mutation (e.g. by a stylesheet)
+	if (!Observer || state === 'visible') {
+		interval = setInterval(onChange, 100);
+	};
+	timer = setTimeout(function() {
+		finish(null);
+	}, timeout);
+};
@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+
+from contextlib import contextmanager
+from threading import Condition, Thread
+from time import time
+
+from .base import Phantom, PhantomError
+
+
+__all__ = ['PhantomPool', 'PhantomPoolError']
+
+
+class PhantomPoolError(PhantomError):
+    """phantompy::PhantomPoolError"""
+
+
+class PhantomPool(object):
+    """phantompy::PhantomPool
+
+    Keeps warm (already started) Phantom drivers ready to be checked out.
+
+    >>> pool = PhantomPool(size=4, max_pages=100, max_age=600)
+    >>> with pool.phantom() as phantom:
+    ...     phantom.open('http://example.com')
+
+    * a driver is reset by `new_session` when it's checked in
+    * a driver is retired after :max_pages pages or :max_age seconds
+
+    """
+
+    def __init__(self, size=4, max_pages=None, max_age=None, timeout=None,
+                 config=None, navigator=None, proxy=None, prestart=True,
+                 **phantom_kwargs):
+
+        if not isinstance(size, int):
+            raise TypeError(':size must be int')
+        elif size < 1:
+            raise ValueError(':size must be > 0')
+        elif max_pages is not None and not isinstance(max_pages, int):
+            raise TypeError(':max_pages must be int or None')
+        elif max_age is not None and not isinstance(max_age, (int, float)):
+            raise TypeError(':max_age must be int, float or None')
+        elif timeout is not None and not isinstance(timeout, (int, float)):
+            raise TypeError(':timeout must be int, float or None')
+
+        self.size = size
+        self.max_pages = max_pages
+        self.max_age = max_age
+        self.timeout = timeout
+
+        # the session applied to every driver on check in
+        self.session = {
+            'config': config,
+            'navigator': navigator,
+            'proxy': proxy,
+        }
+
+        self.phantom_kwargs = phantom_kwargs
+        self.phantom_kwargs.update(self.session)
+
+        self._cond = Condition()
+        self._idle = []
+        self._meta = {}
+        self._total = 0
+        self._closed = False
+
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'spawned': 0,
+            'spawn_time': 0.0,
+            'spawn_errors': 0,
+            'recycled': 0,
+            'reset_errors': 0,
+        }
+
+        if prestart:
+            self.warm_up()
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self._total
+
+    # ************************************************************************
+    # :: drivers ::
+    # ************************************************************************
+
+    # a new started driver
+    def _create(self):
+        return Phantom(**self.phantom_kwargs)
+
+
+    def _spawn(self):
+        timestamp = time()
+        try:
+            phantom = self._create()
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._stats['spawn_errors'] += 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats['spawned'] += 1
+            self._stats['spawn_time'] += time() - timestamp
+            self._meta[phantom] = {
+                'created': time(),
+                'pages': 0,
+                'navigations': phantom.navigations,
+                'restarts': phantom.restarts,
+            }
+        return phantom
+
+
+    def _spawn_idle(self):
+        try:
+            phantom = self._spawn()
+        except Exception:
+            return
+        self._release(phantom)
+
+
+    # returns a driver into the idle list (or stops it if the pool is closed)
+    def _release(self, phantom):
+        with self._cond:
+            if not self._closed:
+                self._idle.append(phantom)
+                self._cond.notify()
+                return
+            self._discard(phantom)
+        self._stop(phantom)
+
+
+    # * must be called under the lock
+    def _discard(self, phantom):
+        self._meta.pop(phantom, None)
+        self._total -= 1
+        self._cond.notify()
+
+
+    @staticmethod
+    def _stop(phantom):
+        try:
+            phantom.quit()
+        except PhantomError:
+            pass
+
+
+    # adds the navigations since the last checkin
+    # * phantom.navigations is reset by restart(), then the ones
+    #   since the restart are counted
+    # * must be called under the lock
+    def _count_pages(self, phantom):
+        meta = self._meta[phantom]
+        if phantom.restarts == meta['restarts']:
+            meta['pages'] += phantom.navigations - meta['navigations']
+        else:
+            meta['pages'] += phantom.navigations
+        meta['navigations'] = phantom.navigations
+        meta['restarts'] = phantom.restarts
+
+
+    def _expired(self, phantom):
+        meta = self._meta[phantom]
+        return (
+            (self.max_pages is not None and meta['pages'] >= self.max_pages) or
+            (self.max_age is not None and time() - meta['created'] >= self.max_age)
+        )
+
+
+    # starts drivers in background until the pool is full
+    def warm_up(self):
+        with self._cond:
+            if self._closed:
+                raise PhantomPoolError('The pool is closed')
+            spawn = self.size - self._total
+            self._total += spawn
+        for _ in range(spawn):
+            thread = Thread(target=self._spawn_idle)
+            thread.daemon = True
+            thread.start()
+
+    # ************************************************************************
+    # :: checkout/checkin ::
+    # ************************************************************************
+
+    def checkout(self, timeout=None):
+        if timeout is None:
+            timeout = self.timeout
+        elif not isinstance(timeout, (int, float)):
+            raise TypeError(':timeout must be int, float or None')
+
+        while True:
+            phantom, spawn = self._acquire(timeout)
+            if spawn:
+                try:
+                    return self._spawn()
+                except Exception as e:
+                    raise PhantomPoolError('Unable to start a driver :: %s' % str(e))
+            # an idle driver may get too old while waiting in the pool
+            with self._cond:
+                retire = self._expired(phantom)
+                if retire:
+                    self._stats['recycled'] += 1
+                    self._discard(phantom)
+            if not retire:
+                return phantom
+            self._stop(phantom)
+
+
+    # returns (idle driver, False) or (None, True) if a new one has to be spawned
+    def _acquire(self, timeout):
+        timestamp = time()
+
+        with self._cond:
+            if self._closed:
+                raise PhantomPoolError('The pool is closed')
+
+            if self._idle:
+                self._stats['hits'] += 1
+                return self._idle.pop(), False
+
+            self._stats['misses'] += 1
+
+            if self._total < self.size:
+                self._total += 1
+                return None, True
+
+            self._stats['waits'] += 1
+            deadline = None if timeout is None else timestamp + timeout
+            try:
+                while not self._idle:
+                    if self._closed:
+                        raise PhantomPoolError('The pool is closed')
+                    elif self._total < self.size:
+                        self._total += 1
+                        return None, True
+                    elif deadline is None:
+                        self._cond.wait()
+                    else:
+                        remaining = deadline - time()
+                        if remaining <= 0:
+                            raise PhantomPoolError(
+                                'No free driver after %s seconds' % timeout
+                            )
+                        self._cond.wait(remaining)
+                return self._idle.pop(), False
+            finally:
+                self._stats['wait_time'] += time() - timestamp
+
+
+    def checkin(self, phantom):
+        if not isinstance(phantom, Phantom):
+            raise TypeError(':phantom must be an instance of Phantom')
+
+        with self._cond:
+            if phantom not in self._meta:
+                raise PhantomPoolError('The driver does not belong to the pool')
+            self._count_pages(phantom)
+            retire = self._closed or self._expired(phantom)
+            if retire:
+                if not self._closed:
+                    self._stats['recycled'] += 1
+                self._discard(phantom)
+
+        if not retire:
+            try:
+                phantom.new_session(**self.session)
+            except Exception:
+                with self._cond:
+                    self._stats['reset_errors'] += 1
+                    self._discard(phantom)
+                retire = True
+            else:
+                self._release(phantom)
+                return
+
+        self._stop(phantom)
+        try:
+            self.warm_up()
+        except PhantomPoolError:
+            pass
+
+
+    @contextmanager
+    def phantom(self, timeout=None):
+        phantom = self.checkout(timeout=timeout)
+        try:
+            yield phantom
+        finally:
+            self.checkin(phantom)
+
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            for phantom in idle:
+                self._discard(phantom)
+            self._cond.notify_all()
+        for phantom in idle:
+            self._stop(phantom)
+
+    # ************************************************************************
+    # :: stats ::
+    # ************************************************************************
+
+    @property
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['size'] = self._total
+            stats['idle'] = len(self._idle)
+            stats['busy'] = len(self._meta) - len(self._idle)
+        requests = stats['hits'] + stats['misses']
+        stats['hit_rate'] = float(stats['hits']) / requests if requests else None
+        stats['avg_wait_time'] = (
+            stats['wait_time'] / stats['waits'] if stats['waits'] else None
+        )
+        stats['avg_spawn_time'] = (
+            stats['spawn_time'] / stats['spawned'] if stats['spawned'] else None
+        )
+        return stats
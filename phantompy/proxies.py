@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+
+from threading import Lock
+from time import time
+
+from .base import Phantom, PhantomError
+from .utils import regex
+
+
+__all__ = ['ProxyPool', 'ProxyPoolError']
+
+
+# the weight of the last latency in EWMA
+PROXY_EWMA_ALPHA = 0.3
+
+# the first quarantine of a failing proxy (in seconds),
+# doubled on every next failure in a row
+PROXY_QUARANTINE = 30
+
+PROXY_MAX_QUARANTINE = 3600
+
+
+class ProxyPoolError(PhantomError):
+    """phantompy::ProxyPoolError"""
+
+
+class ProxyPool(object):
+    """proxies::ProxyPool
+
+    Proxies shared by many drivers: the best one (by the success rate,
+    latency and the number of the drivers using it) is assigned on demand,
+    the failing ones are quarantined.
+
+    >>> proxies = ProxyPool(open('proxies.txt').read())
+    >>> proxies.assign(phantom)
+    >>> http_meta = proxies.open(phantom, 'http://example.com')
+
+    * proxies: a list of proxy URLs (see RE.PROXY_URL)
+      or a string with one URL per line
+    * the results of open() are reported automatically,
+      others are reported by report()
+    * a failing proxy is quarantined for :quarantine seconds
+      doubled on every next failure in a row (<= :max_quarantine)
+    * the timezone offset of a proxy is looked up by GeoIP only once
+    * as RetryPolicy's proxy_provider:
+      RetryPolicy(actions={'proxy': 'switch_proxy'}, proxy_provider=proxies.switch)
+
+    """
+
+    def __init__(self, proxies=None, ewma_alpha=PROXY_EWMA_ALPHA,
+                 quarantine=PROXY_QUARANTINE, max_quarantine=PROXY_MAX_QUARANTINE):
+
+        if not isinstance(ewma_alpha, (int, float)):
+            raise TypeError(':ewma_alpha must be int or float')
+        elif not 0 < ewma_alpha <= 1:
+            raise ValueError(':ewma_alpha must be in (0, 1]')
+        elif not isinstance(quarantine, (int, float)):
+            raise TypeError(':quarantine must be int or float')
+        elif not isinstance(max_quarantine, (int, float)):
+            raise TypeError(':max_quarantine must be int or float')
+
+        self.ewma_alpha = ewma_alpha
+        self.quarantine = quarantine
+        self.max_quarantine = max_quarantine
+
+        self._lock = Lock()
+        self._proxies = {}
+        # the assigned proxy by the driver
+        self._assigned = {}
+
+        if proxies:
+            self.add(proxies)
+
+
+    def __len__(self):
+        return len(self._proxies)
+
+    def __contains__(self, proxy):
+        return self._get_key(proxy) in self._proxies
+
+    # ************************************************************************
+    # :: proxies ::
+    # ************************************************************************
+
+    @staticmethod
+    def parse(proxies):
+        if isinstance(proxies, basestring):
+            proxies = proxies.splitlines()
+        elif not isinstance(proxies, (list, tuple, set)):
+            raise TypeError(':proxies must be list or string')
+
+        parsed = []
+        for proxy_url in proxies:
+            if not isinstance(proxy_url, basestring):
+                raise TypeError('Proxy URL must be string')
+            proxy_url = proxy_url.strip()
+            if not proxy_url or proxy_url.startswith('#'):
+                continue
+            proxy = Phantom.get_proxy(proxy_url)
+            parsed.append(dict([(k, v) for k, v in proxy.items() if v is not None]))
+
+        return parsed
+
+
+    # the proxy URL without the password (a proxy per user)
+    # * proxy: a proxy URL, config (see Phantom.get_proxy) or key
+    @staticmethod
+    def _get_key(proxy):
+        if proxy is None:
+            return
+        elif isinstance(proxy, basestring):
+            proxy = proxy.strip()
+            if not regex.RE.PROXY_URL.match(proxy):
+                return proxy
+        proxy = Phantom.get_proxy(proxy)
+        return '%s://%s%s:%s' % (
+            proxy['type'],
+            proxy['user'] + '@' if proxy.get('user') else '',
+            proxy['host'],
+            proxy['port'],
+        )
+
+
+    # * returns the number of the new proxies
+    def add(self, proxies):
+        added = 0
+        with self._lock:
+            for proxy in self.parse(proxies):
+                key = self._get_key(proxy)
+                if key in self._proxies:
+                    continue
+                self._proxies[key] = {
+                    'proxy': proxy,
+                    'attempts': 0,
+                    'successes': 0,
+                    'failures_in_row': 0,
+                    'latency': None,
+                    'quarantined_until': 0,
+                    'users': 0,
+                }
+                added += 1
+        return added
+
+
+    def remove(self, proxy):
+        with self._lock:
+            self._proxies.pop(self._get_key(proxy), None)
+
+    # ************************************************************************
+    # :: scoring ::
+    # ************************************************************************
+
+    # * must be called under the lock
+    def _get_score(self, meta, avg_latency):
+        # the success rate (Laplace smoothed for the fresh proxies)
+        success_rate = (meta['successes'] + 1.0) / (meta['attempts'] + 2.0)
+        latency = meta['latency'] if meta['latency'] is not None else avg_latency
+        return success_rate / (1.0 + latency) / (1.0 + meta['users'])
+
+
+    # * must be called under the lock
+    def _get_best(self, exclude=None):
+        now = time()
+
+        latencies = [
+            meta['latency'] for meta in self._proxies.values()
+            if meta['latency'] is not None
+        ]
+        avg_latency = sum(latencies) / len(latencies) if latencies else 0.0
+
+        best, best_score = None, None
+        for key, meta in self._proxies.items():
+            if key == exclude or meta['quarantined_until'] > now:
+                continue
+            score = self._get_score(meta, avg_latency)
+            if best_score is None or score > best_score:
+                best, best_score = key, score
+
+        return best
+
+
+    # the best available proxy's config
+    # * the timezone offset is included if known (see Phantom.get_proxy)
+    def get(self, exclude=None):
+        with self._lock:
+            key = self._get_best(self._get_key(exclude))
+            if key is None:
+                raise ProxyPoolError('No available proxies')
+            return dict(self._proxies[key]['proxy'])
+
+
+    def report(self, proxy, ok, latency=None):
+        if latency is not None and not isinstance(latency, (int, float)):
+            raise TypeError(':latency must be int, float or None')
+
+        with self._lock:
+            meta = self._proxies.get(self._get_key(proxy))
+            if meta is None:
+                return
+
+            meta['attempts'] += 1
+
+            if ok:
+                meta['successes'] += 1
+                meta['failures_in_row'] = 0
+                meta['quarantined_until'] = 0
+                if latency is not None:
+                    if meta['latency'] is None:
+                        meta['latency'] = float(latency)
+                    else:
+                        meta['latency'] += self.ewma_alpha * (latency - meta['latency'])
+            else:
+                meta['failures_in_row'] += 1
+                meta['quarantined_until'] = time() + min(
+                    self.max_quarantine,
+                    self.quarantine * 2 ** (meta['failures_in_row'] - 1)
+                )
+
+    # ************************************************************************
+    # :: drivers ::
+    # ************************************************************************
+
+    # sets the best proxy (other than the current one if :rotate)
+    # to the driver
+    def assign(self, phantom, rotate=False):
+        if not isinstance(phantom, Phantom):
+            raise TypeError(':phantom must be an instance of Phantom')
+
+        with self._lock:
+            current = self._assigned.pop(phantom, None)
+            if current in self._proxies:
+                self._proxies[current]['users'] -= 1
+            key = self._get_best(current if rotate else None)
+            if key is None:
+                # the current proxy stays assigned
+                if current in self._proxies:
+                    self._proxies[current]['users'] += 1
+                    self._assigned[phantom] = current
+                raise ProxyPoolError('No available proxies')
+            meta = self._proxies[key]
+            meta['users'] += 1
+            self._assigned[phantom] = key
+            proxy = dict(meta['proxy'])
+
+        # only the first assignment looks up the timezone offset
+        if 'timezone_offset' not in proxy:
+            proxy['timezone_offset'] = Phantom._pop_proxy_timezone_offset(dict(proxy))
+            with self._lock:
+                if key in self._proxies:
+                    self._proxies[key]['proxy']['timezone_offset'] = proxy['timezone_offset']
+
+        try:
+            phantom.proxy = proxy
+        except PhantomError:
+            self.release(phantom)
+            raise
+
+        return proxy
+
+
+    def release(self, phantom):
+        with self._lock:
+            key = self._assigned.pop(phantom, None)
+            if key in self._proxies:
+                self._proxies[key]['users'] -= 1
+
+
+    # reports a failure of the driver's proxy and assigns another one
+    # * returns None (the proxy is already set, see RetryPolicy)
+    def switch(self, phantom):
+        key = self._get_assigned(phantom)
+        if key is not None:
+            self.report(key, False)
+        self.assign(phantom, rotate=True)
+
+
+    def _get_assigned(self, phantom):
+        with self._lock:
+            return self._assigned.get(phantom)
+
+
+    # Phantom.open via the assigned proxy reporting the result
+    # (a 5xx response is a failure)
+    # * the result is reported for the proxy assigned after the load
+    #   (it may be switched by RetryPolicy)
+    def open(self, phantom, url, **kwargs):
+        if self._get_assigned(phantom) is None:
+            self.assign(phantom)
+
+        timestamp = time()
+        try:
+            http_meta = phantom.open(url, **kwargs)
+        except PhantomError:
+            self.report(self._get_assigned(phantom), False)
+            raise
+
+        ok = not http_meta or http_meta['response']['status_code'] < 500
+        self.report(self._get_assigned(phantom), ok, time() - timestamp)
+
+        return http_meta
+
+    # ************************************************************************
+    # :: stats ::
+    # ************************************************************************
+
+    # by the proxy URL (without the password, see _get_key)
+    @property
+    def stats(self):
+        now = time()
+        stats = {}
+        with self._lock:
+            for key, meta in self._proxies.items():
+                stats[key] = {
+                    'attempts': meta['attempts'],
+                    'successes': meta['successes'],
+                    'success_rate': (
+                        float(meta['successes']) / meta['attempts']
+                        if meta['attempts'] else None
+                    ),
+                    'latency': meta['latency'],
+                    'quarantined': max(0, meta['quarantined_until'] - now),
+                    'users': meta['users'],
+                    'timezone_offset': meta['proxy'].get('timezone_offset'),
+                }
+        return stats
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+from random import random
+from threading import Lock
+from time import time, sleep
+
+
+__all__ = ['RetryPolicy']
+
+
+# the classes of navigation errors
+ERROR_CLASSES = ('timeout', 'proxy', 'dns', 'connection', 'ssl', 'http_5xx', 'other')
+
+# QNetworkReply error codes (onResourceError's errorCode) -> error class
+NETWORK_ERRORS = {
+    1: 'connection', # ConnectionRefusedError
+    2: 'connection', # RemoteHostClosedError
+    3: 'dns', # HostNotFoundError
+    4: 'timeout', # TimeoutError
+    6: 'ssl', # SslHandshakeFailedError
+    7: 'connection', # TemporaryNetworkFailureError
+    8: 'connection', # NetworkSessionFailedError
+    99: 'connection', # UnknownNetworkError
+    101: 'proxy', # ProxyConnectionRefusedError
+    102: 'proxy', # ProxyConnectionClosedError
+    103: 'proxy', # ProxyNotFoundError
+    104: 'proxy', # ProxyTimeoutError
+    105: 'proxy', # ProxyAuthenticationRequiredError
+    199: 'proxy', # UnknownProxyError
+    408: 'timeout', # onResourceTimeout
+}
+
+# built-in actions (see RetryPolicy)
+ACTIONS = ('switch_proxy', 'reset_session', 'restart_driver')
+
+
+class RetryPolicy(object):
+    """retry::RetryPolicy
+
+    Retries of the page loads (Phantom.open/back/forward/refresh)
+    with exponential backoff and jitter.
+
+    >>> policy = RetryPolicy(
+    ...     attempts=3,
+    ...     actions={'proxy': 'switch_proxy', 'timeout': 'reset_session'},
+    ...     proxy_provider=lambda phantom: next_proxy(),
+    ... )
+    >>> phantom = Phantom(retry_policy=policy)
+
+    * attempts: None - Phantom.page_load_attempts
+    * a delay before the n-th retry: backoff * 2 ** (n - 1) (<= max_backoff)
+      reduced by a random part of up to :jitter (0..1)
+    * retry_on: the error classes to retry (timeout, proxy, dns, connection,
+      ssl, http_5xx, other)
+    * actions: error class -> 'switch_proxy', 'reset_session',
+      'restart_driver' or callable(phantom, error_class, error)
+      taken before the retry
+    * proxy_provider: callable(phantom) returning a new proxy config
+      or None if it sets the proxy itself (e.g. ProxyPool.switch),
+      required by 'switch_proxy'
+    * the policy can be shared by many drivers (see stats)
+
+    """
+
+    def __init__(self, attempts=None, backoff=0.5, max_backoff=30, jitter=0.5,
+                 retry_on=('timeout', 'proxy', 'connection', 'http_5xx', 'other'),
+                 actions=None, proxy_provider=None):
+
+        if attempts is not None and not isinstance(attempts, int):
+            raise TypeError(':attempts must be int or None')
+        elif attempts is not None and attempts < 1:
+            raise ValueError(':attempts must be > 0')
+        elif not isinstance(backoff, (int, float)):
+            raise TypeError(':backoff must be int or float')
+        elif not isinstance(max_backoff, (int, float)):
+            raise TypeError(':max_backoff must be int or float')
+        elif not isinstance(jitter, (int, float)):
+            raise TypeError(':jitter must be int or float')
+        elif not 0 <= jitter <= 1:
+            raise ValueError(':jitter must be in 0..1')
+        elif proxy_provider is not None and not callable(proxy_provider):
+            raise TypeError(':proxy_provider must be callable')
+
+        for error_class in retry_on:
+            if error_class not in ERROR_CLASSES:
+                raise ValueError('Unsupported error class: %s' % error_class)
+
+        actions = dict(actions or {})
+        for error_class, action in actions.items():
+            if error_class not in ERROR_CLASSES:
+                raise ValueError('Unsupported error class: %s' % error_class)
+            elif not (callable(action) or action in ACTIONS):
+                raise ValueError('Unsupported action: %s' % action)
+            elif action == 'switch_proxy' and proxy_provider is None:
+                raise ValueError("'switch_proxy' action requires :proxy_provider")
+
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_on = set(retry_on)
+        self.actions = actions
+        self.proxy_provider = proxy_provider
+
+        self._lock = Lock()
+        self._stats = {}
+
+    # ************************************************************************
+    # :: stats ::
+    # ************************************************************************
+
+    # attempts and their time (in seconds) by the result: ok or error class
+    @property
+    def stats(self):
+        with self._lock:
+            stats = dict([(k, dict(v)) for k, v in self._stats.items()])
+        for v in stats.values():
+            v['avg_time'] = v['time'] / v['attempts']
+        return stats
+
+
+    def _record(self, result, duration):
+        with self._lock:
+            stats = self._stats.setdefault(result, {'attempts': 0, 'time': 0.0})
+            stats['attempts'] += 1
+            stats['time'] += duration
+
+    # ************************************************************************
+    # :: retries ::
+    # ************************************************************************
+
+    # the error class or None if the page is loaded
+    # * http_meta: the raw page.getHttpMeta() (see base.js)
+    def classify(self, error=None, http_meta=None):
+        response = (http_meta or {}).get('response')
+        network_error = (http_meta or {}).get('error')
+
+        if error is None and response:
+            if (response.get('status_code') or 0) >= 500:
+                return 'http_5xx'
+            return
+
+        if network_error and network_error.get('code') in NETWORK_ERRORS:
+            return NETWORK_ERRORS[network_error['code']]
+
+        message = str(error or '').lower()
+        if 'timeout' in message or 'timed out' in message:
+            return 'timeout'
+        elif 'proxy' in message:
+            return 'proxy'
+
+        return 'other'
+
+
+    def get_delay(self, retry):
+        delay = min(self.max_backoff, self.backoff * 2 ** (retry - 1))
+        return delay * (1 - self.jitter * random())
+
+
+    def apply_action(self, phantom, error_class, error):
+        action = self.actions.get(error_class)
+        if action is None:
+            return
+        elif callable(action):
+            action(phantom, error_class, error)
+        elif action == 'switch_proxy':
+            proxy = self.proxy_provider(phantom)
+            if proxy is not None:
+                phantom.proxy = proxy
+        elif action == 'reset_session':
+            phantom.reset_session()
+        elif action == 'restart_driver':
+            phantom.restart()
+
+
+    # calls attempt() until the page is loaded or no attempts left
+    # * attempt() returns (result, raw http_meta, error or None)
+    # * :attempts overrides the policy's attempts
+    # * returns (result, raw http_meta) of the last attempt
+    #   or raises the last attempt's error
+    def execute(self, phantom, attempt, attempts=None):
+        attempts = attempts or self.attempts or 1
+
+        retry = 0
+        while True:
+            timestamp = time()
+            result, http_meta, error = attempt()
+            error_class = self.classify(error, http_meta) if result or error else None
+            self._record(error_class or 'ok', time() - timestamp)
+
+            if (
+                error_class is None or
+                error_class not in self.retry_on or
+                retry + 1 >= attempts
+            ):
+                if error is not None:
+                    raise error
+                return result, http_meta
+
+            retry += 1
+            self.apply_action(phantom, error_class, error)
+            sleep(self.get_delay(retry))
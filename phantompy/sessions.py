@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import errno
+from json import dumps, loads
+from shutil import rmtree
+from tempfile import gettempdir, mkstemp
+from threading import Thread, Event, Lock
+from time import time
+
+
+__all__ = ['SessionStore', 'SessionsJanitor']
+
+
+# the default snapshots dir (shared by all the local workers)
+SNAPSHOTS_DIR = os.path.join(gettempdir(), 'phantompy-snapshots')
+
+SNAPSHOT_VERSION = 1
+
+SNAPSHOT_NAME = re.compile(r'^[\w.-]+$')
+
+
+class SessionStore(object):
+    """sessions::SessionStore
+
+    Session snapshots (see Phantom.save_session) stored as JSON files
+    in a local dir that can be shared by concurrent workers.
+
+    >>> store = SessionStore('/var/lib/phantompy/sessions')
+    >>> phantom.save_session('account-1', store=store)
+    >>> phantom.load_session('account-1', store=store)
+
+    * a snapshot is written into a temp file and renamed,
+      so a reader never sees a partially written one
+
+    """
+
+    def __init__(self, path=SNAPSHOTS_DIR):
+        if not (isinstance(path, basestring) and path):
+            raise TypeError(':path must be non-empty string')
+
+        self.path = os.path.realpath(path)
+        if not os.path.isdir(self.path):
+            try:
+                os.makedirs(self.path)
+            except OSError:
+                # created by another worker
+                if not os.path.isdir(self.path):
+                    raise
+
+
+    def __contains__(self, name):
+        return os.path.isfile(self._get_path(name))
+
+
+    def _get_path(self, name):
+        if not isinstance(name, basestring):
+            raise TypeError("Snapshot's :name must be string")
+        elif not SNAPSHOT_NAME.match(name):
+            raise ValueError("Unsupported snapshot's name: %s" % name)
+        return os.path.join(self.path, name + '.json')
+
+
+    def save(self, name, snapshot):
+        if not isinstance(snapshot, dict):
+            raise TypeError(':snapshot must be dict')
+
+        snapshot = dict(snapshot, version=SNAPSHOT_VERSION)
+        path = self._get_path(name)
+
+        fd, tmp_path = mkstemp(dir=self.path, prefix='.' + name, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(dumps(snapshot, separators=(',', ':')))
+            os.rename(tmp_path, path)
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+
+    def load(self, name):
+        path = self._get_path(name)
+        try:
+            with open(path) as f:
+                snapshot = loads(f.read())
+        except IOError:
+            if not os.path.isfile(path):
+                raise KeyError('No session snapshot: %s' % name)
+            raise
+
+        if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+            raise ValueError('Unsupported session snapshot: %s' % name)
+
+        return snapshot
+
+
+    def delete(self, name):
+        try:
+            os.remove(self._get_path(name))
+        except OSError:
+            if name in self:
+                raise
+
+
+    def names(self):
+        return sorted(
+            filename[:-len('.json')]
+            for filename in os.listdir(self.path)
+            if filename.endswith('.json') and not filename.startswith('.')
+        )
+
+
+# the janitor's check interval (in seconds)
+JANITOR_INTERVAL = 60
+
+# a marked session dir without the owner's and the driver's pids
+# is considered orphaned if it hasn't been modified for (in seconds)
+JANITOR_GRACE = 300
+
+
+# the file marking a session dir created by phantompy (see SessionsJanitor.mark)
+# * holds the pid of the owning (Python) process
+SESSION_MARKER = 'phantompy.owner'
+
+SESSION_DIR_NAME = re.compile(
+    r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
+)
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
+class SessionsJanitor(Thread):
+    """sessions::SessionsJanitor
+
+    Removes orphaned session dirs (left by killed workers),
+    i.e. the ones whose owner process and driver.pid process
+    are no longer alive.
+
+    >>> SessionsJanitor.ensure('/dev/shm/phantompy')
+
+    * only one janitor per dir is started in the process by ensure()
+    * only the dirs created by phantompy (uuid named and marked, see mark)
+      are ever removed, anything else in the dir is left alone
+
+    """
+
+    _janitors = {}
+    _janitors_lock = Lock()
+
+    def __init__(self, path, interval=JANITOR_INTERVAL, grace=JANITOR_GRACE):
+        if not (isinstance(path, basestring) and path):
+            raise TypeError(':path must be non-empty string')
+        elif not isinstance(interval, (int, float)):
+            raise TypeError(':interval must be int or float')
+        elif interval <= 0:
+            raise ValueError(':interval must be > 0')
+        elif not isinstance(grace, (int, float)):
+            raise TypeError(':grace must be int or float')
+
+        super(SessionsJanitor, self).__init__()
+        self.daemon = True
+
+        self.path = os.path.realpath(path)
+        self.interval = interval
+        self.grace = grace
+
+        # removed dirs
+        self.removed = 0
+
+        self._stopped = Event()
+
+
+    @classmethod
+    def ensure(cls, path, **kwargs):
+        path = os.path.realpath(path)
+        with cls._janitors_lock:
+            janitor = cls._janitors.get(path)
+            if janitor is None or not janitor.is_alive():
+                janitor = cls._janitors[path] = cls(path, **kwargs)
+                janitor.start()
+        return janitor
+
+
+    # marks the session dir as owned by the current process
+    @staticmethod
+    def mark(session_dir):
+        with open(os.path.join(session_dir, SESSION_MARKER), 'w') as f:
+            f.write(str(os.getpid()))
+
+
+    def stop(self):
+        self._stopped.set()
+
+
+    def run(self):
+        while True:
+            try:
+                self.cleanup()
+            except Exception:
+                pass
+            if self._stopped.wait(self.interval):
+                break
+
+
+    def cleanup(self):
+        removed = []
+
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return removed
+
+        for name in names:
+            session_dir = os.path.join(self.path, name)
+            if self.orphaned(session_dir):
+                rmtree(session_dir, ignore_errors=True)
+                removed.append(session_dir)
+
+        self.removed += len(removed)
+        return removed
+
+
+    def orphaned(self, session_dir):
+        if not (
+            SESSION_DIR_NAME.match(os.path.basename(session_dir)) and
+            os.path.isdir(session_dir) and
+            os.path.isfile(os.path.join(session_dir, SESSION_MARKER))
+        ):
+            return False
+
+        # a live Phantom keeps its dir even if the driver is dead (see restart)
+        owner = self._read_pid(session_dir, SESSION_MARKER)
+        if owner is not None and pid_alive(owner):
+            return False
+
+        pid = self._read_pid(session_dir, 'driver.pid')
+        if pid is not None:
+            return not pid_alive(pid)
+        elif owner is not None:
+            return True
+
+        # the marker is being written
+        try:
+            return time() - os.path.getmtime(session_dir) > self.grace
+        except OSError:
+            return False
+
+
+    @staticmethod
+    def _read_pid(session_dir, filename):
+        try:
+            with open(os.path.join(session_dir, filename)) as f:
+                return int(f.read().strip())
+        except (IOError, ValueError):
+            return None
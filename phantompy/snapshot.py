@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+import zlib
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+from .utils import parse_selector
+
+
+__all__ = ['DOMSnapshot']
+
+
+# the attribute marking the elements' visibility (see Phantom.snapshot)
+VISIBLE_ATTR = 'data-phantompy-visible'
+
+
+class DOMSnapshot(object):
+    """snapshot::DOMSnapshot
+
+    The rendered DOM of a page queried locally by lxml
+    (see Phantom.snapshot).
+
+    >>> snapshot = phantom.snapshot(visibility=True)
+    >>> [a.get('href') for a in snapshot.select('css:a') if snapshot.visible(a)]
+
+    * the links are resolved against the page's URL
+    * the HTML is parsed on the first query, only the (compressed) HTML
+      is pickled
+
+    """
+
+    def __init__(self, html, url=None, visibility=False):
+        if lxml is None:
+            raise ImportError('lxml is required (https://pypi.python.org/pypi/lxml)')
+        elif not isinstance(html, basestring):
+            raise TypeError(':html must be string')
+        elif url is not None and not isinstance(url, basestring):
+            raise TypeError(':url must be string or None')
+
+        self.html = html.decode('utf-8') if isinstance(html, str) else html
+        self.url = url
+        self.visibility = visibility
+
+        self._root = None
+
+
+    def __getstate__(self):
+        return {
+            'html': zlib.compress(self.html.encode('utf-8')),
+            'url': self.url,
+            'visibility': self.visibility,
+        }
+
+    def __setstate__(self, state):
+        self.html = zlib.decompress(state['html']).decode('utf-8')
+        self.url = state['url']
+        self.visibility = state['visibility']
+        self._root = None
+
+
+    @property
+    def root(self):
+        if self._root is None:
+            if not self.html.strip():
+                raise ValueError('Empty snapshot')
+            root = lxml.html.document_fromstring(self.html, base_url=self.url)
+            if self.url:
+                root.make_links_absolute(self.url)
+            self._root = root
+        return self._root
+
+
+    def xpath(self, xpath):
+        return self.root.xpath(xpath)
+
+    # requires cssselect
+    def css(self, selector):
+        return self.root.cssselect(selector)
+
+    # XPath or CSS (see parse_selector)
+    def select(self, selector):
+        selector = parse_selector(selector)
+        if selector['type'] == 'css':
+            return self.css(selector['value'])
+        return self.xpath(selector['value'])
+
+
+    # * the snapshot must be taken with :visibility
+    def visible(self, elem):
+        if not self.visibility:
+            raise ValueError('The snapshot is taken without :visibility')
+        return elem.get(VISIBLE_ATTR) == '1'
@@ -9,6 +9,8 @@ from random import uniform
 from threading import Lock
 from time import sleep
 
+from .regex import RE
+
 
 __all__ = [
     'sliding_window',
@@ -21,6 +23,7 @@ __all__ = [
     'thread_safe',
     'ThreadSafeIterator',
     'ThreadSafeCounter',
+    'parse_selector',
 ]
 
 
@@ -203,4 +206,15 @@ class ScriptLock(object):
                 raise SystemExit
 
 
-
+# {'type': 'xpath' or 'css', 'value': selector} detected by RE.XPATH_SELECTOR
+# (or forced by the "xpath:" or "css:" prefix)
+def parse_selector(selector):
+    if not (isinstance(selector, basestring) and selector.strip()):
+        raise TypeError('Selector must be non-empty string')
+    elif selector.startswith('css:'):
+        return {'type': 'css', 'value': selector[len('css:'):].strip()}
+    elif selector.startswith('xpath:'):
+        return {'type': 'xpath', 'value': selector[len('xpath:'):].strip()}
+    elif RE.XPATH_SELECTOR.search(selector):
+        return {'type': 'xpath', 'value': selector}
+    return {'type': 'css', 'value': selector}
@@ -16,17 +16,27 @@ IPv4_PORT = re.compile(r'^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}:\d{2,5}$')
 
 # Proxy URL
 PROXY_URL = re.compile(
-    r'^(?:(?P<type>(http|http_tunnel|socks4|socks5))://)?'
+    r'^(?:(?P<type>(http|http_tunnel|socks|socks4|socks5))://)?'
     r'(?:(?P<user>\w+):(?P<passwd>\w+)@)?'
     r'(?P<host>\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}):(?P<port>\d{2,5})/?$',
     re.I
 )
 # Proxy type
-PROXY_TYPE = re.compile(r'^(http|http_tunnel|socks4|socks5)$', re.I)
+PROXY_TYPE = re.compile(r'^(http|http_tunnel|socks|socks4|socks5)$', re.I)
 
 # HTTP status code
 HTTP_STATUS_CODE = re.compile(r'^HTTP/1.[01] (\d{3})')
 
+# XPath (not CSS) selector: starts with "/", "./", "../", "(" or "@",
+# or has an axis ("child::", not CSS "::before"), an attribute predicate ("[@")
+# or a node test ("text()")
+XPATH_SELECTOR = re.compile(
+    r'^\s*(?:\.{0,2}/|\(|@)|\[@|\w\(\)|'
+    r'(?:^|[\s/\[(|,])(?:ancestor|ancestor-or-self|attribute|child|descendant|'
+    r'descendant-or-self|following|following-sibling|namespace|parent|'
+    r'preceding|preceding-sibling|self)::'
+)
+
 
 
 _re_type = type(re.compile(''))
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+import os
+from threading import Thread, Event
+from time import time
+
+
+__all__ = ['Watchdog']
+
+
+PROC_DIR = '/proc'
+
+try:
+    CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+except (AttributeError, ValueError, OSError):
+    CLOCK_TICKS = 100
+
+# sampling interval (in seconds)
+WATCHDOG_INTERVAL = 5
+
+
+class Watchdog(Thread):
+    """watchdog::Watchdog
+
+    Samples RSS and CPU usage of the driver's process from /proc and fires
+    the callbacks when a threshold is exceeded.
+
+    >>> watchdog = Watchdog(phantom, max_rss=512, max_navigations=1000)
+    >>> watchdog.start()
+
+    * max_rss: in MB
+    * max_cpu: in % of one core (averaged over the sampling interval)
+    * callbacks: callback(phantom, reason, sample),
+      the reason is one of 'rss', 'cpu', 'navigations' or 'dead'
+    * auto_restart: the driver will be restarted by Phantom
+      before the next driver command (see Phantom.execute)
+
+    """
+
+    def __init__(self, phantom, max_rss=None, max_cpu=None, max_navigations=None,
+                 callbacks=None, auto_restart=True, interval=WATCHDOG_INTERVAL):
+
+        if max_rss is not None and not isinstance(max_rss, (int, float)):
+            raise TypeError(':max_rss must be int, float or None')
+        elif max_cpu is not None and not isinstance(max_cpu, (int, float)):
+            raise TypeError(':max_cpu must be int, float or None')
+        elif max_navigations is not None and not isinstance(max_navigations, int):
+            raise TypeError(':max_navigations must be int or None')
+        elif callbacks is not None and not (
+            isinstance(callbacks, (list, tuple)) and all(map(callable, callbacks))
+        ):
+            raise TypeError(':callbacks must be list of callables')
+        elif not isinstance(interval, (int, float)):
+            raise TypeError(':interval must be int or float')
+        elif interval <= 0:
+            raise ValueError(':interval must be > 0')
+
+        super(Watchdog, self).__init__()
+        self.daemon = True
+
+        self.phantom = phantom
+        self.max_rss = max_rss
+        self.max_cpu = max_cpu
+        self.max_navigations = max_navigations
+        self.callbacks = list(callbacks or [])
+        self.auto_restart = auto_restart
+        self.interval = interval
+
+        # the last sample
+        self.sample = None
+
+        self._stopped = Event()
+        self._cpu_time = None
+        self._fired = set()
+
+
+    def stop(self):
+        self._stopped.set()
+
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                continue
+
+
+    def check(self):
+        sample = self.get_sample(self.phantom.pid)
+        sample['navigations'] = self.phantom.navigations
+        self.sample = sample
+
+        exceeded = []
+        if not sample['alive']:
+            exceeded.append('dead')
+        else:
+            if self.max_rss is not None and sample['rss'] > self.max_rss * 1024 * 1024:
+                exceeded.append('rss')
+            if (
+                self.max_cpu is not None and
+                sample['cpu'] is not None and
+                sample['cpu'] > self.max_cpu
+            ):
+                exceeded.append('cpu')
+        if (
+            self.max_navigations is not None and
+            sample['navigations'] >= self.max_navigations
+        ):
+            exceeded.append('navigations')
+
+        # fire once until the value gets back under the threshold
+        fire = [reason for reason in exceeded if reason not in self._fired]
+        self._fired = set(exceeded)
+
+        for reason in fire:
+            for callback in self.callbacks:
+                try:
+                    callback(self.phantom, reason, sample)
+                except Exception:
+                    pass
+
+        if fire and self.auto_restart:
+            self.phantom.restart_pending = fire[0]
+
+        return fire
+
+
+    def get_sample(self, pid):
+        sample = {
+            'pid': pid,
+            'timestamp': time(),
+            'alive': False,
+            'rss': None,
+            'cpu': None,
+        }
+
+        try:
+            with open(os.path.join(PROC_DIR, str(pid), 'status')) as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        sample['rss'] = int(line.split()[1]) * 1024
+                        break
+            with open(os.path.join(PROC_DIR, str(pid), 'stat')) as f:
+                # the process name may contain spaces
+                stat = f.read().rsplit(')', 1)[1].split()
+        except (IOError, OSError, IndexError, ValueError):
+            self._cpu_time = None
+            return sample
+
+        # zombie
+        if stat[0] == 'Z':
+            self._cpu_time = None
+            return sample
+
+        sample['alive'] = True
+
+        # utime + stime (14th and 15th fields)
+        cpu_time = float(int(stat[11]) + int(stat[12])) / CLOCK_TICKS
+        if self._cpu_time is not None and self._cpu_time[0] == pid:
+            wall_time = sample['timestamp'] - self._cpu_time[1]
+            if wall_time > 0:
+                sample['cpu'] = (cpu_time - self._cpu_time[2]) / wall_time * 100
+        self._cpu_time = (pid, sample['timestamp'], cpu_time)
+
+        return sample
@@ -33,6 +33,11 @@ setup(
         'python-dateutil>=2.5.2',
         'tldextract>=1.7.5',
     ],
+    extras_require={
+        'async': ['tornado>=4.3'],
+        'fetch': ['requests[socks]>=2.10.0'],
+        'snapshot': ['lxml>=3.4.0', 'cssselect>=0.9.1'],
+    },
     package_data= {'': ['bin/*', 'js/*', 'utils/geoip/data/*']},
 )
 
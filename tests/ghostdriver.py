@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+
+import re
+import sys
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from json import dumps, loads
+from threading import Lock, Thread
+from uuid import uuid4
+
+from selenium.webdriver.common.desired_capabilities import DesiredCapabilities
+from selenium.webdriver.remote.webdriver import WebDriver as RemoteWebDriver
+
+from phantompy.base import Phantom
+from phantompy.connection import PooledConnection
+
+
+__all__ = ['StubGhostDriver', 'StubPhantom']
+
+
+# a script of the batch (see PhantomBase._get_batch_script)
+BATCH_SCRIPT = re.compile(
+    r'try \{ __batch__\.push\(\{value: \(function\(\) \{ (.*?) \}\)\.call\(page\)\}\); \} '
+    r'catch \(e\) \{ __batch__\.push\(\{error: String\(e\.stack \|\| e\)\}\); \}',
+    re.DOTALL
+)
+
+
+class StubGhostDriverServer(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class StubGhostDriverHandler(BaseHTTPRequestHandler):
+
+    # keep-alive
+    protocol_version = 'HTTP/1.1'
+
+    # the response is sent by a single write
+    # (unbuffered headers stall the keep-alive connections by delayed ACK)
+    wbufsize = -1
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.driver.connected()
+
+    def _answer(self):
+        length = int(self.headers.getheader('Content-Length') or 0)
+        body = self.rfile.read(length) if length else ''
+        params = loads(body) if body.strip() else {}
+
+        status, value = self.server.driver.answer(self.command, self.path, params)
+
+        # the session of the command or the new one
+        session = re.search(r'/session/([^/]+)', self.path)
+        data = dumps({
+            'sessionId': session.group(1) if session else self.server.driver.session_id,
+            'status': status,
+            'value': value,
+        })
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json;charset=UTF-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_DELETE = _answer
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubGhostDriver(object):
+    """A WebDriver server standing in for GhostDriver
+
+    * the commands are recorded as (method, path, params)
+    * the scripts (incl. the ones of PhantomJS batches) are answered by
+      the first handler matching the script (see on_script), None otherwise
+    * the elements are found by (parent element id, selector) (see elements)
+
+    >>> driver = StubGhostDriver()
+    >>> driver.start()
+    >>> driver.on_script('return phantom.cookies', lambda script, args: [])
+    >>> driver.stop()
+
+    """
+
+    prefix = '/wd/hub'
+
+    def __init__(self):
+        self.commands = []
+        self.connections = 0
+        # the last created session, all the open ones are answered
+        self.session_id = None
+        self.sessions = set()
+        self.current_url = 'about:blank'
+
+        # the cookies added by WebDriver commands
+        self.cookies = []
+
+        # {(parent element id or None, selector): [element id, ...]}
+        self.elements = {}
+
+        self._scripts = []
+        self._lock = Lock()
+
+        self.server = StubGhostDriverServer(('127.0.0.1', 0), StubGhostDriverHandler)
+        self.server.driver = self
+        self._thread = None
+
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%s%s' % (self.server.server_port, self.prefix)
+
+
+    def start(self):
+        self._thread = Thread(target=self.server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self._thread.join()
+
+
+    def connected(self):
+        with self._lock:
+            self.connections += 1
+
+
+    def reset(self):
+        with self._lock:
+            del self.commands[:]
+            self.connections = 0
+
+
+    # :answer(script, args) returns the script's result
+    def on_script(self, substring, answer):
+        self._scripts.insert(0, (substring, answer))
+
+
+    def answer(self, method, path, params):
+        with self._lock:
+            self.commands.append((method, path, params))
+
+        if path.startswith(self.prefix):
+            path = path[len(self.prefix):]
+
+        if (method, path) == ('POST', '/session'):
+            with self._lock:
+                self.session_id = str(uuid4())
+                self.sessions.add(self.session_id)
+            return 0, {'browserName': 'phantomjs', 'javascriptEnabled': True}
+
+        match = re.match(r'^/session/([^/]+)(/.*)?$', path)
+        if not match or match.group(1) not in self.sessions:
+            return 6, {'message': 'No such session'}
+        command = match.group(2) or ''
+
+        if method == 'DELETE' and not command:
+            with self._lock:
+                self.sessions.discard(match.group(1))
+                if match.group(1) == self.session_id:
+                    self.session_id = None
+            return 0, None
+        elif command == '/phantom/execute':
+            return 0, self.execute_phantomjs_script(params['script'])
+        elif command in ('/execute', '/execute_async'):
+            return 0, self.execute_script(params['script'], params.get('args') or [])
+        elif command == '/url':
+            if method == 'POST':
+                self.current_url = params['url']
+                return 0, None
+            return 0, self.current_url
+        elif command == '/cookie':
+            if method == 'POST':
+                self.cookies.append(params['cookie'])
+            elif method == 'DELETE':
+                del self.cookies[:]
+            else:
+                return 0, self.cookies
+            return 0, None
+        elif command.startswith('/timeouts') or command in ('/moveto', '/click'):
+            return 0, None
+        elif command == '/elements':
+            return 0, self.find_elements(None, params['value'])
+
+        match = re.match(r'^/element/([^/]+)/(\w+)(?:/(.+))?$', command)
+        if match:
+            id, name, arg = match.groups()
+            if name == 'elements':
+                return 0, self.find_elements(id, params['value'])
+            elif name == 'text':
+                return 0, 'text of %s' % id
+            elif name == 'attribute':
+                return 0, '%s of %s' % (arg, id)
+            elif name == 'name':
+                return 0, 'button'
+            elif name in ('enabled', 'displayed'):
+                return 0, True
+            elif name == 'location':
+                return 0, {'x': 0, 'y': 0}
+            elif name == 'size':
+                return 0, {'width': 100, 'height': 20}
+
+        return 9, {'message': 'Unknown command: %s %s' % (method, path)}
+
+
+    def find_elements(self, parent, selector):
+        return [{'ELEMENT': _} for _ in self.elements.get((parent, selector), [])]
+
+
+    def execute_script(self, script, args):
+        for substring, answer in self._scripts:
+            if substring in script:
+                return answer(script, args)
+        return None
+
+
+    def execute_phantomjs_script(self, script):
+        if script.startswith('var page = this; '):
+            script = script[len('var page = this; '):]
+        if '__batch__' not in script:
+            return self.execute_script(script, [])
+        return [
+            {'value': self.execute_script(_, [])}
+            for _ in BATCH_SCRIPT.findall(script)
+        ]
+
+
+class StubPhantom(Phantom):
+    """Phantom connected to StubGhostDriver instead of a PhantomJS process
+
+    * the driver commands sent are counted (see commands)
+
+    """
+
+    def __init__(self, stub, **kwargs):
+        self.stub = stub
+        self.commands = 0
+        # the path must exist, it's never executed
+        kwargs.setdefault('binary', sys.executable)
+        Phantom.__init__(self, **kwargs)
+
+
+    def _start_driver(self):
+        RemoteWebDriver.__init__(
+            self,
+            command_executor=PooledConnection(
+                self.stub.url,
+                pool_size=self.connection_pool_size,
+            ),
+            desired_capabilities=dict(DesiredCapabilities.PHANTOMJS),
+        )
+        self._is_remote = False
+        self.command_executor._commands['executePhantomScript'] = (
+            'POST',
+            '/session/$sessionId/phantom/execute'
+        )
+        self.startup_timings = {}
+
+
+    def _quit(self):
+        RemoteWebDriver.quit(self)
+
+
+    def execute(self, driver_command, params=None):
+        self.commands += 1
+        return Phantom.execute(self, driver_command, params)
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+from tornado import gen
+from tornado.httpclient import AsyncHTTPClient
+from tornado.testing import AsyncTestCase, gen_test
+
+from phantompy.aio import AsyncPhantom, AsyncElement
+from phantompy.base import PhantomError
+
+from .ghostdriver import StubGhostDriver
+
+
+class AsyncPhantomTest(AsyncTestCase):
+
+    def setUp(self):
+        AsyncTestCase.setUp(self)
+        self.driver = StubGhostDriver()
+        self.driver.start()
+        self.driver.elements[(None, '//li')] = ['1', '2', '3']
+        self.driver.on_script('page.getHttpMeta()', self.get_http_meta)
+        self.driver.on_script('var getState = function(el)', self.get_state)
+        self.http_client = AsyncHTTPClient(force_instance=True)
+
+    def tearDown(self):
+        self.http_client.close()
+        self.driver.stop()
+        AsyncTestCase.tearDown(self)
+
+    # page.getHttpMeta() of the stub: 200 for the current URL
+    def get_http_meta(self, script, args):
+        return {
+            'request': {'url': self.driver.current_url, 'headers': []},
+            'response': {
+                'url': self.driver.current_url,
+                'status_code': 200,
+                'headers': [{'name': 'Content-Type', 'value': 'text/html'}],
+            },
+        }
+
+    # element_state.js of the stub: '3' is a link
+    def get_state(self, script, args):
+        link = args[0]['ELEMENT'] == '3'
+        return {
+            'tag': 'a' if link else 'li',
+            'href': '/next' if link else None,
+            'type': None,
+            'form_action': None,
+            'displayed': True,
+            'enabled': args[0]['ELEMENT'] != '1',
+            'rect': {'x': 0, 'y': 0, 'width': 100, 'height': 20},
+            'offset': {'x': 0, 'y': 0},
+        }
+
+    # the command's path as the stub records it
+    def path(self, path):
+        return self.driver.prefix + path
+
+    @gen.coroutine
+    def start_phantom(self):
+        phantom = AsyncPhantom(
+            command_executor=self.driver.url,
+            http_client=self.http_client,
+        )
+        yield phantom.start()
+        self.driver.reset()
+        raise gen.Return(phantom)
+
+    def commands(self, method=None):
+        return [
+            _ for _ in self.driver.commands
+            if method is None or _[0] == method
+        ]
+
+    @gen_test
+    def test_start(self):
+        phantom = AsyncPhantom(
+            command_executor=self.driver.url,
+            http_client=self.http_client,
+        )
+        yield phantom.start()
+
+        self.assertEqual(phantom.session_id, self.driver.session_id)
+        self.assertEqual(self.driver.commands[0][:2], ('POST', self.path('/session')))
+        # the session is applied by a single batch
+        scripts = [
+            _ for _ in self.driver.commands if _[1].endswith('/phantom/execute')
+        ]
+        self.assertEqual(len(scripts), 1)
+        self.assertIsNone(phantom.service)
+        self.assertIn('total', phantom.startup_timings)
+
+    @gen_test
+    def test_start_twice(self):
+        phantom = yield self.start_phantom()
+        with self.assertRaises(PhantomError):
+            yield phantom.start()
+
+    @gen_test
+    def test_open(self):
+        phantom = yield self.start_phantom()
+        url = 'http://example.com/'
+
+        http_meta = yield phantom.open(url)
+
+        self.assertEqual(http_meta['response']['status_code'], 200)
+        self.assertEqual(http_meta['response']['headers'], {'Content-Type': 'text/html'})
+        self.assertFalse(http_meta['response']['redirect'])
+        self.assertEqual(phantom.history, [url])
+        self.assertIn(
+            ('POST', self.path('/session/%s/url' % phantom.session_id), {'url': url}),
+            self.driver.commands,
+        )
+        current_url = yield phantom.current_url()
+        self.assertEqual(current_url, url)
+
+    @gen_test
+    def test_xpath(self):
+        phantom = yield self.start_phantom()
+
+        elements = yield phantom.xpath('//li')
+
+        self.assertEqual([_.id for _ in elements], ['1', '2', '3'])
+        self.assertTrue(all(isinstance(_, AsyncElement) for _ in elements))
+        self.assertEqual(
+            self.driver.commands[-1][2],
+            {'using': 'xpath', 'value': '//li'},
+        )
+        text = yield elements[0].text()
+        self.assertEqual(text, 'text of 1')
+
+    @gen_test
+    def test_xpath_timeout(self):
+        phantom = yield self.start_phantom()
+
+        yield phantom.xpath('//li', timeout=5)
+
+        # the custom implicit timeout is set and restored around the command
+        timeouts = [
+            _[2]['ms'] for _ in self.driver.commands if _[1].endswith('/timeouts')
+        ]
+        self.assertEqual(timeouts, [5000, phantom.config['xpath_timeout'] * 1000])
+
+    @gen_test
+    def test_click(self):
+        phantom = yield self.start_phantom()
+        elements = yield phantom.xpath('//li')
+        self.driver.reset()
+
+        http_meta = yield elements[1].click()
+
+        self.assertIsNone(http_meta)
+        self.assertEqual(
+            [_[1].rsplit('/', 1)[-1] for _ in self.driver.commands],
+            ['execute', 'moveto', 'click'],
+        )
+        self.assertEqual(self.driver.commands[1][2], {'element': '2'})
+        self.assertEqual(phantom.history, [])
+
+    @gen_test
+    def test_click_link(self):
+        phantom = yield self.start_phantom()
+        yield phantom.open('http://example.com/list')
+        elements = yield phantom.xpath('//li')
+        url = 'http://example.com/next'
+        # the stub's click doesn't navigate
+        self.driver.on_script('page.getHttpMeta()', lambda script, args: {
+            'request': {'url': url, 'headers': []},
+            'response': {'url': url, 'status_code': 200, 'headers': []},
+        })
+
+        http_meta = yield phantom.click(elements[2])
+
+        self.assertEqual(http_meta['request']['url'], url)
+        self.assertEqual(http_meta['response']['status_code'], 200)
+        self.assertEqual(phantom.history, ['http://example.com/list', url])
+
+    @gen_test
+    def test_click_disabled(self):
+        phantom = yield self.start_phantom()
+        elements = yield phantom.xpath('//li')
+        self.driver.reset()
+
+        with self.assertRaises(PhantomError):
+            yield phantom.click(elements[0])
+
+        self.assertNotIn('click', [_[1].rsplit('/', 1)[-1] for _ in self.driver.commands])
+
+    @gen_test
+    def test_execute_phantomjs_script(self):
+        phantom = yield self.start_phantom()
+        self.driver.on_script('return 42', lambda script, args: {'script': script})
+
+        result = yield phantom.execute_phantomjs_script('return 42')
+
+        self.assertEqual(result, {'script': 'return 42;'})
+        self.assertEqual(
+            self.driver.commands[-1][2]['script'], 'var page = this; return 42;'
+        )
+
+    @gen_test
+    def test_execute_phantomjs_batch(self):
+        phantom = yield self.start_phantom()
+
+        results = yield phantom.execute_phantomjs_batch(['return 1', 'return 2'])
+
+        self.assertEqual(results, [None, None])
+        self.assertEqual(len(self.driver.commands), 1)
+
+    @gen_test
+    def test_execute_error(self):
+        phantom = yield self.start_phantom()
+
+        with self.assertRaises(PhantomError):
+            yield phantom.execute('GET', '/session/$sessionId/unknown')
+
+    @gen_test
+    def test_quit(self):
+        phantom = yield self.start_phantom()
+
+        yield phantom.quit()
+
+        self.assertIsNone(phantom.session_id)
+        self.assertEqual(self.driver.commands[-1][0], 'DELETE')
+        with self.assertRaises(PhantomError):
+            yield phantom.current_url()
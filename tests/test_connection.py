@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+from threading import Thread
+
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.remote_connection import RemoteConnection
+
+from phantompy.connection import PooledConnection
+
+from .ghostdriver import StubGhostDriver
+
+
+class PooledConnectionTest(unittest.TestCase):
+
+    # the commands per connection test
+    commands = 500
+
+    def setUp(self):
+        self.driver = StubGhostDriver()
+        self.driver.start()
+
+    def tearDown(self):
+        self.driver.stop()
+
+    def run_commands(self, connection, commands):
+        # * RemoteConnection checks the port by a connection on init
+        session_id = connection.execute(
+            Command.NEW_SESSION, {'desiredCapabilities': {}}
+        )['sessionId']
+        self.driver.reset()
+
+        for _ in range(commands):
+            response = connection.execute(
+                Command.GET_CURRENT_URL, {'sessionId': session_id}
+            )
+            self.assertEqual(response['value'], 'about:blank')
+
+    def test_reuse(self):
+        connection = PooledConnection(self.driver.url)
+
+        self.run_commands(connection, 100)
+
+        self.assertEqual(self.driver.connections, 0)
+        self.assertEqual(len(self.driver.commands), 100)
+        stats = connection.stats
+        self.assertEqual(stats['connections'], 1)
+        self.assertEqual(stats['requests'], 101)
+        self.assertEqual(stats['reused'], 100)
+        self.assertEqual(stats['reconnects'], 0)
+
+    def test_concurrent(self):
+        connection = PooledConnection(self.driver.url, pool_size=2)
+        session_id = connection.execute(
+            Command.NEW_SESSION, {'desiredCapabilities': {}}
+        )['sessionId']
+        self.driver.reset()
+
+        def run():
+            for _ in range(50):
+                connection.execute(Command.GET_CURRENT_URL, {'sessionId': session_id})
+
+        threads = [Thread(target=run) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # the connection of the new session + one more
+        self.assertLessEqual(self.driver.connections, 1)
+        self.assertEqual(len(self.driver.commands), 200)
+        self.assertEqual(connection.stats['connections'], 2)
+
+    def test_close(self):
+        connection = PooledConnection(self.driver.url, pool_size=1)
+        self.run_commands(connection, 10)
+
+        connection.close()
+        self.driver.reset()
+        connection.execute(Command.NEW_SESSION, {'desiredCapabilities': {}})
+
+        # a new connection is opened instead of the closed one
+        self.assertEqual(self.driver.connections, 1)
+        self.assertEqual(connection.stats['connections'], 2)
+
+    def test_connections(self):
+        self.run_commands(RemoteConnection(self.driver.url), self.commands)
+        # a connection per command
+        self.assertEqual(self.driver.connections, self.commands)
+
+        connection = PooledConnection(self.driver.url)
+        self.run_commands(connection, self.commands)
+        # the connection of the new session is reused
+        self.assertEqual(self.driver.connections, 0)
+        self.assertEqual(connection.stats['reused'], self.commands)
@@ -0,0 +1,457 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from distutils.spawn import find_executable
+from json import dumps, loads
+from subprocess import PIPE, Popen
+from threading import Thread
+
+from phantompy.base import DRIVER_BINARY, JS, Phantom
+
+from .ghostdriver import StubGhostDriver, StubPhantom
+
+
+NODE = find_executable('node') or find_executable('nodejs')
+
+
+# a minimal DOM for the page scripts run by node
+# * the CSS selectors are a tag name or a .class
+MOCK_DOM = r'''
+var Element = function(tag, attrs, children, text) {
+    this.nodeType = 1;
+    this.tagName = tag.toUpperCase();
+    this.attrs = attrs || {};
+    this.children = children || [];
+    this.text = text || '';
+    for (var name in this.attrs) {
+        if (['href', 'type', 'disabled'].indexOf(name) !== -1) {
+            this[name] = this.attrs[name];
+        };
+    };
+};
+Element.prototype.matches = function(selector) {
+    if (selector.charAt(0) === '.') {
+        return (this.attrs['class'] || '').split(' ').indexOf(selector.slice(1)) !== -1;
+    };
+    return this.tagName === selector.toUpperCase();
+};
+Element.prototype.querySelectorAll = function(selector) {
+    var found = [];
+    var walk = function(el) {
+        el.children.forEach(function(child) {
+            if (child.matches(selector)) {
+                found.push(child);
+            };
+            walk(child);
+        });
+    };
+    walk(this);
+    return found;
+};
+Element.prototype.querySelector = function(selector) {
+    return this.querySelectorAll(selector)[0] || null;
+};
+Element.prototype.getAttribute = function(name) {
+    return this.attrs.hasOwnProperty(name) ? this.attrs[name] : null;
+};
+Object.defineProperty(Element.prototype, 'textContent', {get: function() {
+    return this.text + this.children.map(function(_) { return _.textContent; }).join('');
+}});
+Object.defineProperty(Element.prototype, 'innerHTML', {get: function() {
+    return this.children.map(function(_) { return '<' + _.tagName.toLowerCase() + '>'; }).join('');
+}});
+var el = function(tag, attrs, children, text) {
+    return new Element(tag, attrs, children, text);
+};
+'''
+
+
+class NodeTestCase(unittest.TestCase):
+
+    # runs :script as a function body by node, :setup defines the globals
+    # * returns the JSON of the function's result at the node's exit
+    #   (so the async callbacks may fill it in)
+    def run_script(self, script, args=(), setup=''):
+        source = '\n'.join([
+            setup,
+            'var __result__ = (new Function(%s)).apply(null, %s);' % (
+                dumps(script), dumps(list(args))
+            ),
+            'process.on("exit", function() {',
+            '    process.stdout.write(JSON.stringify('
+            '__result__ === undefined ? null : __result__));',
+            '});',
+        ])
+        process = Popen([NODE, '-'], stdin=PIPE, stdout=PIPE, stderr=PIPE)
+        stdout, stderr = process.communicate(source)
+        self.assertEqual(process.returncode, 0, stderr)
+        return loads(stdout)
+
+
+@unittest.skipIf(NODE is None, 'node is not installed')
+class ScriptsSyntaxTest(NodeTestCase):
+
+    def test_syntax(self):
+        driver = StubGhostDriver()
+        driver.start()
+        try:
+            phantom = StubPhantom(driver)
+            scripts = dict(JS, base=phantom._get_session_script(phantom._session_config))
+            phantom.quit()
+        finally:
+            driver.stop()
+
+        for name, script in sorted(scripts.items()):
+            # compiled, not run
+            self.assertTrue(
+                self.run_script('new Function(%s); return true;' % dumps(script)),
+                name,
+            )
+
+
+@unittest.skipIf(NODE is None, 'node is not installed')
+class ExtractScriptTest(NodeTestCase):
+
+    document = '''
+    var document = el('body', {}, [
+        el('ul', {}, [
+            el('li', {'class': 'item'}, [
+                el('h2', {}, [], '  First\\n item '),
+                el('a', {'href': '/first', 'title': 'First'}, [], 'link'),
+                el('span', {'class': 'tag'}, [], 'a'),
+                el('span', {'class': 'tag'}, [], 'b'),
+            ]),
+            el('li', {'class': 'item'}, [
+                el('h2', {}, [], 'Second'),
+            ]),
+        ]),
+    ]);
+    '''
+
+    def extract(self, spec, rows=None):
+        args = [spec]
+        setup = MOCK_DOM + self.document
+        if rows is not None:
+            # the rows are passed by harvest.js
+            setup += 'var __rows__ = document.querySelectorAll(%s);' % dumps(rows)
+            return self.run_script(
+                'return (new Function(%s)).call(null, arguments[0], __rows__);'
+                % dumps(JS['extract']),
+                args, setup,
+            )
+        return self.run_script(JS['extract'], args, setup)
+
+    def test_rows(self):
+        result = self.extract({
+            'rows': {'type': 'css', 'value': '.item'},
+            'fields': {
+                'title': {'select': {'type': 'css', 'value': 'h2'}, 'attr': 'text'},
+                'url': {'select': {'type': 'css', 'value': 'a'}, 'prop': 'href'},
+                'name': {'select': {'type': 'css', 'value': 'a'}, 'attr': 'title'},
+                'tags': {
+                    'select': {'type': 'css', 'value': '.tag'},
+                    'attr': 'text',
+                    'all': True,
+                },
+            },
+        })
+
+        self.assertEqual(result, [
+            {'title': 'First item', 'url': '/first', 'name': 'First', 'tags': ['a', 'b']},
+            {'title': 'Second', 'url': None, 'name': None, 'tags': []},
+        ])
+
+    def test_nested(self):
+        result = self.extract({
+            'rows': None,
+            'fields': {
+                'items': {
+                    'select': {'type': 'css', 'value': '.item'},
+                    'all': True,
+                    'fields': {
+                        'title': {'select': {'type': 'css', 'value': 'h2'}, 'attr': 'text'},
+                    },
+                },
+                'html': {'select': {'type': 'css', 'value': 'ul'}, 'attr': 'html'},
+            },
+        })
+
+        self.assertEqual(result, {
+            'items': [{'title': 'First item'}, {'title': 'Second'}],
+            'html': '<li><li>',
+        })
+
+    def test_harvested_rows(self):
+        result = self.extract(
+            {
+                'rows': None,
+                'fields': {
+                    'title': {'select': {'type': 'css', 'value': 'h2'}, 'attr': 'text'},
+                },
+            },
+            rows='li',
+        )
+
+        self.assertEqual(result, [{'title': 'First item'}, {'title': 'Second'}])
+
+
+@unittest.skipIf(NODE is None, 'node is not installed')
+class ElementStateScriptTest(NodeTestCase):
+
+    window = '''
+    var scrolled = [];
+    var window = {
+        pageXOffset: 10,
+        pageYOffset: 100,
+        scrollTo: function(x, y) {
+            scrolled.push([x, y]);
+        },
+        getComputedStyle: function(el) {
+            return {visibility: el.attrs.hidden ? 'hidden' : 'visible', opacity: '1'};
+        }
+    };
+    Element.prototype.getBoundingClientRect = function() {
+        return {left: 5.4, top: 20, width: 50.6, height: 10};
+    };
+    Element.prototype.getClientRects = function() {
+        return [this.getBoundingClientRect()];
+    };
+    var form = el('form', {'action': '/search'});
+    form.action = 'http://example.com/search';
+    var button = el('button', {'type': 'submit', 'disabled': true});
+    button.form = form;
+    var link = el('a', {'href': '/next', 'hidden': true});
+    '''
+
+    def get_state(self, elems, scroll=False):
+        return self.run_script(
+            'var result = (new Function(%s)).call(null, %s, %s);'
+            'return {state: result, scrolled: scrolled};'
+            % (dumps(JS['element_state']), elems, dumps(scroll)),
+            setup=MOCK_DOM + self.window,
+        )
+
+    def test_single(self):
+        result = self.get_state('button', scroll=True)
+
+        self.assertEqual(result['state'], {
+            'tag': 'button',
+            'href': None,
+            'type': 'submit',
+            'form_action': 'http://example.com/search',
+            'displayed': True,
+            'enabled': False,
+            'rect': {'x': 15, 'y': 120, 'width': 51, 'height': 10},
+            'offset': {'x': 10, 'y': 100},
+        })
+        self.assertEqual(result['scrolled'], [[15, 120]])
+
+    def test_list(self):
+        result = self.get_state('[link, button]')
+
+        self.assertEqual([_['tag'] for _ in result['state']], ['a', 'button'])
+        self.assertEqual(result['state'][0]['href'], '/next')
+        self.assertFalse(result['state'][0]['displayed'])
+        self.assertTrue(result['state'][0]['enabled'])
+        self.assertEqual(result['scrolled'], [])
+
+
+@unittest.skipIf(NODE is None, 'node is not installed')
+class LongPollScriptTest(NodeTestCase):
+
+    # the page object of PhantomJS and the webserver module
+    page = '''
+    var page = {
+        settings: {},
+        customHeaders: {},
+        evaluate: function(func) {
+            return func.apply(null, Array.prototype.slice.call(arguments, 1));
+        }
+    };
+    var listener = null;
+    var responses = [];
+    var webserver = {create: function() {
+        return {
+            listen: function(address, callback) {
+                listener = callback;
+                return true;
+            },
+            close: function() {}
+        };
+    }};
+    var _require = require;
+    require = function(name) {
+        return name === 'webserver' ? webserver : _require(name);
+    };
+    var poll = function(handler, params) {
+        var response = {
+            setHeader: function() {},
+            write: function(data) {
+                responses.push(JSON.parse(data));
+            },
+            close: function() {}
+        };
+        listener({url: '/' + handler + '?' + encodeURIComponent(JSON.stringify(params))}, response);
+    };
+    '''
+
+    def setUp(self):
+        driver = StubGhostDriver()
+        driver.start()
+        try:
+            phantom = StubPhantom(driver)
+            self.script = phantom._get_session_script(
+                dict(phantom._session_config, poll_port=8910)
+            )
+            phantom.quit()
+        finally:
+            driver.stop()
+
+    def run_page(self, script):
+        return self.run_script(
+            '(new Function("page", "phantom", "require", %s))(page, {}, require);'
+            '%s; return responses;'
+            % (dumps(self.script), script),
+            setup=self.page,
+        )
+
+    def test_load(self):
+        responses = self.run_page('''
+            poll('load', {seq: 0, timeout: 5000});
+            page.onLoadStarted();
+            page.onLoadFinished('success');
+        ''')
+
+        self.assertEqual(responses, [
+            {'ok': True, 'navigation': {'seq': 1, 'loading': False, 'status': 'success'}},
+        ])
+
+    def test_load_finished(self):
+        # the page is loaded before the poll
+        responses = self.run_page('''
+            page.onLoadFinished('success');
+            poll('load', {seq: 0, timeout: 5000});
+        ''')
+
+        self.assertTrue(responses[0]['ok'])
+
+    def test_load_timeout(self):
+        responses = self.run_page('''
+            poll('load', {seq: 0, timeout: 10});
+        ''')
+
+        self.assertEqual(responses, [
+            {'ok': False, 'navigation': {'seq': 0, 'loading': False, 'status': None}},
+        ])
+
+    def test_network_idle(self):
+        responses = self.run_page('''
+            page.network.inflight[1] = true;
+            poll('network_idle', {max_inflight: 0, quiet_ms: 10, timeout: 5000});
+            page.finishRequest(1);
+        ''')
+
+        self.assertTrue(responses[0]['ok'])
+        self.assertEqual(responses[0]['stats']['inflight'], 0)
+
+    def test_unknown(self):
+        responses = self.run_page('''
+            poll('unknown', {});
+        ''')
+
+        self.assertIn('Unknown poll handler: /unknown', responses[0]['error'])
+
+
+class PagesHandler(BaseHTTPRequestHandler):
+
+    pages = {
+        '/': '''
+            <html><body>
+                <ul>
+                    <li class="item"><h2> First
+                        item </h2><a href="/next">link</a></li>
+                    <li class="item"><h2>Second</h2></li>
+                </ul>
+                <a id="next" href="/next">next</a>
+                <button id="hidden" style="visibility: hidden">hidden</button>
+            </body></html>
+        ''',
+        '/next': '<html><body><h1>Next</h1></body></html>',
+    }
+
+    def do_GET(self):
+        page = self.pages.get(self.path)
+        self.send_response(200 if page else 404)
+        self.send_header('Content-Type', 'text/html')
+        self.end_headers()
+        self.wfile.write(page or '')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PhantomJSTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # * nose runs setUpClass of the skipped classes
+        if DRIVER_BINARY is None:
+            raise unittest.SkipTest('PhantomJS is not installed')
+        cls.server = HTTPServer(('127.0.0.1', 0), PagesHandler)
+        cls.url = 'http://127.0.0.1:%s' % cls.server.server_port
+        cls.thread = Thread(target=cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+        cls.phantom = Phantom()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.phantom.quit()
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.phantom.open(self.url + '/')
+
+    def test_extract(self):
+        result = self.phantom.extract({
+            'rows': '//li[@class="item"]',
+            'fields': {
+                'title': './/h2',
+                'url': {'select': 'css:a', 'prop': 'href'},
+            },
+        })
+
+        self.assertEqual(result, [
+            {'title': 'First item', 'url': self.url + '/next'},
+            {'title': 'Second', 'url': None},
+        ])
+
+    def test_element_state(self):
+        link, hidden = self.phantom.xpath('//a[@id="next"] | //button')
+
+        states = self.phantom.get_element_state([link, hidden])
+
+        self.assertEqual([_['tag'] for _ in states], ['a', 'button'])
+        self.assertEqual(states[0]['href'], self.url + '/next')
+        self.assertTrue(states[0]['displayed'])
+        self.assertFalse(states[1]['displayed'])
+        self.assertEqual(states[1]['type'], 'submit')
+
+    def test_click(self):
+        link = self.phantom.xpath('//a[@id="next"]')[0]
+
+        http_meta = self.phantom.click(link)
+
+        self.assertEqual(http_meta['response']['status_code'], 200)
+        self.assertEqual(self.phantom.history[-1], self.url + '/next')
+        self.assertEqual(len(self.phantom.xpath('//h1', timeout=0)), 1)
+
+    def test_reset_session(self):
+        self.phantom.execute_script('localStorage.setItem("key", "value")')
+
+        self.phantom.reset_session()
+        self.phantom.open(self.url + '/')
+
+        self.assertIsNone(self.phantom.execute_script('return localStorage.getItem("key")'))
@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import unittest
+from json import loads
+from shutil import rmtree
+
+from selenium.webdriver.common.action_chains import ActionChains
+
+from phantompy.sessions import SESSION_MARKER
+
+from .ghostdriver import StubGhostDriver, StubPhantom
+
+
+class PhantomTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.driver = StubGhostDriver()
+        self.driver.start()
+        self.phantom = StubPhantom(self.driver)
+        self.reset()
+
+    def tearDown(self):
+        self.phantom.quit()
+        self.driver.stop()
+
+    def reset(self):
+        self.driver.reset()
+        self.phantom.commands = 0
+
+    # the PhantomJS scripts sent to the driver
+    def phantomjs_scripts(self):
+        return [
+            _[2]['script'] for _ in self.driver.commands
+            if _[1].endswith('/phantom/execute')
+        ]
+
+    # returns the driver commands per call
+    def count_commands(self, func, calls=1):
+        self.reset()
+        for _ in range(calls):
+            func()
+        return self.phantom.commands / calls
+
+
+class ResetSessionTest(PhantomTestCase):
+
+    def test_soft(self):
+        navigator = self.phantom.generate_navigator()
+
+        self.phantom.reset_session(navigator=navigator)
+
+        # a single script pushes the changed config only
+        scripts = self.phantomjs_scripts()
+        self.assertEqual(len(self.driver.commands), 1)
+        self.assertEqual(len(scripts), 1)
+        self.assertIn('phantom.clearCookies()', scripts[0])
+        self.assertIn('page.__config__["navigator"]', scripts[0])
+        self.assertNotIn('page.__config__["screen"]', scripts[0])
+        self.assertEqual(self.phantom.navigator, navigator)
+        self.assertEqual(
+            self.phantom.default_headers['User-Agent'], navigator['userAgent']
+        )
+
+    def test_soft_unchanged(self):
+        self.phantom.reset_session()
+
+        scripts = self.phantomjs_scripts()
+        self.assertEqual(len(scripts), 1)
+        self.assertNotIn('page.__config__[', scripts[0])
+
+    def test_hard(self):
+        self.phantom.reset_session(mode='hard')
+
+        # the page is closed and the session is re-created
+        self.assertIn(('POST', '/wd/hub/session'), [_[:2] for _ in self.driver.commands])
+
+    def test_mode(self):
+        with self.assertRaises(ValueError):
+            self.phantom.reset_session(mode='unknown')
+
+    def test_commands(self):
+        calls = 50
+
+        soft_commands = self.count_commands(
+            lambda: self.phantom.reset_session(
+                navigator=self.phantom.generate_navigator()
+            ),
+            calls,
+        )
+        soft_bytes = sum(map(len, self.phantomjs_scripts())) / calls
+
+        hard_commands = self.count_commands(
+            lambda: self.phantom.new_session(
+                navigator=self.phantom.generate_navigator()
+            ),
+            calls,
+        )
+        hard_bytes = sum(map(len, self.phantomjs_scripts())) / calls
+
+        self.assertEqual(soft_commands, 1)
+        self.assertLess(soft_commands, hard_commands)
+        # the session script (base.js) isn't re-sent
+        self.assertLess(soft_bytes * 2, hard_bytes)
+
+
+class RestartTest(PhantomTestCase):
+
+    def test_restart(self):
+        navigator = self.phantom.navigator
+
+        self.phantom.restart()
+
+        self.assertEqual(self.phantom.restarts, 1)
+        self.assertEqual(self.phantom.navigator, navigator)
+        self.assertIn(('POST', '/wd/hub/session'), [_[:2] for _ in self.driver.commands])
+
+    def test_restart_pending(self):
+        # set by Watchdog
+        self.phantom.restart_pending = 'rss'
+
+        self.phantom.current_url
+
+        self.assertEqual(self.phantom.restarts, 1)
+        self.assertIsNone(self.phantom.restart_pending)
+        # the command is sent to the new session
+        self.assertEqual(self.driver.commands[-1][:2], (
+            'GET', '/wd/hub/session/%s/url' % self.driver.session_id
+        ))
+
+    def test_restart_pending_quit(self):
+        self.phantom.restart_pending = 'dead'
+
+        self.phantom.quit()
+
+        self.assertEqual(self.phantom.restarts, 0)
+        # for tearDown
+        self.phantom.restart()
+
+    def test_session_dir_removed(self):
+        rmtree(self.phantom.session_dir)
+
+        self.phantom.restart()
+
+        self.assertTrue(
+            os.path.isfile(os.path.join(self.phantom.session_dir, SESSION_MARKER))
+        )
+
+
+class CookiesTest(PhantomTestCase):
+
+    def setUp(self):
+        PhantomTestCase.setUp(self)
+        # phantom.cookies of the stub
+        self.jar = []
+        self.driver.on_script('return phantom.cookies', lambda script, args: self.jar)
+        self.driver.on_script('phantom.addCookie', self.add_cookies)
+
+    def add_cookies(self, script, args):
+        if 'phantom.clearCookies()' in script:
+            del self.jar[:]
+        cookies = loads(re.search(r'var cookies = (.*);\n', script).group(1))
+        self.jar.extend(cookies)
+        return len(cookies)
+
+    @staticmethod
+    def generate_cookies(count):
+        return [
+            {
+                'name': 'cookie%s' % i,
+                'value': 'value%s' % i,
+                'domain': '.example%s.com' % (i % 100),
+                'path': '/',
+                'httponly': False,
+                'secure': False,
+                'expiry': 2000000000,
+            }
+            for i in range(count)
+        ]
+
+    def test_export(self):
+        self.jar.extend(self.generate_cookies(10))
+
+        self.assertEqual(self.phantom.export_cookies(), self.jar)
+        self.assertEqual(self.phantomjs_scripts(), ['var page = this; return phantom.cookies;'])
+
+    def test_export_filter(self):
+        self.phantom.export_cookies(domain='.Example1.com', name=['cookie1'])
+
+        script = self.phantomjs_scripts()[0]
+        self.assertIn('return phantom.cookies.filter(', script)
+        self.assertIn('{"domain": ["example1.com"], "name": ["cookie1"]}', script)
+
+    def test_import(self):
+        cookies = self.generate_cookies(10)
+
+        self.assertEqual(self.phantom.import_cookies(cookies), 10)
+        self.assertEqual(self.jar, cookies)
+        self.assertEqual(self.phantom.import_cookies(cookies[:5], clear=True), 5)
+        self.assertEqual(self.jar, cookies[:5])
+
+    def test_import_type(self):
+        with self.assertRaises(TypeError):
+            self.phantom.import_cookies({'name': 'cookie'})
+        with self.assertRaises(TypeError):
+            self.phantom.export_cookies(domain=1)
+
+    def test_commands(self):
+        cookies = self.generate_cookies(5000)
+
+        # a WebDriver command per cookie
+        webdriver_commands = self.count_commands(
+            lambda: [self.phantom.add_cookie(_) for _ in cookies]
+        )
+        self.assertEqual(len(self.driver.cookies), len(cookies))
+
+        import_commands = self.count_commands(
+            lambda: self.phantom.import_cookies(cookies, clear=True)
+        )
+        self.assertEqual(self.jar, cookies)
+
+        export_commands = self.count_commands(self.phantom.export_cookies)
+
+        self.assertEqual(webdriver_commands, len(cookies))
+        self.assertEqual(import_commands, 1)
+        self.assertEqual(export_commands, 1)
+
+
+class ExtractTest(PhantomTestCase):
+
+    rows = 200
+
+    spec = {
+        'rows': '//li[@class="item"]',
+        'fields': {
+            'title': './/h2',
+            'url': {'select': './/a', 'attr': 'href'},
+            'price': 'css:span.price',
+            'image': {'select': './/img', 'attr': 'src'},
+            'rating': {'select': './/b', 'attr': 'title'},
+        },
+    }
+
+    # the rows' elements (see StubGhostDriver.elements)
+    names = {
+        './/h2': 'title',
+        './/a': 'link',
+        'span.price': 'price',
+        './/img': 'image',
+        './/b': 'rating',
+    }
+
+    def setUp(self):
+        PhantomTestCase.setUp(self)
+        rows = ['row%s' % i for i in range(self.rows)]
+        self.driver.elements[(None, self.spec['rows'])] = rows
+        for row in rows:
+            for selector, name in self.names.items():
+                self.driver.elements[(row, selector)] = ['%s-%s' % (row, name)]
+        self.driver.on_script('var spec = arguments[0];', self.extract)
+
+    # extract.js of the stub (the values are the same as the stub's commands return)
+    def extract(self, script, args):
+        spec = args[0]
+        result = []
+        for elem in self.driver.find_elements(None, spec['rows']['value']):
+            values = {}
+            for name, field in spec['fields'].items():
+                id = '%s-%s' % (elem['ELEMENT'], self.names[field['select']['value']])
+                if field['attr'] == 'text':
+                    values[name] = 'text of %s' % id
+                else:
+                    values[name] = '%s of %s' % (field['attr'], id)
+            result.append(values)
+        return result
+
+    # a WebDriver command per element and value
+    def extract_by_elements(self):
+        result = []
+        for row in self.phantom.xpath(self.spec['rows']):
+            result.append({
+                'title': row.find_elements_by_xpath('.//h2')[0].text,
+                'url': row.find_elements_by_xpath('.//a')[0].get_attribute('href'),
+                'price': row.find_elements_by_css_selector('span.price')[0].text,
+                'image': row.find_elements_by_xpath('.//img')[0].get_attribute('src'),
+                'rating': row.find_elements_by_xpath('.//b')[0].get_attribute('title'),
+            })
+        return result
+
+    def test_extract(self):
+        result = self.phantom.extract(self.spec)
+
+        self.assertEqual(len(result), self.rows)
+        self.assertEqual(result[0], {
+            'title': 'text of row0-title',
+            'url': 'href of row0-link',
+            'price': 'text of row0-price',
+            'image': 'src of row0-image',
+            'rating': 'title of row0-rating',
+        })
+        self.assertEqual(self.phantom.commands, 1)
+        spec = self.driver.commands[0][2]['args'][0]
+        self.assertEqual(spec['rows'], {'type': 'xpath', 'value': '//li[@class="item"]'})
+        self.assertEqual(spec['fields']['price']['select'], {'type': 'css', 'value': 'span.price'})
+
+    def test_spec(self):
+        with self.assertRaises(TypeError):
+            self.phantom.extract([])
+        with self.assertRaises(TypeError):
+            self.phantom.extract({'fields': {}})
+        with self.assertRaises(TypeError):
+            self.phantom.extract({'fields': {'title': {'select': './/h2', 'attr': 1}}})
+
+    def test_commands(self):
+        elements_commands = self.count_commands(self.extract_by_elements)
+        extract_commands = self.count_commands(lambda: self.phantom.extract(self.spec))
+
+        self.assertEqual(self.phantom.extract(self.spec), self.extract_by_elements())
+        self.assertEqual(elements_commands, 1 + self.rows * len(self.spec['fields']) * 2)
+        self.assertEqual(extract_commands, 1)
+
+
+class ClickTest(PhantomTestCase):
+
+    def setUp(self):
+        PhantomTestCase.setUp(self)
+        self.driver.elements[(None, '//button')] = ['button']
+        self.driver.elements[(None, '//a')] = ['link']
+        self.driver.on_script('var getState = function(el)', self.get_state)
+        self.elem = self.phantom.xpath('//button')[0]
+        self.reset()
+
+    # element_state.js of the stub
+    def get_state(self, script, args):
+        states = [
+            {
+                'tag': 'a' if elem['ELEMENT'] == 'link' else 'button',
+                'href': '/next' if elem['ELEMENT'] == 'link' else None,
+                'type': 'submit',
+                'form_action': None,
+                'displayed': True,
+                'enabled': True,
+                'rect': {'x': 0, 'y': 0, 'width': 100, 'height': 20},
+                'offset': {'x': 0, 'y': 0},
+            }
+            for elem in (args[0] if isinstance(args[0], list) else [args[0]])
+        ]
+        return states if isinstance(args[0], list) else states[0]
+
+    # the commands of a click by the element's WebDriver calls
+    def click_by_elements(self, elem):
+        displayed = elem.is_displayed()
+        location = elem.location
+        size = elem.size
+        page_offset = (
+            self.phantom.execute_script('return window.pageXOffset'),
+            self.phantom.execute_script('return window.pageYOffset'),
+        )
+        tag_name = elem.tag_name
+        href = elem.get_attribute('href')
+        type = elem.get_attribute('type')
+        enabled = elem.is_enabled()
+        ActionChains(self.phantom).click(elem).perform()
+        return displayed, location, size, page_offset, tag_name, href, type, enabled
+
+    def test_click(self):
+        self.assertIsNone(self.phantom.click(self.elem, wait=False))
+
+        # the element's state, the mouse move and the click
+        self.assertEqual(self.phantom.commands, 3)
+        self.assertEqual(
+            [_[1].rsplit('/', 1)[-1] for _ in self.driver.commands],
+            ['execute', 'moveto', 'click'],
+        )
+
+    def test_click_link(self):
+        url = 'http://example.com/next'
+        self.driver.current_url = 'http://example.com/list'
+        self.driver.on_script('return page.getHttpMeta()', lambda script, args: {
+            'request': {'url': url, 'headers': []},
+            'response': {'url': url, 'status_code': 200, 'headers': []},
+        })
+        link = self.phantom.xpath('//a')[0]
+        self.reset()
+
+        http_meta = self.phantom.click(link, wait=False)
+
+        self.assertEqual(http_meta['request']['url'], url)
+        self.assertEqual(self.phantom.history, [url])
+        # + the current URL to resolve the href and the http_meta
+        self.assertEqual(self.phantom.commands, 5)
+
+    def test_element_visible(self):
+        self.assertTrue(self.phantom.element_visible(self.elem))
+        self.assertEqual(self.phantom.commands, 1)
+
+    def test_element_states(self):
+        elems = self.phantom.xpath('//button') + self.phantom.xpath('//a')
+        self.reset()
+
+        states = self.phantom.get_element_state(elems)
+
+        self.assertEqual([_['tag'] for _ in states], ['button', 'a'])
+        self.assertEqual(self.phantom.commands, 1)
+
+    def test_commands(self):
+        elements_commands = self.count_commands(
+            lambda: self.click_by_elements(self.elem), 10
+        )
+        click_commands = self.count_commands(
+            lambda: self.phantom.click(self.elem, wait=False), 10
+        )
+
+        self.assertEqual(elements_commands, 11)
+        self.assertEqual(click_commands, 3)
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+from time import sleep, time
+
+from phantompy.pool import PhantomPool, PhantomPoolError
+
+from .ghostdriver import StubGhostDriver, StubPhantom
+
+
+class StubPhantomPool(PhantomPool):
+
+    def __init__(self, driver, **kwargs):
+        self.driver = driver
+        kwargs.setdefault('prestart', False)
+        PhantomPool.__init__(self, **kwargs)
+
+    def _create(self):
+        return StubPhantom(self.driver, **self.phantom_kwargs)
+
+
+class PhantomPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.driver = StubGhostDriver()
+        self.driver.start()
+        self.driver.on_script('return page.getHttpMeta()', lambda script, args: {
+            'request': {'url': self.driver.current_url, 'headers': []},
+            'response': {
+                'url': self.driver.current_url, 'status_code': 200, 'headers': [],
+            },
+        })
+        self.pools = []
+
+    def tearDown(self):
+        for pool in self.pools:
+            pool.close()
+        self.driver.stop()
+
+    def make_pool(self, **kwargs):
+        pool = StubPhantomPool(self.driver, **kwargs)
+        self.pools.append(pool)
+        return pool
+
+    # waits for the background warm up (see PhantomPool.warm_up)
+    def wait_idle(self, pool, idle, timeout=10):
+        deadline = time() + timeout
+        while pool.stats['idle'] < idle and time() < deadline:
+            sleep(0.01)
+        self.assertEqual(pool.stats['idle'], idle)
+
+    def test_checkout(self):
+        pool = self.make_pool(size=2)
+
+        phantom = pool.checkout()
+
+        stats = pool.stats
+        self.assertEqual((stats['misses'], stats['spawned']), (1, 1))
+        self.assertEqual((stats['size'], stats['busy'], stats['idle']), (1, 1, 0))
+
+        pool.checkin(phantom)
+
+        self.assertEqual(pool.checkout(), phantom)
+        self.assertEqual(pool.stats['hits'], 1)
+
+    def test_checkin(self):
+        pool = self.make_pool(size=1)
+
+        with pool.phantom() as phantom:
+            phantom.open('http://example.com/')
+
+        # the session is reset for the next user
+        self.assertEqual(phantom.history, [])
+        self.assertEqual(pool.stats['idle'], 1)
+        self.assertEqual(pool._meta[phantom]['pages'], 1)
+
+    def test_timeout(self):
+        pool = self.make_pool(size=1)
+        pool.checkout()
+
+        with self.assertRaises(PhantomPoolError):
+            pool.checkout(timeout=0.1)
+        self.assertEqual(pool.stats['waits'], 1)
+
+    def test_warm_up(self):
+        pool = self.make_pool(size=2, prestart=True)
+
+        self.wait_idle(pool, 2)
+        self.assertEqual(pool.stats['spawned'], 2)
+
+    def test_recycle_pages(self):
+        pool = self.make_pool(size=1, max_pages=2)
+
+        with pool.phantom() as phantom:
+            phantom.open('http://example.com/')
+        with pool.phantom() as reused:
+            reused.open('http://example.com/')
+
+        self.assertEqual(reused, phantom)
+        self.assertEqual(pool.stats['recycled'], 1)
+        self.assertNotIn(phantom, pool._meta)
+        # replaced in background
+        self.wait_idle(pool, 1)
+        self.assertEqual(pool.stats['spawned'], 2)
+
+    def test_recycle_restarted(self):
+        pool = self.make_pool(size=1, max_pages=2)
+
+        with pool.phantom() as phantom:
+            phantom.open('http://example.com/')
+            phantom.restart()
+            phantom.open('http://example.com/')
+
+        # the pages since the restart (navigations are reset by restart())
+        self.assertEqual(pool._meta[phantom]['pages'], 1)
+        self.assertEqual(pool.stats['recycled'], 0)
+
+    def test_recycle_age(self):
+        pool = self.make_pool(size=1, max_age=0)
+
+        with pool.phantom():
+            pass
+
+        self.assertEqual(pool.stats['recycled'], 1)
+        self.assertEqual(pool.stats['idle'], 0)
+
+    def test_close(self):
+        pool = self.make_pool(size=1)
+        phantom = pool.checkout()
+
+        pool.close()
+
+        with self.assertRaises(PhantomPoolError):
+            pool.checkout()
+        pool.checkin(phantom)
+        self.assertEqual(len(pool), 0)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+import sys
+import unittest
+from shutil import rmtree
+from tempfile import mkdtemp
+from uuid import uuid4
+
+from phantompy.sessions import SessionsJanitor, SESSION_MARKER
+
+
+# the pid of an exited process
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+class SessionsJanitorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = mkdtemp()
+        self.janitor = SessionsJanitor(self.path)
+
+    def tearDown(self):
+        rmtree(self.path, ignore_errors=True)
+
+    def make_dir(self, name=None, owner=None, driver=None):
+        session_dir = os.path.join(self.path, name or str(uuid4()))
+        os.makedirs(session_dir)
+        if owner is not None:
+            with open(os.path.join(session_dir, SESSION_MARKER), 'w') as f:
+                f.write(str(owner))
+        if driver is not None:
+            with open(os.path.join(session_dir, 'driver.pid'), 'w') as f:
+                f.write(str(driver))
+        return session_dir
+
+    def test_unrelated_dirs(self):
+        dirs = [
+            self.make_dir('my_project_data'),
+            self.make_dir('other', driver=dead_pid()),
+            # not created by phantompy
+            self.make_dir(driver=dead_pid()),
+        ]
+        old = 0
+        for session_dir in dirs:
+            os.utime(session_dir, (old, old))
+
+        self.assertEqual(self.janitor.cleanup(), [])
+        self.assertTrue(all(os.path.isdir(_) for _ in dirs))
+
+    def test_orphaned(self):
+        session_dir = self.make_dir(owner=dead_pid(), driver=dead_pid())
+
+        self.assertEqual(self.janitor.cleanup(), [session_dir])
+        self.assertFalse(os.path.exists(session_dir))
+        self.assertEqual(self.janitor.removed, 1)
+
+    def test_live_owner(self):
+        # the driver is dead, the Phantom is about to restart it
+        session_dir = self.make_dir(owner=os.getpid(), driver=dead_pid())
+
+        self.assertEqual(self.janitor.cleanup(), [])
+
+    def test_live_driver(self):
+        session_dir = self.make_dir(owner=dead_pid(), driver=os.getpid())
+
+        self.assertEqual(self.janitor.cleanup(), [])
+
+    def test_mark(self):
+        session_dir = self.make_dir()
+        SessionsJanitor.mark(session_dir)
+
+        self.assertFalse(self.janitor.orphaned(session_dir))
+        with open(os.path.join(session_dir, SESSION_MARKER)) as f:
+            self.assertEqual(int(f.read()), os.getpid())
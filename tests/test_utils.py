@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from phantompy.utils.misc import parse_selector
+
+
+class ParseSelectorTest(unittest.TestCase):
+
+    def assertType(self, selectors, type):
+        for selector in selectors:
+            self.assertEqual(parse_selector(selector)['type'], type, selector)
+
+    def test_xpath(self):
+        self.assertType([
+            '//li',
+            './/a',
+            '../div',
+            '(//a)[1]',
+            '@href',
+            'li[@class="item"]',
+            'h2/text()',
+            'child::li',
+            'li/following-sibling::li',
+            'ancestor-or-self::div',
+            'li[self::li]',
+        ], 'xpath')
+
+    def test_css(self):
+        self.assertType([
+            'li.item',
+            'ul > li:first-child',
+            'p::first-line',
+            '::before',
+            'a.child::before',
+            'input[type="text"]',
+            'div#self',
+        ], 'css')
+
+    def test_prefix(self):
+        self.assertEqual(
+            parse_selector('css: p::before'), {'type': 'css', 'value': 'p::before'}
+        )
+        self.assertEqual(
+            parse_selector('xpath:li'), {'type': 'xpath', 'value': 'li'}
+        )
+
+    def test_type(self):
+        with self.assertRaises(TypeError):
+            parse_selector(' ')
+        with self.assertRaises(TypeError):
+            parse_selector(None)